@@ -1,29 +1,73 @@
+import time
+
+# Measured from the first line so import cost shows up in startup metrics
+_import_started = time.perf_counter()
+
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_socketio import SocketIO
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from extensions import socketio
 from models import db
 from routes.auth import auth_bp
 from routes.posts import posts_bp
 from routes.users import users_bp
 from routes.upload import upload_bp
+from routes.batch import batch_bp
+from routes.hashtags import hashtags_bp
+import routes.realtime  # Registers SocketIO event handlers
+from utils.auth import init_jwt_loaders
+from utils.compression import init_compression
+from utils.follow_graph import init_follow_graph, rebuild_follow_graph
+from utils.jobs import init_jobs, register_job
+from utils.metrics import init_metrics, STARTUP_SECONDS
+from utils.offload import init_offload
+from utils.passwords import init_passwords
+from utils.rate_limit import init_rate_limiter
+from utils.retention import run_retention
+from utils.deletion import purge_deleted
+from utils.counter_buffer import init_counter_buffer, flush_counters
+from utils.impressions import flush_impressions, purge_impressions
+from utils.media import convert_pending_media
+from utils.revocation import init_revocation, purge_revoked_tokens
+from utils.idempotency import purge_idempotency_keys
+from commands import register_commands
+from utils.schema import sync_schema
+from sqlalchemy import text
 import os
 import logging
 
 # Setup logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=Config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-def create_app():
+STARTUP_SECONDS.set(time.perf_counter() - _import_started, phase='import')
+
+def create_app(manage_schema=None):
+    """Build the Flask app.
+
+    Workers never touch the database while starting up unless
+    ``manage_schema`` (or ``DB_AUTO_CREATE``) asks for it; production runs
+    ``flask --app wsgi:app migrate`` once per deploy instead.
+    """
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # request.remote_addr must be the client, not the proxy, for per-IP rate limits
+    proxy_hops = app.config['TRUSTED_PROXY_HOPS']
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops, x_host=proxy_hops)
+    
+    if manage_schema is None:
+        manage_schema = app.config['DB_AUTO_CREATE']
+    
     # Initialize CORS with proper configuration
     CORS(app, 
-         origins=["http://localhost:5173", "http://127.0.0.1:5173"],
+         origins=app.config['CORS_ORIGINS'],
          supports_credentials=True,
-         allow_headers=["Content-Type", "Authorization"])
+         allow_headers=["Content-Type", "Authorization", "Idempotency-Key"])
     
     # Initialize extensions
     try:
@@ -33,14 +77,61 @@ def create_app():
         logger.error(f"Database initialization failed: {e}")
         
     jwt = JWTManager(app)
-    socketio = SocketIO(app, 
-                       cors_allowed_origins=["http://localhost:5173", "http://127.0.0.1:5173"])
+    init_jwt_loaders(jwt)
+    init_revocation(app, jwt)
+    
+    # Message queue lets every worker emit to sockets connected to the others
+    if app.config['SOCKETIO_ENABLED']:
+        socketio.init_app(app,
+                          cors_allowed_origins=app.config['CORS_ORIGINS'],
+                          message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'],
+                          async_mode=app.config['SOCKETIO_ASYNC_MODE'])
+    
+    # Offload pool for CPU-bound work (password hashing, image optimization)
+    init_offload(app)
+    init_passwords(app)
+    
+    # Rate limiter backend (in-process or shared Redis)
+    init_rate_limiter(app)
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(posts_bp, url_prefix='/api/posts')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(upload_bp, url_prefix='/api/upload')
+    app.register_blueprint(batch_bp, url_prefix='/api/batch')
+    app.register_blueprint(hashtags_bp, url_prefix='/api/hashtags')
+    
+    # Metrics (/metrics endpoint, per-route counters and latency histograms)
+    init_metrics(app)
+    
+    # gzip/brotli for JSON responses, plus the built frontend when FRONTEND_DIST is set
+    init_compression(app)
+    
+    # CLI commands (flask migrate, ...)
+    register_commands(app)
+    
+    # Background jobs, started by each worker on its first request
+    register_job('notification-retention', app.config['NOTIFICATION_COMPACT_INTERVAL'], run_retention,
+                 enabled=app.config['NOTIFICATION_RETENTION_ENABLED'])
+    # Like/comment/repost deltas are buffered and written every few seconds
+    init_counter_buffer(app)
+    register_job('counter-flush', app.config['COUNTER_FLUSH_SECONDS'], flush_counters,
+                 enabled=app.config['COUNTER_BUFFER_ENABLED'])
+    register_job('impressions-flush', app.config['IMPRESSIONS_FLUSH_SECONDS'], flush_impressions,
+                 enabled=app.config['IMPRESSIONS_ENABLED'])
+    register_job('impressions-retention', 3600, purge_impressions, enabled=app.config['IMPRESSIONS_ENABLED'])
+    register_job('deletion-purge', app.config['DELETION_PURGE_INTERVAL'], purge_deleted,
+                 enabled=app.config['DELETION_PURGE_ENABLED'])
+    register_job('revoked-token-purge', 3600, purge_revoked_tokens)
+    register_job('idempotency-key-purge', 3600, purge_idempotency_keys)
+    register_job('media-convert', app.config['MEDIA_CONVERT_INTERVAL'], convert_pending_media,
+                 enabled=app.config['MEDIA_CONVERT_ENABLED'])
+    # Loaded in the background; relationship queries use SQL until it's ready
+    init_follow_graph(app)
+    register_job('follow-graph-rebuild', app.config['FOLLOW_GRAPH_REBUILD_SECONDS'], rebuild_follow_graph,
+                 enabled=app.config['FOLLOW_GRAPH_ENABLED'], run_now=True)
+    init_jobs(app)
     
     # Create upload directory
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -68,37 +159,56 @@ def create_app():
     def missing_token_callback(error):
         return jsonify({'error': 'Token diperlukan'}), 401
     
-    # Create tables
-    with app.app_context():
-        try:
-            # Test database connection
-            db.engine.execute('SELECT 1')
-            logger.info("Database connection successful")
-            
-            # Create tables
-            db.create_all()
-            logger.info("Database tables created successfully")
-        except Exception as e:
-            logger.error(f"Database setup failed: {e}")
-            # Don't crash the app, just log the error
+    # Create tables (development convenience; production uses `flask migrate`)
+    if manage_schema:
+        with app.app_context():
+            try:
+                sync_schema()
+                logger.info("Database tables created successfully")
+            except Exception as e:
+                logger.error(f"Database setup failed: {e}")
+                # Don't crash the app, just log the error
     
     @app.route('/api/health')
     def health_check():
-        try:
-            # Test database connection
-            db.engine.execute('SELECT 1')
-            return jsonify({
-                'status': 'healthy', 
-                'message': 'Aray Forum API is running',
-                'database': 'connected'
-            })
-        except Exception as e:
-            logger.error(f"Health check failed: {e}")
+        # Liveness probe: the process is up and serving, no database round trip
+        return jsonify({
+            'status': 'healthy',
+            'message': 'Aray Forum API is running'
+        })
+    
+    # Readiness result is cached so frequent probes don't hit MySQL every time
+    readiness = {'checked_at': 0.0, 'error': None}
+    
+    @app.route('/api/health/ready')
+    def readiness_check():
+        now = time.monotonic()
+        if now - readiness['checked_at'] >= app.config['HEALTH_READY_CACHE_SECONDS']:
+            try:
+                with db.engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+                readiness['error'] = None
+            except Exception as e:
+                logger.error(f"Readiness check failed: {e}")
+                readiness['error'] = str(e)
+            readiness['checked_at'] = now
+        
+        if readiness['error']:
             return jsonify({
                 'status': 'unhealthy',
                 'message': 'Database connection failed',
-                'error': str(e)
-            }), 500
+                'error': readiness['error']
+            }), 503
+        
+        return jsonify({
+            'status': 'ready',
+            'message': 'Aray Forum API is running',
+            'database': 'connected'
+        })
+    
+    startup_seconds = time.perf_counter() - started
+    STARTUP_SECONDS.set(startup_seconds, phase='create_app')
+    logger.info(f"App created in {startup_seconds * 1000:.1f}ms")
     
     return app, socketio
 
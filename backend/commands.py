@@ -0,0 +1,125 @@
+import click
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import desc
+from werkzeug.security import generate_password_hash, check_password_hash
+from models import db, Post
+from utils import compression
+from utils.interactions import rebuild_post_counters, rebuild_follow_counters
+from utils.notifications import rebuild_unread_counters
+from utils.deletion import purge_deleted
+from utils.retention import compact_notifications, purge_archive
+from utils.schema import sync_schema
+from utils.serializers import post_fields, select_posts, serialize_posts, dumps
+
+# Data rebuilt after `migrate` adds the (table, column) it depends on;
+# column None means the whole table was just created
+BACKFILLS = [
+    (('notification_counters', None), rebuild_unread_counters),
+    (('posts', 'likes_count'), rebuild_post_counters),
+    (('users', 'followers_count'), rebuild_follow_counters),
+]
+
+
+def run_backfills(added_columns):
+    needed = [backfill for dependency, backfill in BACKFILLS if dependency in added_columns]
+    for backfill in dict.fromkeys(needed):
+        click.echo(f'Backfilling: {backfill.__name__}')
+        backfill()
+
+
+def register_commands(app):
+    @app.cli.command('migrate')
+    def migrate():
+        """Create or update database tables (run once per deploy, not per worker)."""
+        started = time.perf_counter()
+        added_columns = sync_schema()
+        run_backfills(added_columns)
+        click.echo(f'Schema up to date ({len(added_columns)} column(s) added) '
+                   f'in {time.perf_counter() - started:.2f}s')
+
+    @app.cli.command('rebuild-counters')
+    def rebuild_counters():
+        """Recompute denormalized counters from their source tables."""
+        for backfill in dict.fromkeys(backfill for _, backfill in BACKFILLS):
+            click.echo(f'Running {backfill.__name__}')
+            backfill()
+
+    @app.cli.command('compact-notifications')
+    @click.option('--days', type=int, default=None, help='Only read notifications older than this.')
+    @click.option('--batch-size', type=int, default=None)
+    @click.option('--max-batches', type=int, default=None)
+    def compact_notifications_command(days, batch_size, max_batches):
+        """Fold old read notifications into digests and prune the archive."""
+        removed = compact_notifications(days, batch_size, max_batches)
+        click.echo(f'Compacted {removed} notification(s)')
+        if current_app.config['NOTIFICATION_ARCHIVE']:
+            click.echo(f'Purged {purge_archive()} archived notification(s)')
+
+    @app.cli.command('purge-deleted')
+    @click.option('--batch-size', type=int, default=None)
+    @click.option('--max-batches', type=int, default=None)
+    def purge_deleted_command(batch_size, max_batches):
+        """Purge soft-deleted posts and accounts now instead of waiting for the job."""
+        click.echo(f'Purged {purge_deleted(batch_size, max_batches)} post(s)/account(s)')
+
+    @app.cli.command('bench-passwords')
+    @click.option('--threads', default=os.cpu_count() or 1, show_default=True, help='Concurrent verifiers.')
+    @click.option('--seconds', default=5.0, show_default=True, help='Benchmark duration.')
+    @click.option('--method', default=None, help='Werkzeug hash method (defaults to PASSWORD_HASH_METHOD).')
+    def bench_passwords(threads, seconds, method):
+        """Measure login (password verify) throughput per core."""
+        method = method or current_app.config['PASSWORD_HASH_METHOD']
+        password = 'Benchmark123'
+        stored = generate_password_hash(password, method=method,
+                                        salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
+        deadline = time.perf_counter() + seconds
+
+        def worker():
+            done = 0
+            while time.perf_counter() < deadline:
+                check_password_hash(stored, password)
+                done += 1
+            return done
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            total = sum(executor.map(lambda _: worker(), range(threads)))
+        elapsed = time.perf_counter() - started
+
+        cores = min(threads, os.cpu_count() or 1)
+        rate = total / elapsed
+        click.echo(f'method={stored.split("$", 1)[0]} threads={threads}')
+        click.echo(f'{total} verifications in {elapsed:.2f}s: {rate:.1f}/s total, '
+                   f'{rate / cores:.1f}/s per core, {elapsed / total * 1000 * threads:.1f}ms each')
+
+    @app.cli.command('bench-compression')
+    @click.option('--per-page', default=100, show_default=True, help='Posts in the sample feed page.')
+    @click.option('--repeat', default=50, show_default=True, help='Compressions per setting.')
+    def bench_compression(per_page, repeat):
+        """Bytes on the wire and CPU cost of each encoding for a feed page."""
+        with current_app.test_request_context(f'/api/posts?per_page={per_page}'):
+            fields = post_fields()
+            rows = db.session.execute(
+                select_posts(fields).order_by(desc(Post.created_at)).limit(per_page)
+            ).all()
+            data = dumps({'posts': serialize_posts(rows, fields)})
+
+        click.echo(f'{len(rows)} posts, {len(data)} bytes uncompressed')
+        settings = [('gzip', level) for level in (1, 6, 9)]
+        if compression.brotli is not None:
+            settings += [('br', quality) for quality in (1, 4, 6, 11)]
+        else:
+            click.echo('brotli not installed; gzip only')
+
+        for encoding, level in settings:
+            config = {'COMPRESSION_GZIP_LEVEL': level, 'COMPRESSION_BROTLI_QUALITY': level}
+            started = time.process_time()
+            for _ in range(repeat):
+                compressed = compression.compress(data, encoding, config)
+            cpu_ms = (time.process_time() - started) / repeat * 1000
+            click.echo(f'{encoding}:{level:<3} {len(compressed):>8} bytes '
+                       f'({len(compressed) / len(data):6.1%})  {cpu_ms:7.2f}ms CPU each, '
+                       f'{len(data) / 1e6 / (cpu_ms / 1000 or 1e-9):6.1f} MB/s')
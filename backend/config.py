@@ -12,19 +12,31 @@ class Config:
     # Perbaikan URI database dengan parameter yang lebih lengkap
     SQLALCHEMY_DATABASE_URI = (
         f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DB}"
-        f"?charset=utf8mb4&autocommit=true"
+        f"?charset=utf8mb4"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create/update tables when the app starts (dev). Production: `flask migrate`
+    DB_AUTO_CREATE = os.getenv('DB_AUTO_CREATE', 'true').lower() == 'true'
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-        'echo': True  # Untuk debugging - hapus di production
+        'echo': os.getenv('SQLALCHEMY_ECHO', 'true').lower() == 'true'  # Matikan di production
     }
     
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-super-secret-jwt-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Revocations live in MySQL; each worker caches them and pulls new ones this often
+    REVOCATION_SYNC_SECONDS = int(os.getenv('REVOCATION_SYNC_SECONDS', 5))
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))  # seconds a stored response is replayed (idempotency_keys table)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))  # seconds a cached user payload stays fresh
+    
+    # Password hashing (werkzeug method string; changing it rehashes on next login)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))  # running + queued
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0))  # seconds
     
     # Upload Configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -34,6 +46,93 @@ class Config:
     # Security
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
     
+    # Serving
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+    CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5173,http://127.0.0.1:5173').split(',')
+    SOCKETIO_ENABLED = os.getenv('SOCKETIO_ENABLED', 'true').lower() == 'true'
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')  # e.g. redis://localhost:6379/0
+    # Worker processes, as gunicorn.conf.py picks them; per-process state must be shared beyond one
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() if SOCKETIO_MESSAGE_QUEUE else 1))
+    SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE')  # None = auto-detect (eventlet/gevent/threading)
+    CPU_OFFLOAD_THREADS = int(os.getenv('CPU_OFFLOAD_THREADS', 4))
+    
+    # Rate limiting (token buckets: capacity, seconds to refill completely)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    # Reverse proxies (nginx, load balancer) in front of the app whose X-Forwarded-* headers are trusted;
+    # 0 means clients connect directly and X-Forwarded-For is ignored
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')  # or redis://host:6379/1
+    RATELIMIT_BUDGETS = {
+        'login': (10, 60),             # per IP
+        'login_account': (5, 300),     # per email/username being tried, per IP
+        'register': (5, 3600),         # per IP
+        'like': (60, 60),              # per user
+        'follow': (30, 60),            # per user
+        'create_post': (10, 60),       # per user
+        'search': (30, 60),            # per user, or IP when anonymous
+        'upload': (20, 600),           # per user
+        'batch': (120, 60)             # per user, one token per mutation
+    }
+    BATCH_MAX_MUTATIONS = int(os.getenv('BATCH_MAX_MUTATIONS', 100))
+    
+    # Notification retention (read notifications older than this become daily digests)
+    NOTIFICATION_RETENTION_ENABLED = os.getenv('NOTIFICATION_RETENTION_ENABLED', 'true').lower() == 'true'
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 30))
+    NOTIFICATION_COMPACT_INTERVAL = int(os.getenv('NOTIFICATION_COMPACT_INTERVAL', 3600))  # seconds
+    NOTIFICATION_COMPACT_BATCH_SIZE = 1000
+    NOTIFICATION_COMPACT_MAX_BATCHES = 100
+    NOTIFICATION_ARCHIVE = os.getenv('NOTIFICATION_ARCHIVE', 'true').lower() == 'true'
+    NOTIFICATION_ARCHIVE_DAYS = int(os.getenv('NOTIFICATION_ARCHIVE_DAYS', 365))
+    
+    # @mention resolution; username -> ID entries are cached per worker
+    USERNAME_CACHE_TTL = int(os.getenv('USERNAME_CACHE_TTL', 300))  # seconds
+    
+    # Write-behind like/comment/repost counters, flushed to `posts` in batched UPDATEs
+    COUNTER_BUFFER_ENABLED = os.getenv('COUNTER_BUFFER_ENABLED', 'true').lower() == 'true'
+    COUNTER_BUFFER_STORAGE_URL = os.getenv('COUNTER_BUFFER_STORAGE_URL')  # redis://... shares pending deltas across workers
+    COUNTER_FLUSH_SECONDS = float(os.getenv('COUNTER_FLUSH_SECONDS', 2))
+    
+    # Post impressions, buffered per worker and flushed as hourly/daily rollups
+    IMPRESSIONS_ENABLED = os.getenv('IMPRESSIONS_ENABLED', 'true').lower() == 'true'
+    IMPRESSIONS_FLUSH_SECONDS = int(os.getenv('IMPRESSIONS_FLUSH_SECONDS', 10))
+    IMPRESSIONS_MAX_PENDING = int(os.getenv('IMPRESSIONS_MAX_PENDING', 200000))  # views buffered before shedding
+    IMPRESSIONS_HOURLY_RETENTION_DAYS = int(os.getenv('IMPRESSIONS_HOURLY_RETENTION_DAYS', 90))
+    
+    # Deleted posts/accounts are hidden at once and purged in bounded background batches
+    DELETION_PURGE_ENABLED = os.getenv('DELETION_PURGE_ENABLED', 'true').lower() == 'true'
+    DELETION_PURGE_INTERVAL = int(os.getenv('DELETION_PURGE_INTERVAL', 60))  # seconds
+    DELETION_PURGE_BATCH_SIZE = 500
+    DELETION_PURGE_MAX_BATCHES = 200
+    DELETION_USER_GRACE_SECONDS = 600  # account rows outlive cached username lookups (USERNAME_CACHE_TTL)
+    
+    # Animated GIF uploads are re-encoded to looping MP4/WebM in the background; the GIF stays as fallback
+    MEDIA_CONVERT_ENABLED = os.getenv('MEDIA_CONVERT_ENABLED', 'true').lower() == 'true'
+    MEDIA_CONVERT_INTERVAL = int(os.getenv('MEDIA_CONVERT_INTERVAL', 15))  # seconds
+    MEDIA_CONVERT_BATCH_SIZE = 5  # GIFs per run
+    MEDIA_CONVERT_TIMEOUT = 120  # seconds per ffmpeg run
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    
+    # In-memory follow graph (relationship flags, mutuals); rebuilt from `follows` per worker
+    FOLLOW_GRAPH_ENABLED = os.getenv('FOLLOW_GRAPH_ENABLED', 'true').lower() == 'true'
+    # redis://... shares edge changes across workers; defaults to SOCKETIO_MESSAGE_QUEUE. Without a
+    # shared store the graph is only used with a single worker
+    FOLLOW_GRAPH_STORAGE_URL = os.getenv('FOLLOW_GRAPH_STORAGE_URL')
+    FOLLOW_GRAPH_SYNC_SECONDS = int(os.getenv('FOLLOW_GRAPH_SYNC_SECONDS', 5))
+    FOLLOW_GRAPH_REBUILD_SECONDS = int(os.getenv('FOLLOW_GRAPH_REBUILD_SECONDS', 3600))
+    
+    # Monitoring
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    HEALTH_READY_CACHE_SECONDS = int(os.getenv('HEALTH_READY_CACHE_SECONDS', 5))
+    
+    # Response compression (gzip, plus brotli when the Brotli package is installed)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))  # bytes; smaller bodies go out as-is
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))  # dynamic responses; 11 is for static builds
+    PAYLOAD_CACHE_TTL = int(os.getenv('PAYLOAD_CACHE_TTL', 60))  # seconds an encoded feed/post/profile body is kept
+    # Built frontend (vite `dist`) served by Flask, with .br/.gz siblings when present
+    FRONTEND_DIST = os.getenv('FRONTEND_DIST')
+    
     # Pagination
     POSTS_PER_PAGE = 20
     USERS_PER_PAGE = 10
\ No newline at end of file
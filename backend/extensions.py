@@ -0,0 +1,5 @@
+from flask_socketio import SocketIO
+
+# Created unbound so routes and background jobs can emit events;
+# create_app() binds it with socketio.init_app(app, ...)
+socketio = SocketIO()
@@ -0,0 +1,57 @@
+# backend/gunicorn.conf.py - Production server configuration
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Socket.IO long-polling needs sticky sessions. Gunicorn cannot route a client
+# back to the same worker, so more than one worker requires either a sticky
+# load balancer in front of several single-worker instances or clients using
+# the websocket transport only. In both cases SOCKETIO_MESSAGE_QUEUE must point
+# at a shared Redis so events emitted in one worker reach sockets on the others.
+import multiprocessing
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'eventlet')
+
+# Preloading imports the app in the master before forking; the cooperative
+# runtime must be patched before that happens.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+if preload_app and worker_class == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif preload_app and 'gevent' in worker_class:
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+_default_workers = multiprocessing.cpu_count() if os.getenv('SOCKETIO_MESSAGE_QUEUE') else 1
+workers = int(os.getenv('WEB_CONCURRENCY', _default_workers))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Graceful shutdown: finish in-flight requests before workers exit
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # Connections opened in the master must not be shared with forked workers
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    from utils.offload import shutdown_offload
+    shutdown_offload()
@@ -13,7 +13,24 @@ follows = db.Table('follows',
 post_likes = db.Table('post_likes',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('post_id', db.Integer, db.ForeignKey('posts.id'), primary_key=True),
-    db.Column('created_at', db.DateTime, default=datetime.utcnow)
+    db.Column('created_at', db.DateTime, default=datetime.utcnow),
+    # Profile "Likes" tab: newest likes first without a filesort
+    db.Index('ix_post_likes_user_created', 'user_id', 'created_at')
+)
+
+# Users @mentioned in a post, for the mentions feed; written by utils.mentions
+post_mentions = db.Table('post_mentions',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('posts.id'), primary_key=True),
+    db.Column('created_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_post_mentions_user_created', 'user_id', 'created_at')
+)
+
+# Posts per hashtag; the primary key order makes a tag page one index range scan
+post_hashtags = db.Table('post_hashtags',
+    db.Column('tag_id', db.Integer, db.ForeignKey('hashtags.id'), primary_key=True),
+    db.Column('created_at', db.DateTime, primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('posts.id'), primary_key=True)
 )
 
 class User(db.Model):
@@ -31,12 +48,19 @@ class User(db.Model):
     banner_url = db.Column(db.String(255))
     is_verified = db.Column(db.Boolean, default=False)
     is_private = db.Column(db.Boolean, default=False)
+    # Denormalized counters, maintained by utils.interactions
+    followers_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Soft delete; utils.deletion purges the account and its data in the background
+    deleted_at = db.Column(db.DateTime, index=True)
+    # Tokens issued before this are rejected (logout everywhere, password change); see utils.revocation
+    tokens_revoked_before = db.Column(db.DateTime, index=True)
     
-    # Relationships
-    posts = db.relationship('Post', backref='author', lazy='dynamic', cascade='all, delete-orphan')
-    comments = db.relationship('Comment', backref='author', lazy='dynamic', cascade='all, delete-orphan')
+    # Relationships (children are removed by utils.deletion, never by ORM cascades)
+    posts = db.relationship('Post', backref='author', lazy='dynamic', passive_deletes='all')
+    comments = db.relationship('Comment', backref='author', lazy='dynamic', passive_deletes='all')
     liked_posts = db.relationship('Post', secondary=post_likes, backref='liked_by', lazy='dynamic')
     
     # Following relationships
@@ -65,9 +89,10 @@ class User(db.Model):
         
         if include_stats:
             data.update({
-                'posts_count': self.posts.count(),
-                'followers_count': self.followers.count(),
-                'following_count': self.following.count()
+                # Soft-deleted posts are hidden at once, before the purge removes them
+                'posts_count': self.posts.filter_by(deleted_at=None).count(),
+                'followers_count': self.followers_count,
+                'following_count': self.following_count
             })
         
         return data
@@ -85,6 +110,13 @@ class User(db.Model):
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # One repost per user and original; lets reposts be written with INSERT IGNORE
+        db.UniqueConstraint('user_id', 'original_post_id', name='uq_posts_user_original'),
+        # Profile tabs: each is one ordered range scan on (author, kind, time)
+        db.Index('ix_posts_user_reply_created', 'user_id', 'is_reply', 'created_at'),
+        db.Index('ix_posts_user_media_created', 'user_id', 'has_media', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -92,15 +124,28 @@ class Post(db.Model):
     parent_id = db.Column(db.Integer, db.ForeignKey('posts.id'))  # For replies/quotes
     media_url = db.Column(db.String(255))
     media_type = db.Column(db.String(20))  # 'image' or 'video'
+    media_id = db.Column(db.Integer, db.ForeignKey('media.id'))  # Metadata computed at upload time
     is_repost = db.Column(db.Boolean, default=False)
     original_post_id = db.Column(db.Integer, db.ForeignKey('posts.id'))
+    # Stored generated columns, kept in step by MySQL itself, so the profile tab indexes need no write-path code
+    is_reply = db.Column(db.Boolean, db.Computed('parent_id IS NOT NULL', persisted=True))
+    has_media = db.Column(db.Boolean, db.Computed('media_url IS NOT NULL', persisted=True))
+    # Denormalized counters, maintained by utils.interactions
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reposts_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Impressions, written in bulk by utils.impressions
+    views_count = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Soft delete: hidden from every read right away, purged in background batches
+    deleted_at = db.Column(db.DateTime, index=True)
     
-    # Relationships
-    comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade='all, delete-orphan')
+    # Relationships (children are removed by utils.deletion, never by ORM cascades)
+    comments = db.relationship('Comment', backref='post', lazy='dynamic', passive_deletes='all')
     reposts = db.relationship('Post', backref='original_post', remote_side=[id])
     replies = db.relationship('Post', backref='parent_post', remote_side=[id])
+    media = db.relationship('Media')
     
     def to_dict(self, include_author=True, include_stats=True):
         data = {
@@ -112,7 +157,8 @@ class Post(db.Model):
             'original_post_id': self.original_post_id,
             'parent_id': self.parent_id,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'updated_at': self.updated_at.isoformat(),
+            'media': self.media.to_dict() if self.media else None
         }
         
         if include_author:
@@ -120,9 +166,10 @@ class Post(db.Model):
         
         if include_stats:
             data.update({
-                'likes_count': self.liked_by.count(),
-                'comments_count': self.comments.count(),
-                'reposts_count': Post.query.filter_by(original_post_id=self.id).count()
+                'likes_count': self.likes_count,
+                'comments_count': self.comments_count,
+                'reposts_count': self.reposts_count,
+                'views_count': self.views_count
             })
         
         return data
@@ -158,6 +205,11 @@ class Comment(db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Keeps the per-user listing and the retention scan index-only
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notifications_read_created', 'is_read', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -178,4 +230,142 @@ class Notification(db.Model):
             'data': self.data,
             'is_read': self.is_read,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class NotificationCounter(db.Model):
+    __tablename__ = 'notification_counters'
+    
+    # One row per user so the unread badge is a single primary key lookup
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class NotificationDigest(db.Model):
+    __tablename__ = 'notification_digests'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'type', 'period_start', name='uq_notification_digests_user_type_period'),
+    )
+    
+    # Old read notifications compacted into one row per user, type and day
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    last_message = db.Column(db.String(255))
+    last_data = db.Column(db.JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'period_start': self.period_start.isoformat(),
+            'count': self.count,
+            'last_message': self.last_message,
+            'last_data': self.last_data
+        }
+
+class NotificationArchive(db.Model):
+    __tablename__ = 'notifications_archive'
+    __table_args__ = (
+        db.Index('ix_notifications_archive_user_created', 'user_id', 'created_at'),
+    )
+    
+    # Same shape as notifications; rows keep their original IDs
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    message = db.Column(db.String(255), nullable=False)
+    data = db.Column(db.JSON)
+    is_read = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class PostImpressionHourly(db.Model):
+    __tablename__ = 'post_impressions_hourly'
+    
+    # Views per post and hour; `viewers` is a zlib-compressed HyperLogLog sketch
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour = db.Column(db.DateTime, primary_key=True, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)
+    viewers = db.Column(db.LargeBinary)
+
+class AuthorImpressionDaily(db.Model):
+    __tablename__ = 'author_impressions_daily'
+    
+    # Views of everything an author posted, per day; the analytics endpoint reads only this
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)
+    viewers = db.Column(db.LargeBinary)
+
+class Hashtag(db.Model):
+    __tablename__ = 'hashtags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # normalized, without '#'
+    # Usage counter, maintained by utils.hashtags
+    posts_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    last_used_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'posts_count': self.posts_count,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None
+        }
+
+class Media(db.Model):
+    __tablename__ = 'media'
+    
+    # One row per uploaded post image, written once by the upload route so
+    # feeds can size and tint a placeholder before the file loads
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    url = db.Column(db.String(255), unique=True, nullable=False)
+    media_type = db.Column(db.String(20), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    dominant_color = db.Column(db.String(7))  # '#rrggbb'
+    blurhash = db.Column(db.String(64))
+    # Animated GIFs are re-encoded by utils.media: 'pending', 'done', 'skipped' or 'failed'
+    conversion_status = db.Column(db.String(20), index=True)
+    video_url = db.Column(db.String(255))  # MP4 (H.264)
+    webm_url = db.Column(db.String(255))   # WebM (VP9)
+    poster_url = db.Column(db.String(255))  # First frame, JPEG
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'width': self.width,
+            'height': self.height,
+            'dominant_color': self.dominant_color,
+            'blurhash': self.blurhash,
+            'video_url': self.video_url,
+            'webm_url': self.webm_url,
+            'poster_url': self.poster_url
+        }
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    # Single logged-out tokens; every worker loads new rows into its in-memory cache
+    jti = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    # Stored responses of keyed mutations, shared by every worker; see utils.idempotency
+    key_hash = db.Column(db.String(64), primary_key=True)  # sha256 of user, method, path and key
+    status_code = db.Column(db.SmallInteger, nullable=False)
+    body = db.Column(db.Text(16777215), nullable=False)  # MEDIUMTEXT on MySQL
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
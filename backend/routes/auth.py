@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
-    create_access_token, create_refresh_token, 
-    jwt_required, get_jwt_identity, get_jwt
+    create_access_token, create_refresh_token, decode_token,
+    jwt_required, get_jwt_identity, get_jwt, current_user
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from utils.auth import get_user_dict, cached_user_claims, invalidate_user
+from utils.deletion import soft_delete_user
+from utils.mentions import forget_username
+from utils.passwords import hash_password, verify_password, needs_rehash, HashingBusyError
+from utils.rate_limit import rate_limit, login_identifier
+from utils.revocation import revoke_token, revoke_user_tokens
 import re
 import logging
 
@@ -17,6 +22,12 @@ def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
+def server_busy_response():
+    response = jsonify({'error': 'Server sedang sibuk, coba lagi sebentar'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 def validate_password(password):
     # At least 8 characters, 1 uppercase, 1 lowercase, 1 number
     if len(password) < 8:
@@ -30,6 +41,7 @@ def validate_password(password):
     return True, "Valid"
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register')
 def register():
     try:
         # Log incoming request
@@ -79,7 +91,7 @@ def register():
             return jsonify({'error': 'Username sudah digunakan'}), 409
         
         # Create new user
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         user = User(
             name=name,
             email=email,
@@ -93,8 +105,8 @@ def register():
         logger.info(f"User registered successfully: {email}")
         
         # Create tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        access_token = create_access_token(identity=user)
+        refresh_token = create_refresh_token(identity=user)
         
         return jsonify({
             'message': 'Registrasi berhasil',
@@ -103,12 +115,18 @@ def register():
             'refresh_token': refresh_token
         }), 201
     
+    except HashingBusyError:
+        db.session.rollback()
+        return server_busy_response()
+    
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         db.session.rollback()
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
+@rate_limit('login_account', scope=login_identifier)
 def login():
     try:
         logger.info("Login attempt received")
@@ -129,22 +147,29 @@ def login():
         # Find user by email or username
         user = User.query.filter(
             (User.email == email_or_username) | 
-            (User.username == email_or_username)
+            (User.username == email_or_username),
+            User.deleted_at.is_(None)
         ).first()
         
         if not user:
             logger.info(f"Login failed: User not found for {email_or_username}")
             return jsonify({'error': 'Email/username atau password salah'}), 401
         
-        if not check_password_hash(user.password_hash, password):
+        if not verify_password(user.password_hash, password):
             logger.info(f"Login failed: Wrong password for {email_or_username}")
             return jsonify({'error': 'Email/username atau password salah'}), 401
         
+        # Upgrade hashes made with old KDF parameters while we have the plaintext
+        if needs_rehash(user.password_hash):
+            user.password_hash = hash_password(password)
+            db.session.commit()
+            logger.info(f"Password hash upgraded for user: {user.email}")
+        
         logger.info(f"Login successful for user: {user.email}")
         
         # Create tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        access_token = create_access_token(identity=user)
+        refresh_token = create_refresh_token(identity=user)
         
         return jsonify({
             'message': 'Login berhasil',
@@ -153,6 +178,10 @@ def login():
             'refresh_token': refresh_token
         }), 200
     
+    except HashingBusyError:
+        db.session.rollback()
+        return server_busy_response()
+    
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -162,16 +191,19 @@ def login():
 def refresh():
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user_dict = get_user_dict(current_user_id)
         
-        if not user:
+        if not user_dict:
             return jsonify({'error': 'User tidak ditemukan'}), 404
         
-        access_token = create_access_token(identity=current_user_id)
+        access_token = create_access_token(
+            identity=current_user_id,
+            additional_claims=cached_user_claims(current_user_id)
+        )
         
         return jsonify({
             'access_token': access_token,
-            'user': user.to_dict()
+            'user': user_dict
         }), 200
     
     except Exception as e:
@@ -182,13 +214,14 @@ def refresh():
 @jwt_required()
 def get_current_user():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        # Served from the user cache; the token's claim version forces a reload
+        # when the profile changed after the cached copy was taken
+        user_dict = get_user_dict(current_user.id, version=current_user.version)
         
-        if not user:
+        if not user_dict:
             return jsonify({'error': 'User tidak ditemukan'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': user_dict}), 200
     
     except Exception as e:
         logger.error(f"Get current user error: {str(e)}")
@@ -197,9 +230,30 @@ def get_current_user():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    # In a production app, you might want to blacklist the token
-    # For now, we'll just return success (client should remove token)
-    return jsonify({'message': 'Logout berhasil'}), 200
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if data.get('all_devices'):
+            # Sign out everywhere: every token issued until now stops working
+            revoke_user_tokens(get_jwt_identity())
+        else:
+            revoke_token(get_jwt())
+            
+            # Also revoke the refresh token when the client hands it over
+            refresh_token = data.get('refresh_token')
+            if refresh_token:
+                try:
+                    refresh_payload = decode_token(refresh_token)
+                    if refresh_payload['sub'] == get_jwt_identity():
+                        revoke_token(refresh_payload)
+                except Exception:
+                    pass
+        
+        return jsonify({'message': 'Logout berhasil'}), 200
+    
+    except Exception as e:
+        logger.error(f"Logout error: {str(e)}")
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
 @auth_bp.route('/change-password', methods=['POST'])
 @jwt_required()
@@ -219,7 +273,7 @@ def change_password():
             return jsonify({'error': 'Password lama dan baru wajib diisi'}), 400
         
         # Verify current password
-        if not check_password_hash(user.password_hash, current_password):
+        if not verify_password(user.password_hash, current_password):
             return jsonify({'error': 'Password lama salah'}), 401
         
         # Validate new password
@@ -228,12 +282,62 @@ def change_password():
             return jsonify({'error': message}), 400
         
         # Update password
-        user.password_hash = generate_password_hash(new_password)
+        user.password_hash = hash_password(new_password)
         db.session.commit()
         
-        return jsonify({'message': 'Password berhasil diubah'}), 200
+        # Invalidate every existing session, then hand this client fresh tokens
+        revoke_user_tokens(user.id)
+        
+        return jsonify({
+            'message': 'Password berhasil diubah',
+            'access_token': create_access_token(identity=user),
+            'refresh_token': create_refresh_token(identity=user)
+        }), 200
+    
+    except HashingBusyError:
+        db.session.rollback()
+        return server_busy_response()
     
     except Exception as e:
         logger.error(f"Change password error: {str(e)}")
         db.session.rollback()
-        return jsonify({'error': 'Terjadi kesalahan server'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@auth_bp.route('/account', methods=['DELETE'])
+@jwt_required()
+def delete_account():
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user or user.deleted_at:
+            return jsonify({'error': 'User tidak ditemukan'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        password = data.get('password', '')
+        
+        if not password:
+            return jsonify({'error': 'Password wajib diisi'}), 400
+        
+        if not verify_password(user.password_hash, password):
+            return jsonify({'error': 'Password salah'}), 401
+        
+        # Hidden right away; posts, likes, follows and notifications are purged in the background
+        soft_delete_user(user.id)
+        db.session.commit()
+        
+        revoke_user_tokens(user.id)
+        invalidate_user(user.id)
+        forget_username(user.username)
+        logger.info(f"Account deleted: {user.id}")
+        
+        return jsonify({'message': 'Akun berhasil dihapus'}), 200
+    
+    except HashingBusyError:
+        db.session.rollback()
+        return server_busy_response()
+    
+    except Exception as e:
+        logger.error(f"Delete account error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -0,0 +1,146 @@
+from itertools import groupby
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
+from models import db
+from utils import interactions
+from utils.auth import invalidate_user
+from utils.idempotency import idempotent
+from utils.notifications import mark_read
+from utils.rate_limit import rate_limit, charge
+import logging
+
+logger = logging.getLogger(__name__)
+
+batch_bp = Blueprint('batch', __name__)
+
+# op -> (target field, bulk function, counter table, counter column)
+TARGET_OPS = {
+    'like': ('post_id', lambda user, ids: interactions.like_many(user.id, ids, user.name),
+             interactions.posts, 'likes_count'),
+    'unlike': ('post_id', lambda user, ids: interactions.unlike_many(user.id, ids),
+               interactions.posts, 'likes_count'),
+    'follow': ('user_id', lambda user, ids: interactions.follow_many(user.id, ids, user.name),
+               interactions.users, 'followers_count'),
+    'unfollow': ('user_id', lambda user, ids: interactions.unfollow_many(user.id, ids),
+                 interactions.users, 'followers_count'),
+}
+
+# The budget each op shares with its single-mutation route; a batch is charged
+# one token per mutation and rejected outright if it wouldn't fit a full bucket
+OP_BUCKETS = {'like': 'like', 'unlike': 'like', 'follow': 'follow', 'unfollow': 'follow'}
+
+
+def _mutation_count():
+    data = request.get_json(silent=True) or {}
+    mutations = data.get('mutations')
+    return len(mutations) if isinstance(mutations, list) else 1
+
+
+def _validate(mutation):
+    """Return the mutation's target ID (or notification IDs), or an error message"""
+    if not isinstance(mutation, dict):
+        return None, 'Format mutasi tidak valid'
+
+    op = mutation.get('op')
+    if op in TARGET_OPS:
+        field = TARGET_OPS[op][0]
+        target_id = mutation.get(field)
+        if not isinstance(target_id, int) or isinstance(target_id, bool):
+            return None, f'{field} wajib diisi'
+        return target_id, None
+
+    if op == 'read_notifications':
+        ids = mutation.get('ids')
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return None, 'ids harus berupa daftar angka'
+        return ids, None
+
+    return None, 'Operasi tidak dikenal'
+
+
+@batch_bp.route('', methods=['POST'])
+@jwt_required()
+@rate_limit('batch', scope='user', cost=_mutation_count)
+@idempotent
+def run_batch():
+    """Apply a list of like/unlike/follow/unfollow/read_notifications mutations
+    in one transaction and return a result per mutation, in request order"""
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        mutations = data.get('mutations')
+
+        if not isinstance(mutations, list) or not mutations:
+            return jsonify({'error': 'mutations wajib diisi'}), 400
+
+        max_mutations = current_app.config['BATCH_MAX_MUTATIONS']
+        if len(mutations) > max_mutations:
+            return jsonify({'error': f'Maksimal {max_mutations} mutasi per permintaan'}), 400
+
+        results = [None] * len(mutations)
+        valid = []
+        for index, mutation in enumerate(mutations):
+            target, error = _validate(mutation)
+            if error:
+                results[index] = {'index': index, 'status': 'invalid', 'error': error}
+            else:
+                valid.append((index, mutation['op'], target))
+
+        bucket_costs = {}
+        for _, op, _ in valid:
+            if op in OP_BUCKETS:
+                bucket_costs[OP_BUCKETS[op]] = bucket_costs.get(OP_BUCKETS[op], 0) + 1
+        for bucket, cost in bucket_costs.items():
+            limited = charge(bucket, f'user:{current_user_id}', cost)
+            if limited is not None:
+                return limited
+
+        # Consecutive runs of the same op become one bulk statement; keeping
+        # the runs in order preserves e.g. "like then unlike" semantics
+        touched_users = set()
+        counted = []
+        for op, run in groupby(valid, key=lambda item: item[1]):
+            run = list(run)
+
+            if op == 'read_notifications':
+                for index, _, ids in run:
+                    marked = mark_read(current_user_id, ids)
+                    results[index] = {'index': index, 'op': op, 'status': 'ok', 'marked': marked}
+                continue
+
+            field, apply, table, column = TARGET_OPS[op]
+            changed = apply(current_user, list({target for _, _, target in run}))
+
+            seen = set()
+            for index, _, target in run:
+                if target not in changed:
+                    results[index] = {'index': index, 'op': op, field: target,
+                                      'status': 'not_found'}
+                    continue
+                # Only the first occurrence of a target in a run can change anything
+                status = 'ok' if changed[target] and target not in seen else 'unchanged'
+                seen.add(target)
+                results[index] = {'index': index, 'op': op, field: target, 'status': status}
+                counted.append((results[index], table, column, target))
+                if field == 'user_id' and status == 'ok':
+                    touched_users.add(target)
+
+        # Final counters, read once per table after every mutation is applied
+        for table, column in {(table, column) for _, table, column, _ in counted}:
+            ids = {target for _, t, c, target in counted if (t, c) == (table, column)}
+            counts = interactions.read_counts(table, column, ids)
+            for result, t, c, target in counted:
+                if (t, c) == (table, column):
+                    result[column] = counts.get(target, 0)
+
+        db.session.commit()
+        if touched_users:
+            invalidate_user(current_user_id, *touched_users)
+
+        return jsonify({'results': results}), 200
+
+    except Exception as e:
+        logger.error(f"Batch mutation error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -0,0 +1,75 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import Hashtag
+from sqlalchemy import desc
+from config import Config
+from utils.hashtags import normalize_tag, page_post_ids
+from utils.serializers import (
+    post_fields, fetch_posts, serialize_posts, encode_cursor, decode_cursor, json_response
+)
+
+hashtags_bp = Blueprint('hashtags', __name__)
+
+@hashtags_bp.route('', methods=['GET'])
+def get_hashtags():
+    """Most used tags, optionally only those starting with ``q``"""
+    try:
+        query = normalize_tag(request.args.get('q', '').strip())
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        
+        stmt = Hashtag.query.order_by(desc(Hashtag.posts_count))
+        if query:
+            stmt = stmt.filter(Hashtag.name.startswith(query, autoescape=True))
+        
+        return jsonify({'hashtags': [tag.to_dict() for tag in stmt.limit(limit).all()]}), 200
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@hashtags_bp.route('/<tag>', methods=['GET'])
+def get_hashtag(tag):
+    try:
+        name = normalize_tag(tag)
+        hashtag = Hashtag.query.filter_by(name=name).first() if name else None
+        if not hashtag:
+            return jsonify({'error': 'Hashtag tidak ditemukan'}), 404
+        
+        return jsonify({'hashtag': hashtag.to_dict()}), 200
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@hashtags_bp.route('/<tag>/posts', methods=['GET'])
+@jwt_required(optional=True)
+def get_hashtag_posts(tag):
+    """Newest posts with a tag, paginated by ``cursor`` instead of page number"""
+    try:
+        per_page = min(request.args.get('per_page', Config.POSTS_PER_PAGE, type=int), 100)
+        cursor = request.args.get('cursor')
+        
+        name = normalize_tag(tag)
+        hashtag = Hashtag.query.filter_by(name=name).first() if name else None
+        if not hashtag:
+            return jsonify({'error': 'Hashtag tidak ditemukan'}), 404
+        
+        position = decode_cursor(cursor) if cursor else None
+        if cursor and position is None:
+            return jsonify({'error': 'Cursor tidak valid'}), 400
+        
+        # One range scan on (tag_id, created_at, post_id), then one batched hydration
+        rows = page_post_ids(hashtag.id, position, per_page + 1)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        fields = post_fields()
+        current_user_id = get_jwt_identity()
+        posts = serialize_posts(fetch_posts(fields, [row.post_id for row in rows]), fields, current_user_id)
+        
+        return json_response({
+            'hashtag': hashtag.to_dict(),
+            'posts': posts,
+            'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].post_id) if has_next else None
+        })
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -1,8 +1,24 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from models import db, Post, User, Comment, Notification
-from sqlalchemy import desc, and_, or_
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, current_user
+from models import db, Post, Comment, Hashtag, Media, follows, post_mentions, post_hashtags
+from sqlalchemy import desc, and_, or_, select
 from config import Config
+from utils import counter_buffer, interactions
+from utils.auth import invalidate_user
+from utils.deletion import soft_delete_post
+from utils.impressions import record_views
+from utils.mentions import record_mentions
+from utils.hashtags import record_hashtags, normalize_tag, HASHTAG_PATTERN
+from utils.idempotency import idempotent
+from utils.notifications import notify
+from utils.rate_limit import rate_limit
+from utils.realtime import publish_new_post
+from utils.compression import cached_json
+from utils.conditional import make_etag, not_modified, add_validators
+from utils.serializers import (
+    post_fields, comment_fields, select_posts, select_comments, select_post_versions, original_versions,
+    fetch_posts, post_flags, serialize_posts, collapse_reposts, paginate, json_response
+)
 
 posts_bp = Blueprint('posts', __name__)
 
@@ -13,72 +29,73 @@ def get_posts():
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', Config.POSTS_PER_PAGE, type=int), 100)
-        feed_type = request.args.get('type', 'explore')  # 'timeline', 'explore', 'user'
+        feed_type = request.args.get('type', 'explore')  # 'timeline', 'explore', 'user', 'mentions'
         user_id = request.args.get('user_id', type=int)
+        since_id = request.args.get('since_id', type=int)  # Only posts newer than this (live feed deltas)
         
         current_user_id = get_jwt_identity()
         
-        # Base query
-        query = Post.query.filter_by(parent_id=None)  # Only top-level posts, not replies
+        fields = post_fields()
+        filters = []
+        if feed_type != 'mentions':
+            filters.append(Post.parent_id.is_(None))  # Only top-level posts, not replies
         
-        if feed_type == 'timeline' and current_user_id:
-            # Get posts from followed users
-            current_user = User.query.get(current_user_id)
-            following_ids = [u.id for u in current_user.following]
-            following_ids.append(current_user_id)  # Include own posts
-            query = query.filter(Post.user_id.in_(following_ids))
+        if feed_type == 'mentions':
+            # Posts and replies that @mention the user, from the post_mentions index
+            mentioned_id = user_id or current_user_id
+            if not mentioned_id:
+                return jsonify({'error': 'user_id wajib diisi'}), 400
+            mentioned_in = select(post_mentions.c.post_id).where(post_mentions.c.user_id == mentioned_id)
+            filters.append(Post.id.in_(mentioned_in))
+        
+        elif feed_type == 'timeline' and current_user_id:
+            # Get posts from followed users (plus own posts) without loading the user row
+            following_ids = select(follows.c.following_id).where(follows.c.follower_id == current_user_id)
+            filters.append(or_(Post.user_id == current_user_id, Post.user_id.in_(following_ids)))
         
         elif feed_type == 'user' and user_id:
             # Get posts from specific user
-            query = query.filter_by(user_id=user_id)
+            filters.append(Post.user_id == user_id)
         
-        # Order by creation date (newest first)
-        query = query.order_by(desc(Post.created_at))
+        if since_id:
+            filters.append(Post.id > since_id)
         
-        # Paginate
-        posts = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        # Version check first: IDs, timestamps and counters of the page only
+        versions, pagination = paginate(
+            select_post_versions().where(*filters).order_by(desc(Post.created_at)), page, per_page
         )
-        
-        # Convert to dict and add user interaction info
-        posts_data = []
-        for post in posts.items:
-            post_dict = post.to_dict()
-            
-            if current_user_id:
-                # Check if current user liked this post
-                post_dict['is_liked'] = post.liked_by.filter_by(id=current_user_id).first() is not None
-                # Check if current user reposted this post
-                post_dict['is_reposted'] = Post.query.filter_by(
-                    user_id=current_user_id, 
-                    original_post_id=post.id,
-                    is_repost=True
-                ).first() is not None
-            else:
-                post_dict['is_liked'] = False
-                post_dict['is_reposted'] = False
-            
-            posts_data.append(post_dict)
-        
-        return jsonify({
-            'posts': posts_data,
-            'pagination': {
-                'page': posts.page,
-                'pages': posts.pages,
-                'per_page': posts.per_page,
-                'total': posts.total,
-                'has_next': posts.has_next,
-                'has_prev': posts.has_prev
-            }
-        }), 200
+        ids = [row.id for row in versions]
+        record_views(ids, current_user_id)
+        # Reposted and quoted originals are embedded, so their versions count too
+        originals = original_versions(versions)
+        embedded_ids = ids + [row.id for row in originals]
+        flags = post_flags(embedded_ids, current_user_id, fields.flags)
+        
+        etag = make_etag(
+            current_user_id, fields.spec, feed_type, pagination['total'],
+            [tuple(row) for row in versions + originals],
+            counter_buffer.pending(embedded_ids), *(flags[flag] for flag in fields.flags)
+        )
+        last_modified = max((row.updated_at for row in versions + originals if row.updated_at), default=None)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        def payload():
+            # Core select of column tuples; no ORM objects are built for the page
+            posts = serialize_posts(fetch_posts(fields, ids), fields, current_user_id, flags)
+            if feed_type == 'timeline':
+                posts = collapse_reposts(posts)
+            return {'posts': posts, 'pagination': pagination}
+        
+        return add_validators(cached_json(etag, payload), etag, last_modified)
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
 @posts_bp.route('', methods=['POST'])
 @jwt_required()
+@rate_limit('create_post', scope='user')
 def create_post():
     try:
         current_user_id = get_jwt_identity()
@@ -95,29 +112,39 @@ def create_post():
         if len(content) > 280:
             return jsonify({'error': 'Konten tidak boleh lebih dari 280 karakter'}), 400
         
+        # Metadata computed when the file was uploaded; only the uploader's own files
+        media = Media.query.filter_by(url=media_url, user_id=current_user_id).first() if media_url else None
+        
         # Create new post
         post = Post(
             content=content,
             user_id=current_user_id,
             parent_id=parent_id,
             media_url=media_url,
-            media_type=media_type
+            media_type=media.media_type if media else media_type,
+            media=media
         )
         
         db.session.add(post)
+        db.session.flush()
+        record_mentions(current_user_id, current_user.name, content, post.id, created_at=post.created_at)
+        record_hashtags(post.id, content, post.created_at)
+        if not parent_id:
+            # Followers' timelines and the explore feed pick it up live
+            publish_new_post(post.id, current_user_id, post.created_at)
         db.session.commit()
+        invalidate_user(current_user_id)  # posts_count changed
         
         # Create notification if this is a reply
         if parent_id:
             parent_post = Post.query.get(parent_id)
             if parent_post and parent_post.user_id != current_user_id:
-                notification = Notification(
-                    user_id=parent_post.user_id,
-                    type='comment',
-                    message=f'{post.author.name} membalas postingan Anda',
-                    data={'post_id': post.id, 'parent_post_id': parent_id}
+                notify(
+                    parent_post.user_id,
+                    'comment',
+                    f'{current_user.name} membalas postingan Anda',
+                    {'post_id': post.id, 'parent_post_id': parent_id}
                 )
-                db.session.add(notification)
                 db.session.commit()
         
         return jsonify({
@@ -134,39 +161,49 @@ def create_post():
 def get_post(post_id):
     try:
         current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
-        
-        post_dict = post.to_dict()
-        
-        if current_user_id:
-            post_dict['is_liked'] = post.liked_by.filter_by(id=current_user_id).first() is not None
-            post_dict['is_reposted'] = Post.query.filter_by(
-                user_id=current_user_id, 
-                original_post_id=post.id,
-                is_repost=True
-            ).first() is not None
-        else:
-            post_dict['is_liked'] = False
-            post_dict['is_reposted'] = False
-        
-        return jsonify({'post': post_dict}), 200
+        fields = post_fields()
+        
+        version = db.session.execute(select_post_versions().where(Post.id == post_id)).first()
+        if version is None:
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
+        
+        record_views([post_id], current_user_id)
+        originals = original_versions([version])
+        embedded_ids = [post_id] + [row.id for row in originals]
+        flags = post_flags(embedded_ids, current_user_id, fields.flags)
+        etag = make_etag(current_user_id, fields.spec, tuple(version), [tuple(row) for row in originals],
+                         counter_buffer.pending(embedded_ids), *(flags[flag] for flag in fields.flags))
+        last_modified = max((row.updated_at for row in [version] + originals if row.updated_at), default=None)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        return add_validators(cached_json(etag, lambda: {
+            'post': serialize_posts(fetch_posts(fields, [post_id]), fields, current_user_id, flags)[0]
+        }), etag, last_modified)
     
     except Exception as e:
-        return jsonify({'error': 'Post tidak ditemukan'}), 404
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
 @posts_bp.route('/<int:post_id>', methods=['DELETE'])
 @jwt_required()
 def delete_post(post_id):
     try:
         current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
+        owner_id = db.session.execute(
+            select(Post.user_id).where(Post.id == post_id, Post.deleted_at.is_(None))
+        ).scalar()
+        if owner_id is None:
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
         
         # Check if user owns the post
-        if post.user_id != current_user_id:
+        if owner_id != current_user_id:
             return jsonify({'error': 'Anda tidak memiliki izin untuk menghapus post ini'}), 403
         
-        db.session.delete(post)
+        # Hidden right away; comments, likes, reposts and media are purged in the background
+        soft_delete_post(post_id)
         db.session.commit()
+        invalidate_user(current_user_id)  # posts_count changed
         
         return jsonify({'message': 'Post berhasil dihapus'}), 200
     
@@ -176,34 +213,24 @@ def delete_post(post_id):
 
 @posts_bp.route('/<int:post_id>/like', methods=['POST'])
 @jwt_required()
+@rate_limit('like', scope='user')
+@idempotent
 def like_post(post_id):
     try:
         current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
-        user = User.query.get(current_user_id)
         
-        # Check if already liked
-        if post.liked_by.filter_by(id=current_user_id).first():
-            return jsonify({'error': 'Post sudah dilike'}), 400
+        # Single INSERT IGNORE; liking twice is a no-op instead of an error
+        result = interactions.like(current_user_id, post_id, current_user.name)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
         
-        # Add like
-        post.liked_by.append(user)
         db.session.commit()
         
-        # Create notification
-        if post.user_id != current_user_id:
-            notification = Notification(
-                user_id=post.user_id,
-                type='like',
-                message=f'{user.name} menyukai postingan Anda',
-                data={'post_id': post.id, 'user_id': current_user_id}
-            )
-            db.session.add(notification)
-            db.session.commit()
-        
         return jsonify({
             'message': 'Post berhasil dilike',
-            'likes_count': post.liked_by.count()
+            'liked': True,
+            'likes_count': result.count
         }), 200
     
     except Exception as e:
@@ -212,23 +239,23 @@ def like_post(post_id):
 
 @posts_bp.route('/<int:post_id>/unlike', methods=['POST'])
 @jwt_required()
+@rate_limit('like', scope='user')
+@idempotent
 def unlike_post(post_id):
     try:
         current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
-        user = User.query.get(current_user_id)
         
-        # Check if liked
-        if not post.liked_by.filter_by(id=current_user_id).first():
-            return jsonify({'error': 'Post belum dilike'}), 400
+        result = interactions.unlike(current_user_id, post_id)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
         
-        # Remove like
-        post.liked_by.remove(user)
         db.session.commit()
         
         return jsonify({
             'message': 'Like berhasil dihapus',
-            'likes_count': post.liked_by.count()
+            'liked': False,
+            'likes_count': result.count
         }), 200
     
     except Exception as e:
@@ -237,48 +264,28 @@ def unlike_post(post_id):
 
 @posts_bp.route('/<int:post_id>/repost', methods=['POST'])
 @jwt_required()
+@idempotent
 def repost(post_id):
     try:
         current_user_id = get_jwt_identity()
-        original_post = Post.query.get_or_404(post_id)
-        user = User.query.get(current_user_id)
-        
-        # Check if already reposted
-        existing_repost = Post.query.filter_by(
-            user_id=current_user_id,
-            original_post_id=post_id,
-            is_repost=True
-        ).first()
         
-        if existing_repost:
-            return jsonify({'error': 'Post sudah direpost'}), 400
+        # Deduplicated by uq_posts_user_original, so double clicks can't race
+        result = interactions.repost(current_user_id, post_id, current_user.name)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
         
-        # Create repost
-        repost = Post(
-            content='',  # Reposts don't have content
-            user_id=current_user_id,
-            original_post_id=post_id,
-            is_repost=True
-        )
-        
-        db.session.add(repost)
         db.session.commit()
+        if result.changed:
+            invalidate_user(current_user_id)
         
-        # Create notification
-        if original_post.user_id != current_user_id:
-            notification = Notification(
-                user_id=original_post.user_id,
-                type='repost',
-                message=f'{user.name} merepost postingan Anda',
-                data={'post_id': repost.id, 'original_post_id': post_id}
-            )
-            db.session.add(notification)
-            db.session.commit()
+        repost = db.session.get(Post, result.row_id)
         
         return jsonify({
             'message': 'Post berhasil direpost',
-            'repost': repost.to_dict()
-        }), 201
+            'repost': repost.to_dict(),
+            'reposts_count': result.count
+        }), 201 if result.changed else 200
     
     except Exception as e:
         db.session.rollback()
@@ -286,24 +293,20 @@ def repost(post_id):
 
 @posts_bp.route('/<int:post_id>/unrepost', methods=['POST'])
 @jwt_required()
+@idempotent
 def unrepost(post_id):
     try:
         current_user_id = get_jwt_identity()
         
-        # Find the repost
-        repost = Post.query.filter_by(
-            user_id=current_user_id,
-            original_post_id=post_id,
-            is_repost=True
-        ).first()
-        
-        if not repost:
-            return jsonify({'error': 'Repost tidak ditemukan'}), 404
-        
-        db.session.delete(repost)
+        result = interactions.unrepost(current_user_id, post_id)
         db.session.commit()
+        if result.changed:
+            invalidate_user(current_user_id)
         
-        return jsonify({'message': 'Repost berhasil dihapus'}), 200
+        return jsonify({
+            'message': 'Repost berhasil dihapus',
+            'reposts_count': result.count or 0
+        }), 200
     
     except Exception as e:
         db.session.rollback()
@@ -316,25 +319,21 @@ def get_comments(post_id):
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 100)
         
-        post = Post.query.get_or_404(post_id)
+        post = db.session.get(Post, post_id)
+        if not post or post.deleted_at:
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
         
-        comments = Comment.query.filter_by(post_id=post_id, parent_id=None)\
-            .order_by(desc(Comment.created_at))\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        fields = comment_fields()
+        stmt = select_comments(fields)\
+            .where(Comment.post_id == post_id, Comment.parent_id.is_(None))\
+            .order_by(desc(Comment.created_at))
         
-        comments_data = [comment.to_dict() for comment in comments.items]
+        rows, pagination = paginate(stmt, page, per_page)
         
-        return jsonify({
-            'comments': comments_data,
-            'pagination': {
-                'page': comments.page,
-                'pages': comments.pages,
-                'per_page': comments.per_page,
-                'total': comments.total,
-                'has_next': comments.has_next,
-                'has_prev': comments.has_prev
-            }
-        }), 200
+        return json_response({
+            'comments': fields.to_dicts(rows),
+            'pagination': pagination
+        })
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -344,7 +343,9 @@ def get_comments(post_id):
 def create_comment(post_id):
     try:
         current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
+        post = db.session.get(Post, post_id)
+        if not post or post.deleted_at:
+            return jsonify({'error': 'Post tidak ditemukan'}), 404
         
         data = request.get_json()
         content = data.get('content', '').strip()
@@ -364,18 +365,19 @@ def create_comment(post_id):
         )
         
         db.session.add(comment)
+        db.session.flush()
+        interactions.bump_engagement([post_id], comments_count=1)
+        record_mentions(current_user_id, current_user.name, content, post_id, comment_id=comment.id)
         db.session.commit()
         
         # Create notification
         if post.user_id != current_user_id:
-            user = User.query.get(current_user_id)
-            notification = Notification(
-                user_id=post.user_id,
-                type='comment',
-                message=f'{user.name} mengomentari postingan Anda',
-                data={'post_id': post_id, 'comment_id': comment.id}
+            notify(
+                post.user_id,
+                'comment',
+                f'{current_user.name} mengomentari postingan Anda',
+                {'post_id': post_id, 'comment_id': comment.id}
             )
-            db.session.add(notification)
             db.session.commit()
         
         return jsonify({
@@ -389,6 +391,7 @@ def create_comment(post_id):
 
 @posts_bp.route('/search', methods=['GET'])
 @jwt_required(optional=True)
+@rate_limit('search', scope='user')
 def search_posts():
     try:
         query = request.args.get('q', '').strip()
@@ -398,42 +401,28 @@ def search_posts():
         if not query:
             return jsonify({'error': 'Query pencarian wajib diisi'}), 400
         
-        # Search in post content
-        posts = Post.query.filter(
-            Post.content.contains(query)
-        ).order_by(desc(Post.created_at))\
-         .paginate(page=page, per_page=per_page, error_out=False)
+        fields = post_fields()
+        tag = normalize_tag(query) if HASHTAG_PATTERN.fullmatch(query) else None
+        if tag:
+            # A lone "#tag" is answered from the hashtag index instead of a LIKE scan
+            stmt = select_posts(fields)\
+                .join(post_hashtags, post_hashtags.c.post_id == Post.id)\
+                .join(Hashtag, Hashtag.id == post_hashtags.c.tag_id)\
+                .where(Hashtag.name == tag)\
+                .order_by(desc(post_hashtags.c.created_at), desc(post_hashtags.c.post_id))
+        else:
+            # Search in post content
+            stmt = select_posts(fields)\
+                .where(Post.content.contains(query))\
+                .order_by(desc(Post.created_at))
         
-        current_user_id = get_jwt_identity()
-        posts_data = []
-        
-        for post in posts.items:
-            post_dict = post.to_dict()
-            if current_user_id:
-                post_dict['is_liked'] = post.liked_by.filter_by(id=current_user_id).first() is not None
-                post_dict['is_reposted'] = Post.query.filter_by(
-                    user_id=current_user_id, 
-                    original_post_id=post.id,
-                    is_repost=True
-                ).first() is not None
-            else:
-                post_dict['is_liked'] = False
-                post_dict['is_reposted'] = False
-            
-            posts_data.append(post_dict)
+        rows, pagination = paginate(stmt, page, per_page)
         
-        return jsonify({
-            'posts': posts_data,
-            'pagination': {
-                'page': posts.page,
-                'pages': posts.pages,
-                'per_page': posts.per_page,
-                'total': posts.total,
-                'has_next': posts.has_next,
-                'has_prev': posts.has_prev
-            },
+        return json_response({
+            'posts': serialize_posts(rows, fields, get_jwt_identity()),
+            'pagination': pagination,
             'query': query
-        }), 200
+        })
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
\ No newline at end of file
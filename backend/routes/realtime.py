@@ -0,0 +1,54 @@
+from flask_jwt_extended import decode_token
+from flask_socketio import join_room, leave_room, rooms
+from sqlalchemy import select
+from extensions import socketio
+from models import db, follows
+from utils.realtime import user_room, author_room, EXPLORE_ROOM
+from utils.revocation import is_token_revoked
+
+@socketio.on('connect')
+def handle_connect(auth):
+    # Anonymous sockets are allowed; they just don't get a personal room
+    token = (auth or {}).get('token')
+    if not token:
+        return True
+    
+    try:
+        payload = decode_token(token)
+    except Exception:
+        return False
+    
+    # decode_token checks the signature and expiry only; the HTTP routes also
+    # reject refresh tokens and revoked ones (logout, password change)
+    if payload.get('type') != 'access' or is_token_revoked(payload):
+        return False
+    
+    join_room(user_room(payload['sub']))
+    return True
+
+@socketio.on('feed:subscribe')
+def handle_feed_subscribe(data):
+    """Receive feed:new_post events for one feed: 'explore', 'timeline' or none"""
+    channel = (data or {}).get('channel')
+    joined = rooms()
+    
+    for room in joined:
+        if room == EXPLORE_ROOM or room.startswith('author:'):
+            leave_room(room)
+    
+    if channel == 'explore':
+        join_room(EXPLORE_ROOM)
+    
+    elif channel == 'timeline':
+        # The personal room joined on connect identifies the user
+        user_id = next((int(room.split(':', 1)[1]) for room in joined if room.startswith('user:')), None)
+        if user_id is None:
+            return {'error': 'Token diperlukan'}
+        
+        following_ids = db.session.execute(
+            select(follows.c.following_id).where(follows.c.follower_id == user_id)
+        ).scalars().all()
+        for author_id in [user_id, *following_ids]:
+            join_room(author_room(author_id))
+    
+    return {'channel': channel}
@@ -1,13 +1,21 @@
 from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-from PIL import Image
 import os
 import uuid
 from config import Config
+from utils.metrics import record_upload
+from utils.offload import run_cpu_bound
+from utils.auth import invalidate_user
+from utils.rate_limit import rate_limit
+import logging
+
+logger = logging.getLogger(__name__)
 
 upload_bp = Blueprint('upload', __name__)
 
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi'}
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
@@ -17,8 +25,27 @@ def generate_filename(original_filename):
     ext = original_filename.rsplit('.', 1)[1].lower()
     return f"{uuid.uuid4().hex}.{ext}"
 
+def image_metadata(img):
+    """Width, height, dominant color and blurhash of an opened image, so clients
+    can lay out and tint a placeholder before the file itself arrives"""
+    from utils import blurhash
+    thumb = img.convert('RGB')
+    thumb.thumbnail((32, 32))
+    # Most frequent of a few palette colors; the average muddies two-tone images
+    palette = thumb.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    r, g, b = palette.getpalette()[index * 3:index * 3 + 3]
+    return {
+        'width': img.width,
+        'height': img.height,
+        'dominant_color': f'#{r:02x}{g:02x}{b:02x}',
+        'blurhash': blurhash.encode(list(thumb.getdata()), thumb.width, thumb.height)
+    }
+
 def optimize_image(image_path, max_width=1200, max_height=1200, quality=85):
-    """Optimize image size and quality"""
+    """Optimize image size and quality; returns the stored image's metadata, or None on failure"""
+    # Imported lazily so workers that never handle images skip loading Pillow
+    from PIL import Image
     try:
         with Image.open(image_path) as img:
             # Convert RGBA to RGB if necessary
@@ -32,13 +59,31 @@ def optimize_image(image_path, max_width=1200, max_height=1200, quality=85):
             # Save optimized image
             img.save(image_path, optimize=True, quality=quality)
             
-        return True
+            # Computed from the decoded pixels already in memory, not a second read
+            return image_metadata(img)
+    except Exception as e:
+        logger.warning(f"Error optimizing image {image_path}: {e}")
+        return None
+
+def describe_image(image_path):
+    """Metadata of an image that is stored as uploaded (GIFs keep their frames).
+
+    Animated ones are queued for conversion to video by utils.media.
+    """
+    from PIL import Image
+    try:
+        with Image.open(image_path) as img:
+            metadata = image_metadata(img)
+            if getattr(img, 'is_animated', False):
+                metadata['conversion_status'] = 'pending'
+            return metadata
     except Exception as e:
-        print(f"Error optimizing image: {e}")
-        return False
+        logger.warning(f"Error reading image {image_path}: {e}")
+        return None
 
 @upload_bp.route('/image', methods=['POST'])
 @jwt_required()
+@rate_limit('upload', scope='user')
 def upload_image():
     try:
         current_user_id = get_jwt_identity()
@@ -76,24 +121,44 @@ def upload_image():
         
         # Optimize image if it's an image file
         file_ext = filename.rsplit('.', 1)[1].lower()
+        metadata = None
         if file_ext in ['jpg', 'jpeg', 'png']:
-            optimize_image(file_path)
+            metadata = run_cpu_bound(optimize_image, file_path)
+        elif file_ext == 'gif':
+            metadata = run_cpu_bound(describe_image, file_path)
         
         # Return URL path
         file_url = f"/api/upload/files/{current_user_id}/{filename}"
+        stored_size = os.path.getsize(file_path)
+        record_upload('image', stored_size)
+        
+        # Stored once here; posts that use the file reference this row
+        from models import db, Media
+        media = Media(
+            user_id=current_user_id,
+            url=file_url,
+            media_type='video' if file_ext in VIDEO_EXTENSIONS else 'image',
+            **(metadata or {})
+        )
+        db.session.add(media)
+        db.session.commit()
         
         return jsonify({
             'message': 'File berhasil diupload',
             'file_url': file_url,
             'filename': filename,
-            'file_size': os.path.getsize(file_path)
+            'file_size': stored_size,
+            'media': media.to_dict()
         }), 201
     
     except Exception as e:
+        from models import db
+        db.session.rollback()
         return jsonify({'error': 'Terjadi kesalahan saat mengupload file'}), 500
 
 @upload_bp.route('/avatar', methods=['POST'])
 @jwt_required()
+@rate_limit('upload', scope='user')
 def upload_avatar():
     try:
         current_user_id = get_jwt_identity()
@@ -133,13 +198,15 @@ def upload_avatar():
         file.save(file_path)
         
         # Optimize avatar (smaller size for avatars)
-        optimize_image(file_path, max_width=400, max_height=400, quality=90)
+        run_cpu_bound(optimize_image, file_path, max_width=400, max_height=400, quality=90)
+        record_upload('avatar', os.path.getsize(file_path))
         
         # Update user avatar URL
         from models import db, User
         user = User.query.get(current_user_id)
         user.avatar_url = f"/api/upload/files/{current_user_id}/{filename}"
         db.session.commit()
+        invalidate_user(current_user_id)
         
         return jsonify({
             'message': 'Avatar berhasil diupload',
@@ -154,6 +221,7 @@ def upload_avatar():
 
 @upload_bp.route('/banner', methods=['POST'])
 @jwt_required()
+@rate_limit('upload', scope='user')
 def upload_banner():
     try:
         current_user_id = get_jwt_identity()
@@ -193,13 +261,15 @@ def upload_banner():
         file.save(file_path)
         
         # Optimize banner (wider aspect ratio)
-        optimize_image(file_path, max_width=1500, max_height=500, quality=85)
+        run_cpu_bound(optimize_image, file_path, max_width=1500, max_height=500, quality=85)
+        record_upload('banner', os.path.getsize(file_path))
         
         # Update user banner URL
         from models import db, User
         user = User.query.get(current_user_id)
         user.banner_url = f"/api/upload/files/{current_user_id}/{filename}"
         db.session.commit()
+        invalidate_user(current_user_id)
         
         return jsonify({
             'message': 'Banner berhasil diupload',
@@ -275,19 +345,34 @@ def cleanup_unused_files():
             if post.media_url:
                 used_files.add(os.path.basename(post.media_url))
         
+        # Converted GIFs keep their video versions and poster while the GIF is in use
+        from models import Media
+        for media in Media.query.filter(Media.user_id == current_user_id, Media.video_url.isnot(None)):
+            if os.path.basename(media.url) in used_files:
+                used_files.update(os.path.basename(url) for url in (media.video_url, media.webm_url, media.poster_url))
+        
         # Find unused files
         all_files = set(os.listdir(user_upload_dir))
         unused_files = all_files - used_files
         
         # Delete unused files
         deleted_count = 0
+        deleted_urls = []
         for filename in unused_files:
             file_path = os.path.join(user_upload_dir, filename)
             try:
                 os.remove(file_path)
                 deleted_count += 1
+                deleted_urls.append(f"/api/upload/files/{current_user_id}/{filename}")
             except Exception as e:
-                print(f"Error deleting {filename}: {e}")
+                logger.warning(f"Error deleting {file_path}: {e}")
+        
+        # Their metadata rows go with them
+        if deleted_urls:
+            from models import db, Media
+            Media.query.filter(Media.user_id == current_user_id, Media.url.in_(deleted_urls))\
+                .delete(synchronize_session=False)
+            db.session.commit()
         
         return jsonify({
             'message': f'{deleted_count} file tidak terpakai berhasil dihapus',
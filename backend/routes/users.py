@@ -1,56 +1,79 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Post, Notification
-from sqlalchemy import desc, or_
+from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from flask_jwt_extended import current_user as token_user
+from datetime import datetime, timedelta
+from models import (
+    db, User, Post, Notification, NotificationDigest, PostImpressionHourly, AuthorImpressionDaily, follows
+)
+from sqlalchemy import desc, or_, select, func
 from config import Config
+from utils import interactions
+from utils.auth import invalidate_user
+from utils.idempotency import idempotent
+from utils.rate_limit import rate_limit
+from utils import follow_graph
+from utils.compression import cached_json
+from utils.conditional import make_etag, not_modified, add_validators
+from utils.hll import HyperLogLog
+from utils.impressions import record_views
+from utils.notifications import mark_read, unread_count
+from utils.profiles import page_tab_post_ids
+from utils.serializers import (
+    user_fields, post_fields, notification_fields, select_users, serialize_users, user_flags,
+    fetch_posts, serialize_posts, encode_cursor, decode_cursor, paginate, json_response
+)
 
 users_bp = Blueprint('users', __name__)
 
+def profile_response(condition):
+    """Profile payload for the user matching ``condition``, or 304 when the
+    client's ETag still matches its counters and ``updated_at``"""
+    current_user_id = get_jwt_identity()
+    fields = user_fields()
+    
+    posts_count = select(func.count()).where(Post.user_id == User.id, Post.deleted_at.is_(None)).scalar_subquery()
+    row = db.session.execute(
+        select_users(fields)
+        .add_columns(posts_count, User.followers_count, User.following_count, User.updated_at)
+        .where(condition)
+    ).first()
+    if row is None:
+        return jsonify({'error': 'User tidak ditemukan'}), 404
+    
+    user_dict = fields.to_dicts([row])[0]
+    stats = dict(zip(('posts_count', 'followers_count', 'following_count'), row[-4:-1]))
+    updated_at = row[-1]
+    
+    flags = user_flags([user_dict['id']], current_user_id, fields.flags)
+    etag = make_etag(current_user_id, fields.spec, user_dict['id'], updated_at, *stats.values(),
+                     *(flags[flag] for flag in fields.flags))
+    cached = not_modified(etag, updated_at)
+    if cached:
+        return cached
+    
+    user_dict.update({name: value for name, value in stats.items() if fields.wants(name)})
+    for flag in fields.flags:
+        user_dict[flag] = user_dict['id'] in flags[flag]
+    
+    return add_validators(cached_json(etag, lambda: {'user': user_dict}), etag, updated_at)
+
 @users_bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required(optional=True)
 def get_user(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        user_dict = user.to_dict()
-        
-        # Add relationship info if current user is authenticated
-        if current_user_id and current_user_id != user_id:
-            current_user = User.query.get(current_user_id)
-            user_dict['is_following'] = current_user.is_following(user)
-            user_dict['is_followed_by'] = user.is_following(current_user)
-        else:
-            user_dict['is_following'] = False
-            user_dict['is_followed_by'] = False
-        
-        return jsonify({'user': user_dict}), 200
+        return profile_response(User.id == user_id)
     
     except Exception as e:
-        return jsonify({'error': 'User tidak ditemukan'}), 404
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
 @users_bp.route('/<username>', methods=['GET'])
 @jwt_required(optional=True)
 def get_user_by_username(username):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(username=username.lower()).first_or_404()
-        
-        user_dict = user.to_dict()
-        
-        # Add relationship info if current user is authenticated
-        if current_user_id and current_user_id != user.id:
-            current_user = User.query.get(current_user_id)
-            user_dict['is_following'] = current_user.is_following(user)
-            user_dict['is_followed_by'] = user.is_following(current_user)
-        else:
-            user_dict['is_following'] = False
-            user_dict['is_followed_by'] = False
-        
-        return jsonify({'user': user_dict}), 200
+        return profile_response(User.username == username.lower())
     
     except Exception as e:
-        return jsonify({'error': 'User tidak ditemukan'}), 404
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
 @users_bp.route('/me', methods=['PUT'])
 @jwt_required()
@@ -96,10 +119,13 @@ def update_profile():
             user.is_private = bool(data['is_private'])
         
         db.session.commit()
+        invalidate_user(current_user_id)
         
         return jsonify({
             'message': 'Profil berhasil diperbarui',
-            'user': user.to_dict()
+            'user': user.to_dict(),
+            # Fresh token so the embedded profile claims match the update
+            'access_token': create_access_token(identity=user)
         }), 200
     
     except Exception as e:
@@ -108,6 +134,8 @@ def update_profile():
 
 @users_bp.route('/<int:user_id>/follow', methods=['POST'])
 @jwt_required()
+@rate_limit('follow', scope='user')
+@idempotent
 def follow_user(user_id):
     try:
         current_user_id = get_jwt_identity()
@@ -115,28 +143,20 @@ def follow_user(user_id):
         if current_user_id == user_id:
             return jsonify({'error': 'Tidak dapat mengikuti diri sendiri'}), 400
         
-        current_user = User.query.get_or_404(current_user_id)
-        target_user = User.query.get_or_404(user_id)
-        
-        if current_user.is_following(target_user):
-            return jsonify({'error': 'Sudah mengikuti user ini'}), 400
-        
-        current_user.follow(target_user)
-        db.session.commit()
+        # Single INSERT IGNORE; following twice is a no-op instead of an error
+        result = interactions.follow(current_user_id, user_id, token_user.name)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': 'User tidak ditemukan'}), 404
         
-        # Create notification
-        notification = Notification(
-            user_id=user_id,
-            type='follow',
-            message=f'{current_user.name} mengikuti Anda',
-            data={'user_id': current_user_id}
-        )
-        db.session.add(notification)
         db.session.commit()
+        if result.changed:
+            invalidate_user(current_user_id, user_id)
         
         return jsonify({
-            'message': f'Berhasil mengikuti {target_user.name}',
-            'is_following': True
+            'message': f'Berhasil mengikuti {result.target_name}',
+            'is_following': True,
+            'followers_count': result.count
         }), 200
     
     except Exception as e:
@@ -145,6 +165,8 @@ def follow_user(user_id):
 
 @users_bp.route('/<int:user_id>/unfollow', methods=['POST'])
 @jwt_required()
+@rate_limit('follow', scope='user')
+@idempotent
 def unfollow_user(user_id):
     try:
         current_user_id = get_jwt_identity()
@@ -152,18 +174,19 @@ def unfollow_user(user_id):
         if current_user_id == user_id:
             return jsonify({'error': 'Tidak dapat berhenti mengikuti diri sendiri'}), 400
         
-        current_user = User.query.get_or_404(current_user_id)
-        target_user = User.query.get_or_404(user_id)
-        
-        if not current_user.is_following(target_user):
-            return jsonify({'error': 'Tidak mengikuti user ini'}), 400
+        result = interactions.unfollow(current_user_id, user_id)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': 'User tidak ditemukan'}), 404
         
-        current_user.unfollow(target_user)
         db.session.commit()
+        if result.changed:
+            invalidate_user(current_user_id, user_id)
         
         return jsonify({
-            'message': f'Berhenti mengikuti {target_user.name}',
-            'is_following': False
+            'message': f'Berhenti mengikuti {result.target_name}',
+            'is_following': False,
+            'followers_count': result.count
         }), 200
     
     except Exception as e:
@@ -182,42 +205,20 @@ def get_followers(user_id):
         
         # Check if profile is private
         if user.is_private and current_user_id != user_id:
-            current_user = User.query.get(current_user_id) if current_user_id else None
-            if not current_user or not current_user.is_following(user):
+            if not current_user_id or not follow_graph.is_following_now(current_user_id, user_id):
                 return jsonify({'error': 'Profil ini bersifat privat'}), 403
         
-        followers = user.followers.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        fields = user_fields()
+        stmt = select_users(fields)\
+            .join(follows, follows.c.follower_id == User.id)\
+            .where(follows.c.following_id == user_id)
         
-        followers_data = []
-        for follower in followers.items:
-            follower_dict = follower.to_dict(include_stats=False)
-            
-            # Add relationship info if current user is authenticated
-            if current_user_id and current_user_id != follower.id:
-                current_user = User.query.get(current_user_id)
-                follower_dict['is_following'] = current_user.is_following(follower)
-                follower_dict['is_followed_by'] = follower.is_following(current_user)
-            else:
-                follower_dict['is_following'] = False
-                follower_dict['is_followed_by'] = False
-            
-            followers_data.append(follower_dict)
+        rows, pagination = paginate(stmt, page, per_page)
         
-        return jsonify({
-            'followers': followers_data,
-            'pagination': {
-                'page': followers.page,
-                'pages': followers.pages,
-                'per_page': followers.per_page,
-                'total': followers.total,
-                'has_next': followers.has_next,
-                'has_prev': followers.has_prev
-            }
-        }), 200
+        return json_response({
+            'followers': serialize_users(rows, fields, current_user_id),
+            'pagination': pagination
+        })
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -234,42 +235,86 @@ def get_following(user_id):
         
         # Check if profile is private
         if user.is_private and current_user_id != user_id:
-            current_user = User.query.get(current_user_id) if current_user_id else None
-            if not current_user or not current_user.is_following(user):
+            if not current_user_id or not follow_graph.is_following_now(current_user_id, user_id):
                 return jsonify({'error': 'Profil ini bersifat privat'}), 403
         
-        following = user.following.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        fields = user_fields()
+        stmt = select_users(fields)\
+            .join(follows, follows.c.following_id == User.id)\
+            .where(follows.c.follower_id == user_id)
         
-        following_data = []
-        for followed_user in following.items:
-            followed_dict = followed_user.to_dict(include_stats=False)
-            
-            # Add relationship info if current user is authenticated
-            if current_user_id and current_user_id != followed_user.id:
-                current_user = User.query.get(current_user_id)
-                followed_dict['is_following'] = current_user.is_following(followed_user)
-                followed_dict['is_followed_by'] = followed_user.is_following(current_user)
-            else:
-                followed_dict['is_following'] = False
-                followed_dict['is_followed_by'] = False
-            
-            following_data.append(followed_dict)
+        rows, pagination = paginate(stmt, page, per_page)
         
-        return jsonify({
-            'following': following_data,
-            'pagination': {
-                'page': following.page,
-                'pages': following.pages,
-                'per_page': following.per_page,
-                'total': following.total,
-                'has_next': following.has_next,
-                'has_prev': following.has_prev
-            }
-        }), 200
+        return json_response({
+            'following': serialize_users(rows, fields, current_user_id),
+            'pagination': pagination
+        })
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@users_bp.route('/<int:user_id>/<any(posts, replies, media, likes):tab>', methods=['GET'])
+@jwt_required(optional=True)
+def get_profile_tab(user_id, tab):
+    """A profile tab, newest first and paginated by ``cursor``: one index range
+    scan for the page's IDs, then one batched hydration"""
+    try:
+        per_page = min(request.args.get('per_page', Config.POSTS_PER_PAGE, type=int), 100)
+        cursor = request.args.get('cursor')
+        
+        user = db.session.execute(
+            select(User.id, User.is_private).where(User.id == user_id, User.deleted_at.is_(None))
+        ).first()
+        if user is None:
+            return jsonify({'error': 'User tidak ditemukan'}), 404
+        current_user_id = get_jwt_identity()
+        
+        # Check if profile is private
+        if user.is_private and current_user_id != user_id:
+            if not current_user_id or not follow_graph.is_following_now(current_user_id, user_id):
+                return jsonify({'error': 'Profil ini bersifat privat'}), 403
+        
+        position = decode_cursor(cursor) if cursor else None
+        if cursor and position is None:
+            return jsonify({'error': 'Cursor tidak valid'}), 400
+        
+        rows = page_tab_post_ids(user_id, tab, position, per_page + 1)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        fields = post_fields()
+        ids = [row[0] for row in rows]
+        record_views(ids, current_user_id)
+        posts = serialize_posts(fetch_posts(fields, ids), fields, current_user_id)
+        
+        return json_response({
+            'posts': posts,
+            'next_cursor': encode_cursor(rows[-1][1], rows[-1][0]) if has_next else None
+        })
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@users_bp.route('/<int:user_id>/mutuals', methods=['GET'])
+@jwt_required()
+def get_mutual_followers(user_id):
+    """People the current user follows who also follow ``user_id``"""
+    try:
+        current_user_id = get_jwt_identity()
+        limit = min(request.args.get('limit', 3, type=int), 50)
+        
+        mutual_ids = follow_graph.followed_by_following(current_user_id, user_id)
+        
+        users_data = []
+        if mutual_ids and limit > 0:
+            fields = user_fields()
+            rows = db.session.execute(select_users(fields).where(User.id.in_(mutual_ids[:limit]))).all()
+            users_data = serialize_users(rows, fields, current_user_id)
+        
+        return json_response({
+            'users': users_data,
+            'total': len(mutual_ids)
+        })
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -286,43 +331,22 @@ def search_users():
             return jsonify({'error': 'Query pencarian wajib diisi'}), 400
         
         # Search in username, name, and bio
-        users = User.query.filter(
+        fields = user_fields()
+        stmt = select_users(fields).where(
             or_(
                 User.username.contains(query.lower()),
                 User.name.contains(query),
                 User.bio.contains(query)
             )
-        ).paginate(page=page, per_page=per_page, error_out=False)
-        
-        current_user_id = get_jwt_identity()
-        users_data = []
+        )
         
-        for user in users.items:
-            user_dict = user.to_dict(include_stats=False)
-            
-            # Add relationship info if current user is authenticated
-            if current_user_id and current_user_id != user.id:
-                current_user = User.query.get(current_user_id)
-                user_dict['is_following'] = current_user.is_following(user)
-                user_dict['is_followed_by'] = user.is_following(current_user)
-            else:
-                user_dict['is_following'] = False
-                user_dict['is_followed_by'] = False
-            
-            users_data.append(user_dict)
+        rows, pagination = paginate(stmt, page, per_page)
         
-        return jsonify({
-            'users': users_data,
-            'pagination': {
-                'page': users.page,
-                'pages': users.pages,
-                'per_page': users.per_page,
-                'total': users.total,
-                'has_next': users.has_next,
-                'has_prev': users.has_prev
-            },
+        return json_response({
+            'users': serialize_users(rows, fields, get_jwt_identity()),
+            'pagination': pagination,
             'query': query
-        }), 200
+        })
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -332,32 +356,67 @@ def search_users():
 def get_user_suggestions():
     try:
         current_user_id = get_jwt_identity()
-        current_user = User.query.get_or_404(current_user_id)
         
-        # Get users that current user is not following
         # Exclude current user and already followed users
-        following_ids = [u.id for u in current_user.following]
-        following_ids.append(current_user_id)
-        
-        # Get users with most followers (excluding already followed)
-        suggested_users = User.query.filter(
-            ~User.id.in_(following_ids)
-        ).order_by(desc(
-            db.session.query(db.func.count()).select_from(
-                db.table('follows')
-            ).where(
-                db.table('follows').c.following_id == User.id
-            ).scalar_subquery()
-        )).limit(10).all()
-        
-        suggestions_data = []
-        for user in suggested_users:
-            user_dict = user.to_dict(include_stats=False)
-            user_dict['is_following'] = False
-            user_dict['is_followed_by'] = user.is_following(current_user)
-            suggestions_data.append(user_dict)
-        
-        return jsonify({'suggestions': suggestions_data}), 200
+        following_ids = select(follows.c.following_id).where(follows.c.follower_id == current_user_id)
+        
+        # Users with most followers, read from the denormalized counter
+        fields = user_fields()
+        rows = db.session.execute(
+            select_users(fields)
+            .where(User.id != current_user_id, User.id.not_in(following_ids))
+            .order_by(desc(User.followers_count))
+            .limit(10)
+        ).all()
+        
+        return json_response({'suggestions': serialize_users(rows, fields, current_user_id)})
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@users_bp.route('/me/analytics', methods=['GET'])
+@jwt_required()
+def get_analytics():
+    """Views of the current user's posts, read from the impression rollups"""
+    try:
+        current_user_id = get_jwt_identity()
+        days = min(max(request.args.get('days', 30, type=int), 1), 365)
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        
+        rows = db.session.execute(
+            select(AuthorImpressionDaily.day, AuthorImpressionDaily.views,
+                   AuthorImpressionDaily.unique_viewers, AuthorImpressionDaily.viewers)
+            .where(AuthorImpressionDaily.user_id == current_user_id, AuthorImpressionDaily.day >= since)
+            .order_by(AuthorImpressionDaily.day)
+        ).all()
+        
+        # Daily sketches merge into one, so viewers who came back aren't counted twice
+        viewers = HyperLogLog()
+        for row in rows:
+            viewers.merge(HyperLogLog.from_bytes(row.viewers))
+        
+        top_posts = db.session.execute(
+            select(PostImpressionHourly.post_id, func.sum(PostImpressionHourly.views).label('views'))
+            .join(Post, Post.id == PostImpressionHourly.post_id)
+            .where(Post.user_id == current_user_id, Post.deleted_at.is_(None),
+                   PostImpressionHourly.hour >= datetime.combine(since, datetime.min.time()))
+            .group_by(PostImpressionHourly.post_id)
+            .order_by(desc('views'))
+            .limit(10)
+        ).all()
+        
+        return json_response({
+            'days': days,
+            'totals': {
+                'views': sum(row.views for row in rows),
+                'unique_viewers': viewers.estimate()
+            },
+            'daily': [
+                {'day': row.day, 'views': row.views, 'unique_viewers': row.unique_viewers}
+                for row in rows
+            ],
+            'top_posts': [{'post_id': row.post_id, 'views': int(row.views)} for row in top_posts]
+        })
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
@@ -370,27 +429,58 @@ def get_notifications():
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 50)
         
-        notifications = Notification.query.filter_by(user_id=current_user_id)\
-            .order_by(desc(Notification.created_at))\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        fields = notification_fields()
+        stmt = select(*fields.columns)\
+            .where(Notification.user_id == current_user_id)\
+            .order_by(desc(Notification.created_at))
+        
+        rows, pagination = paginate(stmt, page, per_page)
+        
+        return json_response({
+            'notifications': fields.to_dicts(rows),
+            'pagination': pagination
+        })
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
+@users_bp.route('/notifications/digests', methods=['GET'])
+@jwt_required()
+def get_notification_digests():
+    try:
+        current_user_id = get_jwt_identity()
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), 50)
         
-        notifications_data = [notif.to_dict() for notif in notifications.items]
+        digests = NotificationDigest.query.filter_by(user_id=current_user_id)\
+            .order_by(desc(NotificationDigest.period_start))\
+            .paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'notifications': notifications_data,
+            'digests': [digest.to_dict() for digest in digests.items],
             'pagination': {
-                'page': notifications.page,
-                'pages': notifications.pages,
-                'per_page': notifications.per_page,
-                'total': notifications.total,
-                'has_next': notifications.has_next,
-                'has_prev': notifications.has_prev
+                'page': digests.page,
+                'pages': digests.pages,
+                'per_page': digests.per_page,
+                'total': digests.total,
+                'has_next': digests.has_next,
+                'has_prev': digests.has_prev
             }
         }), 200
     
     except Exception as e:
         return jsonify({'error': 'Terjadi kesalahan server'}), 500
 
+@users_bp.route('/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    try:
+        current_user_id = get_jwt_identity()
+        return jsonify({'unread_count': unread_count(current_user_id)}), 200
+    
+    except Exception as e:
+        return jsonify({'error': 'Terjadi kesalahan server'}), 500
+
 @users_bp.route('/notifications/mark-read', methods=['POST'])
 @jwt_required()
 def mark_notifications_read():
@@ -399,18 +489,8 @@ def mark_notifications_read():
         data = request.get_json()
         notification_ids = data.get('notification_ids', [])
         
-        if notification_ids:
-            # Mark specific notifications as read
-            Notification.query.filter(
-                Notification.id.in_(notification_ids),
-                Notification.user_id == current_user_id
-            ).update({'is_read': True}, synchronize_session=False)
-        else:
-            # Mark all notifications as read
-            Notification.query.filter_by(
-                user_id=current_user_id,
-                is_read=False
-            ).update({'is_read': True}, synchronize_session=False)
+        # Marks specific notifications, or all of them when no IDs are given
+        mark_read(current_user_id, notification_ids)
         
         db.session.commit()
         
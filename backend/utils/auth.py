@@ -0,0 +1,125 @@
+from flask import current_app
+from models import User
+from utils.cache import TTLCache
+
+# Full user payloads (to_dict with stats) keyed by user ID
+_user_cache = TTLCache('users', ttl=30, maxsize=50000)
+
+
+def user_version(user):
+    """Version of a user's profile; changes whenever the row is updated"""
+    updated_at = user.updated_at or user.created_at
+    return int(updated_at.timestamp()) if updated_at else 0
+
+
+def _claims(username, name, avatar_url, is_verified, version):
+    return {
+        'usr': {
+            'un': username,
+            'n': name,
+            'av': avatar_url,
+            'vf': bool(is_verified),
+            'v': version
+        }
+    }
+
+
+def user_claims(user):
+    """Compact profile claims embedded in access tokens"""
+    return _claims(user.username, user.name, user.avatar_url, user.is_verified, user_version(user))
+
+
+def _get_entry(user_id, version=None):
+    cached = _user_cache.get(user_id)
+    if cached is not None and (version is None or cached['version'] >= version):
+        return cached
+
+    user = User.query.get(user_id)
+    if not user or user.deleted_at:
+        return None
+
+    entry = {'version': user_version(user), 'user': user.to_dict()}
+    _user_cache.set(user_id, entry, ttl=current_app.config['USER_CACHE_TTL'])
+    return entry
+
+
+def get_user_dict(user_id, version=None):
+    """Cached ``User.to_dict()``; reloaded when older than ``version`` or expired.
+
+    Returns None when the user does not exist.
+    """
+    entry = _get_entry(user_id, version)
+    return entry['user'] if entry else None
+
+
+def cached_user_claims(user_id):
+    """Token claims for a user, built from the cached payload"""
+    entry = _get_entry(user_id)
+    if not entry:
+        return None
+    user = entry['user']
+    return _claims(user['username'], user['name'], user['avatar_url'], user['is_verified'], entry['version'])
+
+
+def invalidate_user(*user_ids):
+    for user_id in user_ids:
+        _user_cache.delete(user_id)
+
+
+class TokenUser:
+    """Authenticated identity read from access token claims, without a DB query.
+
+    Tokens issued before claims were added fall back to the cached user
+    payload the first time a profile field is read.
+    """
+
+    def __init__(self, user_id, claims):
+        self.id = user_id
+        self._claims = claims
+
+    def _profile(self):
+        if self._claims is None:
+            user = get_user_dict(self.id) or {}
+            self._claims = {
+                'un': user.get('username'),
+                'n': user.get('name'),
+                'av': user.get('avatar_url'),
+                'vf': user.get('is_verified', False),
+                'v': None
+            }
+        return self._claims
+
+    @property
+    def username(self):
+        return self._profile()['un']
+
+    @property
+    def name(self):
+        return self._profile()['n']
+
+    @property
+    def avatar_url(self):
+        return self._profile()['av']
+
+    @property
+    def is_verified(self):
+        return self._profile()['vf']
+
+    @property
+    def version(self):
+        return self._profile()['v']
+
+
+def init_jwt_loaders(jwt):
+    @jwt.user_identity_loader
+    def user_identity_callback(identity):
+        # Tokens can be created from a User so its claims get embedded
+        return identity.id if isinstance(identity, User) else identity
+
+    @jwt.additional_claims_loader
+    def additional_claims_callback(identity):
+        return user_claims(identity) if isinstance(identity, User) else {}
+
+    @jwt.user_lookup_loader
+    def user_lookup_callback(jwt_header, jwt_data):
+        return TokenUser(jwt_data['sub'], jwt_data.get('usr'))
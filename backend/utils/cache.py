@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import observe_cache
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, name, ttl, maxsize=10000):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        started = time.perf_counter()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                else:
+                    del self._data[key]
+                    entry = _MISSING
+        hit = entry is not _MISSING
+        observe_cache(self.name, hit, time.perf_counter() - started)
+        return value if hit else default
+
+    def get_many(self, keys):
+        """Return a dict with the cached values for whichever keys are present"""
+        return {key: value for key in keys
+                if (value := self.get(key, _MISSING)) is not _MISSING}
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
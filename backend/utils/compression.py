@@ -0,0 +1,170 @@
+import gzip
+import mimetypes
+import os
+import threading
+
+from flask import current_app, request, Response, send_from_directory, abort
+
+from utils.cache import TTLCache
+from utils.metrics import registry, Counter
+from utils.serializers import dumps
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/xml'
+}
+
+# Precompressed siblings the static build step writes, best first
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+COMPRESSED_BYTES = registry.register(Counter(
+    'http_compression_bytes_total', 'Response body bytes before and after compression',
+    ('encoding', 'stage')
+))
+
+# Encoded bodies of feed/post/profile responses, keyed by path and ETag
+_payloads = TTLCache('payloads', ttl=60, maxsize=2000)
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(available):
+    """Best encoding from ``available`` the client accepts, or None for identity"""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, config=None):
+    config = config or current_app.config
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESSION_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESSION_GZIP_LEVEL'], mtime=0)
+
+
+class EncodedBody:
+    """A response body plus its compressed variants, built on first use"""
+
+    def __init__(self, data):
+        self.data = data
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        if encoding is None:
+            return self.data
+        with self._lock:
+            if encoding not in self._variants:
+                self._variants[encoding] = compress(self.data, encoding)
+                COMPRESSED_BYTES.inc(len(self.data), encoding=encoding, stage='in')
+            body = self._variants[encoding]
+        COMPRESSED_BYTES.inc(len(body), encoding=encoding, stage='out')
+        return body
+
+
+def encoded_response(body, mimetype='application/json'):
+    config = current_app.config
+    encoding = None
+    if config['COMPRESSION_ENABLED'] and len(body.data) >= config['COMPRESSION_MIN_SIZE']:
+        encoding = negotiate(supported_encodings())
+
+    response = Response(body.variant(encoding), mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def cached_json(etag, build):
+    """JSON response for ``etag``, served from the encoded-body cache.
+
+    ``build()`` returns the payload and only runs on a miss; hits send the
+    stored, already compressed bytes without re-querying or re-encoding.
+    """
+    key = (request.full_path, etag)
+    body = _payloads.get(key)
+    if body is None:
+        body = EncodedBody(dumps(build()))
+        _payloads.set(key, body, ttl=current_app.config['PAYLOAD_CACHE_TTL'])
+    return encoded_response(body)
+
+
+def _compress_response(response):
+    config = current_app.config
+    if (not config['COMPRESSION_ENABLED']
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < config['COMPRESSION_MIN_SIZE']:
+        return response
+
+    encoding = negotiate(supported_encodings())
+    if encoding:
+        compressed = compress(data, encoding, config)
+        COMPRESSED_BYTES.inc(len(data), encoding=encoding, stage='in')
+        COMPRESSED_BYTES.inc(len(compressed), encoding=encoding, stage='out')
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def send_static(directory, filename):
+    """Send a built asset, preferring a precompressed ``.br``/``.gz`` sibling"""
+    path = os.path.join(directory, filename)
+    available = [encoding for encoding, suffix in STATIC_ENCODINGS if os.path.isfile(path + suffix)]
+    encoding = negotiate(available) if available else None
+
+    if encoding:
+        suffix = dict(STATIC_ENCODINGS)[encoding]
+        response = send_from_directory(directory, filename + suffix, mimetype=_guess_type(filename))
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(directory, filename)
+    response.vary.add('Accept-Encoding')
+
+    # Vite fingerprints everything under assets/, so those never change
+    if filename.startswith('assets/'):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _guess_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def init_compression(app):
+    app.after_request(_compress_response)
+
+    dist = app.config['FRONTEND_DIST']
+    if not dist:
+        return
+    dist = os.path.abspath(dist)
+
+    @app.route('/', defaults={'filename': 'index.html'})
+    @app.route('/<path:filename>')
+    def frontend(filename):
+        if filename.startswith('api/'):
+            abort(404)
+        if not os.path.isfile(os.path.join(dist, filename)):
+            # Client-side routes all render the SPA shell
+            filename = 'index.html'
+        return send_static(dist, filename)
@@ -0,0 +1,39 @@
+import hashlib
+
+from flask import request, Response
+
+from utils.metrics import registry, Counter
+
+NOT_MODIFIED = registry.register(Counter(
+    'http_not_modified_total', 'Conditional GETs answered with 304 Not Modified',
+    ('endpoint',)
+))
+
+
+def make_etag(*parts):
+    """Validator built from version parts: timestamps, counters, viewer ID, flag sets"""
+    normalized = [sorted(part) if isinstance(part, (set, frozenset)) else part for part in parts]
+    return hashlib.blake2b(repr(normalized).encode(), digest_size=12).hexdigest()
+
+
+def add_validators(response, etag, last_modified=None):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Browsers keep the body but revalidate on every use; payloads depend on the viewer
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response when If-None-Match matches ``etag``, else None.
+
+    Only the ETag is honoured: counters change without touching
+    ``updated_at``, so If-Modified-Since alone could serve stale counts.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    NOT_MODIFIED.inc(endpoint=rule)
+    return add_validators(Response(status=304), etag, last_modified)
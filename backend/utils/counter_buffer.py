@@ -0,0 +1,235 @@
+import atexit
+import logging
+import threading
+
+from sqlalchemy import case, event
+from sqlalchemy.orm import Session
+
+from models import db, Post
+from utils.metrics import registry, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+COUNTER_DELTAS_FLUSHED = registry.register(Counter(
+    'counter_buffer_flushed_total', 'Buffered post counter deltas written to the database',
+    ('field',)
+))
+COUNTER_DELTAS_PENDING = registry.register(Gauge(
+    'counter_buffer_pending', 'Post counters with a delta waiting to be flushed'
+))
+
+posts = Post.__table__
+
+FIELDS = ('likes_count', 'comments_count', 'reposts_count')
+
+
+class CounterBuffer:
+    """Write-behind deltas for post engagement counters.
+
+    Likes, reposts and comments add to ``(post_id, field)`` deltas here
+    instead of updating the hot post row; ``flush_counters`` writes them in
+    batched UPDATEs. Deltas live in worker memory, or in a shared Redis hash
+    when a storage URL is configured, so every worker reads the same
+    pending values. Unflushed in-memory deltas are lost if a worker is
+    killed; ``flask rebuild-counters`` recomputes exact values.
+    """
+
+    PENDING_KEY = 'counter_buffer:pending'   # hash, field "<post_id>:<counter>"
+
+    def __init__(self, storage_url=None):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._client = None
+        if storage_url and storage_url.startswith(('redis://', 'rediss://', 'unix://')):
+            import redis
+            self._client = redis.Redis.from_url(storage_url, decode_responses=True)
+
+    def add(self, deltas):
+        """Add ``{(post_id, field): delta}`` to the pending deltas"""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        if self._client is not None:
+            try:
+                pipe = self._client.pipeline(transaction=False)
+                for (post_id, field), delta in deltas.items():
+                    pipe.hincrby(self.PENDING_KEY, f'{post_id}:{field}', delta)
+                pipe.execute()
+                return
+            except Exception as e:
+                # Kept locally instead; this worker's flush still writes them
+                logger.error(f"Failed to buffer counter deltas in shared store: {e}")
+        with self._lock:
+            for key, delta in deltas.items():
+                self._pending[key] = self._pending.get(key, 0) + delta
+            COUNTER_DELTAS_PENDING.set(len(self._pending))
+
+    def pending(self, post_ids):
+        """``{post_id: {field: delta}}`` for the posts that have pending deltas"""
+        result = {}
+        if not post_ids:
+            return result
+        with self._lock:
+            for post_id in post_ids:
+                for field in FIELDS:
+                    delta = self._pending.get((post_id, field))
+                    if delta:
+                        result.setdefault(post_id, {})[field] = delta
+        if self._client is not None:
+            keys = [(post_id, field) for post_id in post_ids for field in FIELDS]
+            try:
+                values = self._client.hmget(self.PENDING_KEY, [f'{post_id}:{field}' for post_id, field in keys])
+            except Exception as e:
+                logger.error(f"Failed to read pending counter deltas: {e}")
+                values = []
+            for (post_id, field), value in zip(keys, values):
+                if value and int(value):
+                    deltas = result.setdefault(post_id, {})
+                    deltas[field] = deltas.get(field, 0) + int(value)
+        return result
+
+    def take(self):
+        """Remove and return every pending delta, atomically per store"""
+        with self._lock:
+            deltas, self._pending = self._pending, {}
+            COUNTER_DELTAS_PENDING.set(0)
+        if self._client is not None:
+            pipe = self._client.pipeline(transaction=True)
+            pipe.hgetall(self.PENDING_KEY)
+            pipe.delete(self.PENDING_KEY)
+            stored, _ = pipe.execute()
+            for member, value in stored.items():
+                post_id, field = member.split(':')
+                key = (int(post_id), field)
+                deltas[key] = deltas.get(key, 0) + int(value)
+        return deltas
+
+    def discard(self, post_ids=None, field=None):
+        """Drop pending deltas after counters were recomputed from source tables"""
+        with self._lock:
+            if post_ids is None:
+                self._pending = {}
+            else:
+                post_ids = set(post_ids)
+                self._pending = {
+                    key: delta for key, delta in self._pending.items()
+                    if key[0] not in post_ids or (field and key[1] != field)
+                }
+            COUNTER_DELTAS_PENDING.set(len(self._pending))
+        if self._client is None:
+            return
+        try:
+            if post_ids is None:
+                self._client.delete(self.PENDING_KEY)
+            else:
+                fields = (field,) if field else FIELDS
+                self._client.hdel(self.PENDING_KEY, *[f'{post_id}:{name}' for post_id in post_ids for name in fields])
+        except Exception as e:
+            logger.error(f"Failed to discard pending counter deltas: {e}")
+
+
+buffer = None
+
+
+def init_counter_buffer(app):
+    global buffer
+    if app.config['COUNTER_BUFFER_ENABLED']:
+        buffer = CounterBuffer(storage_url=app.config['COUNTER_BUFFER_STORAGE_URL'])
+        atexit.register(_flush_at_exit, app)
+
+
+def _flush_at_exit(app):
+    # A clean worker shutdown writes what it still holds
+    with app.app_context():
+        try:
+            flush_counters()
+        except Exception as e:
+            logger.error(f"Final counter flush failed: {e}")
+
+
+def enabled():
+    return buffer is not None
+
+
+def record(post_ids, **deltas):
+    """Queue counter deltas for ``post_ids``; the buffer sees them only if the transaction commits"""
+    queued = db.session.info.setdefault('counter_deltas', {})
+    for post_id in post_ids:
+        for field, delta in deltas.items():
+            queued[(post_id, field)] = queued.get((post_id, field), 0) + delta
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_counter_deltas(session):
+    deltas = session.info.pop('counter_deltas', None)
+    if deltas and buffer is not None:
+        buffer.add(deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_counter_deltas(session):
+    session.info.pop('counter_deltas', None)
+
+
+def pending(post_ids):
+    """Pending deltas for ``post_ids``, including this transaction's own"""
+    result = buffer.pending(post_ids) if buffer is not None else {}
+    for (post_id, field), delta in db.session.info.get('counter_deltas', {}).items():
+        if post_id in post_ids:
+            deltas = result.setdefault(post_id, {})
+            deltas[field] = deltas.get(field, 0) + delta
+    return result
+
+
+def overlay(items):
+    """Add pending deltas to serialized post dicts in place"""
+    if buffer is None or not items:
+        return items
+    deltas = pending([item['id'] for item in items])
+    for item in items:
+        for field, delta in deltas.get(item['id'], {}).items():
+            if field in item:
+                item[field] += delta
+    return items
+
+
+def discard(post_ids=None, field=None):
+    if buffer is not None:
+        buffer.discard(post_ids, field)
+
+
+def flush_counters(chunk_size=500):
+    """Write pending deltas with one UPDATE per chunk of posts.
+
+    Deltas go back into the buffer if the write fails, so nothing is lost
+    to a transient database error.
+    """
+    if buffer is None:
+        return 0
+    deltas = buffer.take()
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    # Sorted IDs lock rows in the same order as any concurrent flush
+    post_ids = sorted({post_id for post_id, _ in deltas})
+    try:
+        for start in range(0, len(post_ids), chunk_size):
+            chunk = post_ids[start:start + chunk_size]
+            values = {'updated_at': posts.c.updated_at}
+            for field in FIELDS:
+                mapping = {post_id: deltas[(post_id, field)] for post_id in chunk if (post_id, field) in deltas}
+                if mapping:
+                    values[field] = posts.c[field] + case(mapping, value=posts.c.id, else_=0)
+            db.session.execute(posts.update().where(posts.c.id.in_(chunk)).values(**values))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        buffer.add(deltas)
+        raise
+
+    for field in FIELDS:
+        flushed = sum(1 for _, name in deltas if name == field)
+        if flushed:
+            COUNTER_DELTAS_FLUSHED.inc(flushed, field=field)
+    return len(deltas)
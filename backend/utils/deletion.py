@@ -0,0 +1,392 @@
+import logging
+import os
+import shutil
+from collections import Counter as Tally
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_, func
+from models import (
+    db, Post, User, Comment, Media, Notification, NotificationCounter, NotificationDigest,
+    NotificationArchive, PostImpressionHourly, AuthorImpressionDaily, follows, post_likes, post_mentions
+)
+from utils.follow_graph import record_follow_change
+from utils.hashtags import remove_post_hashtags
+from utils.interactions import bump_many, bump_post, remove_repost_notification
+from utils.jobs import named_lock
+from utils.media import upload_path
+from utils.metrics import registry, Counter
+from utils.notifications import delete_notifications
+
+logger = logging.getLogger(__name__)
+
+ITEMS_PURGED = registry.register(Counter(
+    'deletion_purged_total', 'Soft-deleted posts and accounts removed by the background purge',
+    ('kind',)
+))
+
+posts = Post.__table__
+users = User.__table__
+comments = Comment.__table__
+notifications = Notification.__table__
+counters = NotificationCounter.__table__
+digests = NotificationDigest.__table__
+archive = NotificationArchive.__table__
+impressions_hourly = PostImpressionHourly.__table__
+impressions_daily = AuthorImpressionDaily.__table__
+media = Media.__table__
+
+
+def _json(path):
+    return func.json_extract(notifications.c.data, path)
+
+
+# Request path: mark the row and return; the purge job does the rest
+
+def soft_delete_post(post_id):
+    """Hide a post from every read at once; returns False when it was already gone.
+
+    Deleting a repost gives its slot in ``uq_posts_user_original`` back right
+    away and takes it off the original's counter.
+    """
+    row = db.session.execute(
+        db.select(posts.c.is_repost, posts.c.original_post_id)
+        .where(posts.c.id == post_id, posts.c.deleted_at.is_(None))
+    ).first()
+    if row is None:
+        return False
+
+    values = {'deleted_at': datetime.utcnow()}
+    if row.is_repost:
+        values['original_post_id'] = None
+    db.session.execute(posts.update().where(posts.c.id == post_id).values(**values))
+
+    if row.is_repost and row.original_post_id:
+        bump_post(row.original_post_id, reposts_count=-1)
+        # The purge can't trace the original any more once the link is gone
+        remove_repost_notification(row.original_post_id, post_id)
+    return True
+
+
+def soft_delete_user(user_id):
+    """Hide an account and everything it wrote; returns False when it was already gone"""
+    return bool(db.session.execute(
+        users.update().where(users.c.id == user_id, users.c.deleted_at.is_(None))
+        .values(deleted_at=datetime.utcnow())
+    ).rowcount)
+
+
+# Background purge
+
+class _Budget:
+    """Bounded batches, each committed on its own so no lock is held for long"""
+
+    def __init__(self, batch_size, max_batches):
+        self.batch_size = batch_size
+        self.remaining = max_batches
+
+    def limit(self, stmt):
+        return stmt.with_dialect_options(mysql_limit=self.batch_size)
+
+    def drain(self, batch):
+        """Run ``batch()`` until it handles less than a full batch.
+
+        Returns False when the budget ran out first; the next run resumes.
+        """
+        while self.remaining > 0:
+            count = batch()
+            db.session.commit()
+            self.remaining -= 1
+            if count < self.batch_size:
+                return True
+        return False
+
+
+def _remove_file(url):
+    """Delete an uploaded file given its ``/api/upload/files/...`` URL"""
+    path = upload_path(url)
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Failed to remove {path}: {e}")
+
+
+def _purge_post(budget, post_id):
+    """Remove a soft-deleted post's dependents, then the row. False means unfinished."""
+    post = db.session.execute(
+        db.select(posts.c.user_id, posts.c.parent_id, posts.c.original_post_id, posts.c.media_url,
+                  posts.c.media_id)
+        .where(posts.c.id == post_id)
+    ).first()
+    if post is None:
+        return True
+    # Converted video, WebM and poster frame of an animated GIF go with it
+    variants = db.session.execute(
+        db.select(media.c.video_url, media.c.webm_url, media.c.poster_url).where(media.c.id == post.media_id)
+    ).first() if post.media_id else None
+
+    # Activity on the post notified its owner; a reply also notified the
+    # parent's owner, a repost or quote the original's owner, and mentions
+    # notified the mentioned users
+    recipients = [post.user_id]
+    for related_id in (post.parent_id, post.original_post_id):
+        if related_id:
+            related_owner = db.session.execute(db.select(posts.c.user_id).where(posts.c.id == related_id)).scalar()
+            if related_owner:
+                recipients.append(related_owner)
+    recipients += db.session.execute(
+        db.select(post_mentions.c.user_id).where(post_mentions.c.post_id == post_id)
+    ).scalars().all()
+
+    steps = (
+        # Reposts go with the original and are purged on their own later
+        lambda: db.session.execute(budget.limit(
+            posts.update().where(posts.c.original_post_id == post_id, posts.c.is_repost.is_(True))
+            .values(deleted_at=datetime.utcnow(), original_post_id=None)
+        )).rowcount,
+        # Quotes stay, detached from the deleted post
+        lambda: db.session.execute(budget.limit(
+            posts.update().where(posts.c.original_post_id == post_id).values(original_post_id=None)
+        )).rowcount,
+        # Replies go with the post they answer. Detached they would turn into
+        # top-level posts (and move into the posts tab, is_reply being computed),
+        # so they are hidden first and purged on their own later
+        lambda: db.session.execute(budget.limit(
+            posts.update().where(posts.c.parent_id == post_id)
+            .values(deleted_at=func.coalesce(posts.c.deleted_at, datetime.utcnow()), parent_id=None)
+        )).rowcount,
+        # Unlink nested comments first so the self-referencing FK never blocks a batch
+        lambda: db.session.execute(budget.limit(
+            comments.update().where(comments.c.post_id == post_id, comments.c.parent_id.isnot(None))
+            .values(parent_id=None)
+        )).rowcount,
+        lambda: db.session.execute(budget.limit(
+            comments.delete().where(comments.c.post_id == post_id)
+        )).rowcount,
+        lambda: db.session.execute(budget.limit(
+            post_likes.delete().where(post_likes.c.post_id == post_id)
+        )).rowcount,
+        # Including "replied to your post" and "reposted your post" ones, which
+        # the replies and reposts can no longer find
+        lambda: delete_notifications(
+            and_(notifications.c.user_id.in_(recipients),
+                 or_(_json('$.post_id') == post_id, _json('$.parent_post_id') == post_id,
+                     _json('$.original_post_id') == post_id)),
+            budget.batch_size
+        ),
+        lambda: db.session.execute(budget.limit(
+            post_mentions.delete().where(post_mentions.c.post_id == post_id)
+        )).rowcount,
+        lambda: remove_post_hashtags(post_id),
+        lambda: db.session.execute(budget.limit(
+            impressions_hourly.delete().where(impressions_hourly.c.post_id == post_id)
+        )).rowcount,
+    )
+    for step in steps:
+        if not budget.drain(step):
+            return False
+
+    db.session.execute(posts.delete().where(posts.c.id == post_id))
+    if post.media_id:
+        # The upload goes only with its last post: the metadata row, then the files
+        unused = db.session.execute(media.delete().where(
+            media.c.id == post.media_id,
+            ~db.select(posts.c.id).where(posts.c.media_id == post.media_id).exists()
+        )).rowcount
+    else:
+        # Posts from before the media table: files are shared by URL, within the uploader's posts
+        unused = post.media_url and db.session.execute(
+            db.select(posts.c.id).where(posts.c.user_id == post.user_id, posts.c.media_url == post.media_url)
+            .limit(1)
+        ).first() is None
+    db.session.commit()
+    if unused:
+        for url in (post.media_url, *(variants or ())):
+            _remove_file(url)
+    ITEMS_PURGED.inc(kind='post')
+    return True
+
+
+def _hide_user_posts(budget, user_id):
+    rows = db.session.execute(
+        db.select(posts.c.id, posts.c.is_repost, posts.c.original_post_id)
+        .where(posts.c.user_id == user_id, posts.c.deleted_at.is_(None))
+        .limit(budget.batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    db.session.execute(
+        posts.update().where(posts.c.id.in_([row.id for row in rows])).values(deleted_at=datetime.utcnow())
+    )
+    reposts = [row for row in rows if row.is_repost and row.original_post_id]
+    if reposts:
+        db.session.execute(
+            posts.update().where(posts.c.id.in_([row.id for row in reposts])).values(original_post_id=None)
+        )
+        bump_many(posts, [row.original_post_id for row in reposts], reposts_count=-1)
+    return len(rows)
+
+
+def _remove_user_likes(budget, user_id):
+    post_ids = list(db.session.execute(
+        db.select(post_likes.c.post_id).where(post_likes.c.user_id == user_id).limit(budget.batch_size)
+    ).scalars())
+    if not post_ids:
+        return 0
+
+    db.session.execute(
+        post_likes.delete().where(post_likes.c.user_id == user_id, post_likes.c.post_id.in_(post_ids))
+    )
+    bump_many(posts, post_ids, likes_count=-1)
+    owners = db.select(posts.c.user_id).where(posts.c.id.in_(post_ids)).distinct()
+    delete_notifications(and_(
+        notifications.c.user_id.in_(owners), notifications.c.type == 'like',
+        _json('$.user_id') == user_id, _json('$.post_id').in_(post_ids)
+    ))
+    return len(post_ids)
+
+
+def _remove_user_comments(budget, user_id):
+    rows = db.session.execute(
+        db.select(comments.c.id, comments.c.post_id).where(comments.c.user_id == user_id).limit(budget.batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    ids = [row.id for row in rows]
+    # Replies from other people stay, moved to the top level
+    db.session.execute(comments.update().where(comments.c.parent_id.in_(ids)).values(parent_id=None))
+    db.session.execute(comments.delete().where(comments.c.id.in_(ids)))
+
+    # One UPDATE per distinct amount, not per post
+    per_post = Tally(row.post_id for row in rows)
+    by_amount = {}
+    for post_id, count in per_post.items():
+        by_amount.setdefault(count, []).append(post_id)
+    for count, post_ids in by_amount.items():
+        bump_many(posts, post_ids, comments_count=-count)
+
+    owners = db.select(posts.c.user_id).where(posts.c.id.in_(list(per_post))).distinct()
+    delete_notifications(and_(
+        notifications.c.user_id.in_(owners), notifications.c.type == 'comment',
+        _json('$.comment_id').in_(ids)
+    ))
+    return len(rows)
+
+
+def _remove_user_follows(budget, user_id, outgoing):
+    mine, theirs = (follows.c.follower_id, follows.c.following_id) if outgoing \
+        else (follows.c.following_id, follows.c.follower_id)
+    other_ids = list(db.session.execute(
+        db.select(theirs).where(mine == user_id).limit(budget.batch_size)
+    ).scalars())
+    if not other_ids:
+        return 0
+
+    db.session.execute(follows.delete().where(mine == user_id, theirs.in_(other_ids)))
+    if outgoing:
+        bump_many(users, other_ids, followers_count=-1)
+        delete_notifications(and_(
+            notifications.c.user_id.in_(other_ids), notifications.c.type == 'follow',
+            _json('$.user_id') == user_id
+        ))
+    else:
+        bump_many(users, other_ids, following_count=-1)
+    for other_id in other_ids:
+        if outgoing:
+            record_follow_change(user_id, other_id, False)
+        else:
+            record_follow_change(other_id, user_id, False)
+    return len(other_ids)
+
+
+def _purge_user(budget, user_id):
+    """Remove a soft-deleted account's data, then the row. False means unfinished."""
+    steps = (
+        lambda: _hide_user_posts(budget, user_id),
+        lambda: _remove_user_likes(budget, user_id),
+        lambda: _remove_user_comments(budget, user_id),
+        lambda: _remove_user_follows(budget, user_id, outgoing=True),
+        lambda: _remove_user_follows(budget, user_id, outgoing=False),
+        lambda: db.session.execute(budget.limit(
+            post_mentions.delete().where(post_mentions.c.user_id == user_id)
+        )).rowcount,
+        lambda: db.session.execute(budget.limit(
+            notifications.delete().where(notifications.c.user_id == user_id)
+        )).rowcount,
+        lambda: db.session.execute(budget.limit(
+            digests.delete().where(digests.c.user_id == user_id)
+        )).rowcount,
+        lambda: db.session.execute(budget.limit(
+            archive.delete().where(archive.c.user_id == user_id)
+        )).rowcount,
+        lambda: db.session.execute(budget.limit(
+            impressions_daily.delete().where(impressions_daily.c.user_id == user_id)
+        )).rowcount,
+    )
+    for step in steps:
+        if not budget.drain(step):
+            return False
+
+    # The hidden posts are purged like any other deleted post; the row waits for them
+    remaining = db.session.execute(db.select(posts.c.id).where(posts.c.user_id == user_id).limit(1)).first()
+    if remaining:
+        return False
+
+    db.session.execute(counters.delete().where(counters.c.user_id == user_id))
+    db.session.execute(media.delete().where(media.c.user_id == user_id))
+    db.session.execute(users.delete().where(users.c.id == user_id))
+    db.session.commit()
+    shutil.rmtree(os.path.join(current_app.config['UPLOAD_FOLDER'], str(user_id)), ignore_errors=True)
+    ITEMS_PURGED.inc(kind='user')
+    return True
+
+
+def purge_deleted(batch_size=None, max_batches=None):
+    """Purge soft-deleted accounts and posts, oldest first, within a batch budget.
+
+    Returns the number of posts and accounts fully removed; anything left
+    over is picked up by the next run.
+    """
+    config = current_app.config
+    budget = _Budget(
+        batch_size or config['DELETION_PURGE_BATCH_SIZE'],
+        max_batches or config['DELETION_PURGE_MAX_BATCHES']
+    )
+
+    with named_lock('aray_deletion_purge') as acquired:
+        if not acquired:
+            logger.info("Deletion purge already running elsewhere, skipping")
+            return 0
+
+        purged = 0
+        # Accounts wait out the grace period so cached lookups can no longer
+        # write rows (mentions, notifications) that point at them
+        grace_cutoff = datetime.utcnow() - timedelta(seconds=config['DELETION_USER_GRACE_SECONDS'])
+        user_ids = db.session.execute(
+            db.select(users.c.id).where(users.c.deleted_at < grace_cutoff).order_by(users.c.deleted_at).limit(10)
+        ).scalars().all()
+        for user_id in user_ids:
+            if budget.remaining <= 0:
+                break
+            purged += _purge_user(budget, user_id)
+
+        while budget.remaining > 0:
+            post_ids = db.session.execute(
+                db.select(posts.c.id).where(posts.c.deleted_at.isnot(None)).order_by(posts.c.deleted_at).limit(100)
+            ).scalars().all()
+            if not post_ids:
+                break
+            for post_id in post_ids:
+                if not _purge_post(budget, post_id):
+                    break
+                purged += 1
+
+    if purged:
+        logger.info(f"Purged {purged} deleted posts and accounts")
+    return purged
@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models import db, follows
+from utils.metrics import registry, Gauge
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_GRAPH_EDGES = registry.register(Gauge(
+    'follow_graph_edges', 'Follow edges held by the in-memory follow graph'
+))
+
+
+def _contains(values, value):
+    index = bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+
+def _insert(values, value):
+    index = bisect_left(values, value)
+    if index < len(values) and values[index] == value:
+        return False
+    values.insert(index, value)
+    return True
+
+
+def _remove(values, value):
+    index = bisect_left(values, value)
+    if index < len(values) and values[index] == value:
+        del values[index]
+        return True
+    return False
+
+
+def _intersect(a, b):
+    """Sorted intersection; probes the larger array once per item of the smaller"""
+    if len(a) > len(b):
+        a, b = b, a
+    return [value for value in a if _contains(b, value)]
+
+
+class FollowGraph:
+    """Both directions of the ``follows`` table as sorted ``array('i')`` per user.
+
+    Loaded once per worker and kept current by the commits this worker
+    makes. With a shared store configured, edge changes are also written
+    there and other workers apply them at most every ``sync_interval``
+    seconds; a periodic rebuild heals any remaining drift.
+    """
+
+    CHANGES_KEY = 'follow_graph:changes'   # sorted set, member "<ts>:<+|->:<follower>:<following>"
+
+    def __init__(self, storage_url=None, sync_interval=5):
+        self._following = {}
+        self._followers = {}
+        self._lock = threading.Lock()
+        self._sync_interval = sync_interval
+        self._last_sync = 0.0
+        self._synced_until = time.time()
+        self._replay = None   # changes seen while a load is running
+        self.ready = False
+        self._client = None
+        if storage_url and storage_url.startswith(('redis://', 'rediss://', 'unix://')):
+            import redis
+            self._client = redis.Redis.from_url(storage_url, decode_responses=True)
+
+    def load(self, batch_size=50000):
+        """Rebuild both adjacency maps from the follows table"""
+        started = time.time()
+        with self._lock:
+            self._replay = []
+        following, followers = {}, {}
+        rows = db.session.execute(
+            select(follows.c.follower_id, follows.c.following_id)
+            .order_by(follows.c.follower_id, follows.c.following_id)
+            .execution_options(yield_per=batch_size)
+        )
+        edges = 0
+        for follower_id, following_id in rows:
+            following.setdefault(follower_id, array('i')).append(following_id)
+            followers.setdefault(following_id, array('i')).append(follower_id)
+            edges += 1
+        # Rows arrive ordered by follower, so only the reverse direction needs sorting
+        followers = {user_id: array('i', sorted(ids)) for user_id, ids in followers.items()}
+
+        with self._lock:
+            self._following, self._followers = following, followers
+            self._synced_until = min(self._synced_until, started)
+            replay, self._replay = self._replay, None
+            self.ready = True
+        FOLLOW_GRAPH_EDGES.set(edges)
+        # Commits that raced the snapshot; re-applying an edge change is idempotent
+        for change in replay:
+            self.apply(*change)
+        logger.info(f"Follow graph loaded: {edges} edges in {time.time() - started:.2f}s")
+
+    def apply(self, follower_id, following_id, added):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((follower_id, following_id, added))
+            if added:
+                changed = _insert(self._following.setdefault(follower_id, array('i')), following_id)
+                _insert(self._followers.setdefault(following_id, array('i')), follower_id)
+            else:
+                changed = _remove(self._following.get(follower_id, array('i')), following_id)
+                _remove(self._followers.get(following_id, array('i')), follower_id)
+        if changed:
+            FOLLOW_GRAPH_EDGES.inc(1 if added else -1)
+
+    def publish(self, changes):
+        """Apply committed ``(follower, following, added)`` changes and share them"""
+        for follower_id, following_id, added in changes:
+            self.apply(follower_id, following_id, added)
+        if self._client is None or not changes:
+            return
+        now = time.time()
+        try:
+            self._client.zadd(self.CHANGES_KEY, {
+                f'{now}:{"+" if added else "-"}:{follower_id}:{following_id}': now
+                for follower_id, following_id, added in changes
+            })
+            self._client.zremrangebyscore(self.CHANGES_KEY, '-inf', now - 3600)
+        except Exception as e:
+            logger.error(f"Failed to publish follow graph changes: {e}")
+
+    def _maybe_sync(self):
+        now = time.time()
+        if self._client is None or now - self._last_sync < self._sync_interval:
+            return
+        self._last_sync = now
+        try:
+            entries = self._client.zrangebyscore(self.CHANGES_KEY, self._synced_until, '+inf', withscores=True)
+        except Exception as e:
+            logger.error(f"Follow graph sync failed: {e}")
+            return
+        # Re-applying our own changes is harmless: edges are a set
+        for member, score in entries:
+            _, sign, follower_id, following_id = member.split(':')
+            self.apply(int(follower_id), int(following_id), sign == '+')
+            self._synced_until = max(self._synced_until, score)
+
+    def following(self, user_id):
+        self._maybe_sync()
+        return self._following.get(user_id, ())
+
+    def followers(self, user_id):
+        self._maybe_sync()
+        return self._followers.get(user_id, ())
+
+    def is_following(self, follower_id, following_id):
+        return _contains(self.following(follower_id), following_id)
+
+    def relationships(self, viewer_id, user_ids):
+        """``{user_id: (viewer follows them, they follow viewer)}``"""
+        following, followers = self.following(viewer_id), self.followers(viewer_id)
+        return {user_id: (_contains(following, user_id), _contains(followers, user_id)) for user_id in user_ids}
+
+    def followed_by_following(self, viewer_id, user_id):
+        """People the viewer follows who also follow ``user_id``, ascending IDs"""
+        return _intersect(self.following(viewer_id), self.followers(user_id))
+
+    def mutuals(self, user_id):
+        """Users ``user_id`` follows who follow back"""
+        return _intersect(self.following(user_id), self.followers(user_id))
+
+
+graph = FollowGraph()
+
+
+def init_follow_graph(app):
+    global graph
+    storage_url = app.config['FOLLOW_GRAPH_STORAGE_URL'] or app.config['SOCKETIO_MESSAGE_QUEUE']
+    shared = bool(storage_url) and storage_url.startswith(('redis://', 'rediss://', 'unix://'))
+    if app.config['FOLLOW_GRAPH_ENABLED'] and not shared and app.config['WEB_CONCURRENCY'] > 1:
+        # Each worker would only see its own follows until the next rebuild
+        logger.warning("Follow graph disabled: several workers and no Redis to share edge changes; "
+                       "set FOLLOW_GRAPH_STORAGE_URL or SOCKETIO_MESSAGE_QUEUE")
+        app.config['FOLLOW_GRAPH_ENABLED'] = False
+    graph = FollowGraph(
+        storage_url=storage_url if shared else None,
+        sync_interval=app.config['FOLLOW_GRAPH_SYNC_SECONDS']
+    )
+
+
+def rebuild_follow_graph():
+    graph.load()
+
+
+def record_follow_change(follower_id, following_id, added):
+    """Queue an edge change; the graph sees it only if the transaction commits"""
+    db.session.info.setdefault('follow_graph_changes', []).append((follower_id, following_id, added))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_follow_changes(session):
+    changes = session.info.pop('follow_graph_changes', None)
+    if changes:
+        graph.publish(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_follow_changes(session):
+    session.info.pop('follow_graph_changes', None)
+
+
+def is_following(follower_id, following_id):
+    """Graph lookup, or a primary key probe on follows until the graph is loaded"""
+    if graph.ready:
+        return graph.is_following(follower_id, following_id)
+    return is_following_now(follower_id, following_id)
+
+
+def is_following_now(follower_id, following_id):
+    """Primary key probe on follows, for access checks.
+
+    Without a shared store another worker's graph only catches up on the
+    next rebuild, which is fine for display flags but not for deciding who
+    may see a private profile.
+    """
+    return db.session.execute(
+        select(follows.c.follower_id)
+        .where(follows.c.follower_id == follower_id, follows.c.following_id == following_id)
+    ).first() is not None
+
+
+def relationships(viewer_id, user_ids):
+    """``{user_id: (is_following, is_followed_by)}`` for the viewer; two IN queries until the graph is loaded"""
+    if graph.ready:
+        return graph.relationships(viewer_id, user_ids)
+    following = set(db.session.execute(
+        select(follows.c.following_id)
+        .where(follows.c.follower_id == viewer_id, follows.c.following_id.in_(user_ids))
+    ).scalars())
+    followers = set(db.session.execute(
+        select(follows.c.follower_id)
+        .where(follows.c.following_id == viewer_id, follows.c.follower_id.in_(user_ids))
+    ).scalars())
+    return {user_id: (user_id in following, user_id in followers) for user_id in user_ids}
+
+
+def followed_by_following(viewer_id, user_id):
+    """IDs of people the viewer follows who follow ``user_id``"""
+    if graph.ready:
+        return graph.followed_by_following(viewer_id, user_id)
+    mine = follows.alias('mine')
+    theirs = follows.alias('theirs')
+    return list(db.session.execute(
+        select(mine.c.following_id)
+        .join(theirs, theirs.c.follower_id == mine.c.following_id)
+        .where(mine.c.follower_id == viewer_id, theirs.c.following_id == user_id)
+        .order_by(mine.c.following_id)
+    ).scalars())
@@ -0,0 +1,91 @@
+import re
+import unicodedata
+from datetime import datetime
+
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, Hashtag, post_hashtags
+from utils.serializers import before_cursor
+
+hashtags = Hashtag.__table__
+
+# "#tag" not preceded by a word char, "#" or "&" (HTML entities like &#39;)
+HASHTAG_PATTERN = re.compile(r'(?<![\w#&])#(\w{1,100})')
+MAX_HASHTAGS = 10   # per post
+
+
+def normalize_tag(tag):
+    """Canonical form stored in ``hashtags.name``, or None if it isn't a valid tag"""
+    tag = unicodedata.normalize('NFKC', tag.lstrip('#')).lower()
+    # Purely numeric tags ("#1") are usually list markers, not topics
+    if not tag or len(tag) > 100 or not re.fullmatch(r'\w+', tag) or tag.isdigit():
+        return None
+    return tag
+
+
+def extract_hashtags(text):
+    """Normalized tags in ``text``, first occurrence order, at most ``MAX_HASHTAGS``"""
+    tags = []
+    for match in HASHTAG_PATTERN.finditer(text or ''):
+        tag = normalize_tag(match.group(1))
+        if tag and tag not in tags:
+            tags.append(tag)
+            if len(tags) == MAX_HASHTAGS:
+                break
+    return tags
+
+
+def tag_id(name):
+    return db.session.execute(db.select(hashtags.c.id).where(hashtags.c.name == name)).scalar()
+
+
+def record_hashtags(post_id, text, created_at):
+    """Upsert the post's tags, bump their usage counters and index the post under each"""
+    tags = extract_hashtags(text)
+    if not tags:
+        return []
+
+    now = datetime.utcnow()
+    # Sorted so concurrent posts with the same tags lock the rows in the same order
+    stmt = mysql_insert(hashtags).values([
+        {'name': tag, 'posts_count': 1, 'last_used_at': now, 'created_at': now} for tag in sorted(tags)
+    ])
+    db.session.execute(stmt.on_duplicate_key_update(
+        posts_count=hashtags.c.posts_count + 1,
+        last_used_at=stmt.inserted.last_used_at
+    ))
+
+    tag_ids = db.session.execute(db.select(hashtags.c.id).where(hashtags.c.name.in_(tags))).scalars().all()
+    db.session.execute(post_hashtags.insert(), [
+        {'tag_id': tag_id, 'created_at': created_at, 'post_id': post_id} for tag_id in tag_ids
+    ])
+    return tags
+
+
+def remove_post_hashtags(post_id):
+    """Unindex a purged post and take it off its tags' counters"""
+    tag_ids = db.session.execute(
+        db.select(post_hashtags.c.tag_id).where(post_hashtags.c.post_id == post_id)
+    ).scalars().all()
+    if not tag_ids:
+        return 0
+    db.session.execute(post_hashtags.delete().where(post_hashtags.c.post_id == post_id))
+    db.session.execute(
+        hashtags.update().where(hashtags.c.id.in_(tag_ids))
+        .values(posts_count=db.func.greatest(hashtags.c.posts_count - 1, 0))
+    )
+    return len(tag_ids)
+
+
+def page_post_ids(tag_id, cursor=None, limit=20):
+    """Newest-first ``(post_id, created_at)`` rows for a tag after ``cursor``.
+
+    Keyset pagination over the ``(tag_id, created_at, post_id)`` primary key:
+    the cost is the same on page 1 and page 1000.
+    """
+    stmt = db.select(post_hashtags.c.post_id, post_hashtags.c.created_at)\
+        .where(post_hashtags.c.tag_id == tag_id)\
+        .order_by(post_hashtags.c.created_at.desc(), post_hashtags.c.post_id.desc())\
+        .limit(limit)
+    if cursor:
+        stmt = stmt.where(before_cursor(post_hashtags.c.created_at, post_hashtags.c.post_id, cursor))
+    return db.session.execute(stmt).all()
@@ -0,0 +1,200 @@
+import hashlib
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app, request
+from sqlalchemy import case, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, Post, PostImpressionHourly, AuthorImpressionDaily
+from utils.hll import HyperLogLog
+from utils.jobs import named_lock
+from utils.metrics import registry, Counter
+
+logger = logging.getLogger(__name__)
+
+IMPRESSIONS = registry.register(Counter(
+    'post_impressions_total', 'Post views seen by the impressions buffer',
+    ('outcome',)
+))
+
+posts = Post.__table__
+hourly = PostImpressionHourly.__table__
+daily = AuthorImpressionDaily.__table__
+
+# (post_id, viewer, hour) per view. deque appends and pops are atomic, so
+# request threads record views without taking a lock; the flush job drains it.
+_events = deque()
+# Aggregates of a flush that failed, retried by the next one
+_carried = {}
+
+
+def viewer_key(user_id=None):
+    """Stable key for unique-viewer counting; anonymous viewers by IP and user agent"""
+    if user_id:
+        return f'u{user_id}'
+    client = f'{request.remote_addr}|{request.user_agent.string}'
+    return 'a' + hashlib.blake2b(client.encode(), digest_size=8).hexdigest()
+
+
+def record_views(post_ids, user_id=None):
+    """Buffer one view per post; never touches the database"""
+    config = current_app.config
+    if not config['IMPRESSIONS_ENABLED'] or not post_ids:
+        return
+    if len(_events) + len(post_ids) > config['IMPRESSIONS_MAX_PENDING']:
+        # Flushing fell behind; shed views rather than grow without bound
+        IMPRESSIONS.inc(len(post_ids), outcome='dropped')
+        return
+
+    viewer = viewer_key(user_id)
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    _events.extend((post_id, viewer, hour) for post_id in post_ids)
+    IMPRESSIONS.inc(len(post_ids), outcome='buffered')
+
+
+def _drain():
+    """``{(post_id, hour): [views, sketch]}`` for everything buffered so far"""
+    aggregated = dict(_carried)
+    _carried.clear()
+    for _ in range(len(_events)):
+        try:
+            post_id, viewer, hour = _events.popleft()
+        except IndexError:
+            break
+        entry = aggregated.get((post_id, hour))
+        if entry is None:
+            entry = aggregated[(post_id, hour)] = [0, HyperLogLog()]
+        entry[0] += 1
+        entry[1].add(viewer)
+    return aggregated
+
+
+def _carry(aggregated):
+    """Keep a failed flush's aggregates for the next one, within the buffer limit"""
+    views = sum(entry[0] for entry in aggregated.values())
+    pending = sum(entry[0] for entry in _carried.values()) + len(_events)
+    if pending + views > current_app.config['IMPRESSIONS_MAX_PENDING']:
+        IMPRESSIONS.inc(views, outcome='lost')
+        return
+    for key, (count, sketch) in aggregated.items():
+        entry = _carried.get(key)
+        if entry is None:
+            _carried[key] = [count, sketch]
+        else:
+            entry[0] += count
+            entry[1].merge(sketch)
+    IMPRESSIONS.inc(views, outcome='retried')
+
+
+def _upsert(table, key_columns, updates, chunk_size=500):
+    """Add ``{key: (views, sketch)}`` to rollup rows, merging sketches with stored ones.
+
+    Existing rows are read ``FOR UPDATE`` so a flush never overwrites a
+    sketch written since it was read; flushes themselves run one at a time.
+    """
+    columns = [table.c[name] for name in key_columns]
+    keys = sorted(updates)
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        stored = {
+            tuple(row[:-1]): row[-1]
+            for row in db.session.execute(
+                db.select(*columns, table.c.viewers).where(tuple_(*columns).in_(chunk)).with_for_update()
+            )
+        }
+
+        values = []
+        for key in chunk:
+            views, sketch = updates[key]
+            if stored.get(key):
+                sketch.merge(HyperLogLog.from_bytes(stored[key]))
+            values.append({
+                **dict(zip(key_columns, key)),
+                'views': views, 'unique_viewers': sketch.estimate(), 'viewers': sketch.to_bytes()
+            })
+
+        stmt = mysql_insert(table).values(values)
+        db.session.execute(stmt.on_duplicate_key_update(
+            views=table.c.views + stmt.inserted.views,
+            unique_viewers=stmt.inserted.unique_viewers,
+            viewers=stmt.inserted.viewers
+        ))
+
+
+def flush_impressions(chunk_size=500):
+    """Write buffered views: hourly per-post rollups, daily per-author rollups
+    and ``posts.views_count``, all in bulk statements in one transaction"""
+    # One worker at a time: concurrent upserts into the same new (post_id, hour)
+    # rows take gap locks and deadlock each other; the others keep buffering
+    with named_lock('aray_impressions_flush') as acquired:
+        if not acquired:
+            return 0
+        aggregated = _drain()
+        if not aggregated:
+            return 0
+
+        try:
+            post_ids = sorted({post_id for post_id, _ in aggregated})
+            authors = {}
+            for start in range(0, len(post_ids), chunk_size):
+                chunk = post_ids[start:start + chunk_size]
+                authors.update(db.session.execute(
+                    db.select(posts.c.id, posts.c.user_id).where(posts.c.id.in_(chunk))
+                ).all())
+
+            # Author rollups get their own sketches; the hourly ones are merged in place below
+            per_author = {}
+            per_post = {}
+            for (post_id, hour), (views, sketch) in aggregated.items():
+                per_post[post_id] = per_post.get(post_id, 0) + views
+                author_id = authors.get(post_id)
+                if author_id is None:
+                    continue
+                entry = per_author.get((author_id, hour.date()))
+                if entry is None:
+                    entry = per_author[(author_id, hour.date())] = [0, HyperLogLog()]
+                entry[0] += views
+                entry[1].merge(sketch)
+
+            total = sum(per_post.values())
+            _upsert(hourly, ('post_id', 'hour'),
+                    {key: value for key, value in aggregated.items() if key[0] in authors}, chunk_size)
+            _upsert(daily, ('user_id', 'day'), per_author, chunk_size)
+
+            # A view is not an edit: updated_at stays pinned and ETags ignore views_count
+            counted = [post_id for post_id in post_ids if post_id in authors]
+            for start in range(0, len(counted), chunk_size):
+                chunk = counted[start:start + chunk_size]
+                db.session.execute(
+                    posts.update().where(posts.c.id.in_(chunk)).values(
+                        views_count=posts.c.views_count + case(
+                            {post_id: per_post[post_id] for post_id in chunk}, value=posts.c.id, else_=0
+                        ),
+                        updated_at=posts.c.updated_at
+                    )
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            _carry(aggregated)
+            raise
+
+        IMPRESSIONS.inc(total, outcome='flushed')
+        return total
+
+
+def purge_impressions(older_than_days=None, batch_size=1000):
+    """Drop hourly rollups past retention; daily author rollups are kept"""
+    older_than_days = older_than_days or current_app.config['IMPRESSIONS_HOURLY_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    total = 0
+    while True:
+        result = db.session.execute(
+            hourly.delete().where(hourly.c.hour < cutoff).with_dialect_options(mysql_limit=batch_size)
+        )
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
@@ -0,0 +1,399 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, Post, User, Notification, follows, post_likes
+from utils import counter_buffer
+from utils.follow_graph import record_follow_change
+from utils.notifications import notify, notify_many, delete_notifications
+from utils.realtime import publish_new_post, publish_following_changed
+
+posts = Post.__table__
+users = User.__table__
+
+
+class InteractionResult:
+    """Outcome of an idempotent write: whether it changed anything, plus the
+    counter value read back in the same transaction"""
+
+    def __init__(self, changed, count, target_owner_id=None, row_id=None, target_name=None):
+        self.changed = changed
+        self.count = count
+        self.target_owner_id = target_owner_id
+        self.row_id = row_id
+        self.target_name = target_name
+
+
+def bump_many(table, row_ids, **deltas):
+    """Adjust counters on several ``posts``/``users`` rows in one UPDATE"""
+    # updated_at is pinned so engagement doesn't look like a content/profile edit
+    values = {name: table.c[name] + delta for name, delta in deltas.items()}
+    values['updated_at'] = table.c.updated_at
+    db.session.execute(table.update().where(table.c.id.in_(row_ids)).values(**values))
+
+
+def _bump(table, row_id, **deltas):
+    bump_many(table, [row_id], **deltas)
+
+
+def bump_post(post_id, **deltas):
+    """Adjust a post's denormalized counters, e.g. ``bump_post(1, comments_count=1)``"""
+    _bump(posts, post_id, **deltas)
+
+
+def bump_engagement(post_ids, **deltas):
+    """Like/comment/repost counters: buffered write-behind when enabled, so a
+    viral post's row isn't locked by every request; else a direct UPDATE"""
+    if counter_buffer.enabled():
+        counter_buffer.record(post_ids, **deltas)
+    else:
+        bump_many(posts, post_ids, **deltas)
+
+
+def _read(table, row_id, column):
+    return db.session.execute(db.select(table.c[column]).where(table.c.id == row_id)).scalar()
+
+
+def _post_count(post_id, field):
+    """Stored counter plus whatever is still waiting in the write-behind buffer"""
+    stored = _read(posts, post_id, field)
+    if stored is None:
+        return None
+    return stored + counter_buffer.pending([post_id]).get(post_id, {}).get(field, 0)
+
+
+def _post_owner(post_id):
+    return db.session.execute(
+        db.select(posts.c.user_id).where(posts.c.id == post_id, posts.c.deleted_at.is_(None))
+    ).scalar()
+
+
+def _user_name(user_id):
+    return db.session.execute(
+        db.select(users.c.name).where(users.c.id == user_id, users.c.deleted_at.is_(None))
+    ).scalar()
+
+
+def like(user_id, post_id, actor_name):
+    """INSERT IGNORE a like; returns None when the post does not exist"""
+    owner_id = _post_owner(post_id)
+    if owner_id is None:
+        return None
+
+    inserted = db.session.execute(
+        mysql_insert(post_likes).prefix_with('IGNORE').values(user_id=user_id, post_id=post_id)
+    ).rowcount
+    if inserted:
+        bump_engagement([post_id], likes_count=1)
+        if owner_id != user_id:
+            notify(owner_id, 'like', f'{actor_name} menyukai postingan Anda',
+                   {'post_id': post_id, 'user_id': user_id})
+
+    return InteractionResult(bool(inserted), _post_count(post_id, 'likes_count'), owner_id)
+
+
+def unlike(user_id, post_id):
+    owner_id = _post_owner(post_id)
+    if owner_id is None:
+        return None
+
+    deleted = db.session.execute(
+        post_likes.delete().where(post_likes.c.user_id == user_id, post_likes.c.post_id == post_id)
+    ).rowcount
+    if deleted:
+        bump_engagement([post_id], likes_count=-1)
+
+    return InteractionResult(bool(deleted), _post_count(post_id, 'likes_count'), owner_id)
+
+
+def follow(follower_id, target_id, actor_name):
+    """INSERT IGNORE a follow edge; returns None when the target does not exist"""
+    target_name = _user_name(target_id)
+    if target_name is None:
+        return None
+
+    inserted = db.session.execute(
+        mysql_insert(follows).prefix_with('IGNORE').values(follower_id=follower_id, following_id=target_id)
+    ).rowcount
+    if inserted:
+        _bump(users, target_id, followers_count=1)
+        _bump(users, follower_id, following_count=1)
+        notify(target_id, 'follow', f'{actor_name} mengikuti Anda', {'user_id': follower_id})
+        record_follow_change(follower_id, target_id, True)
+        publish_following_changed(follower_id)
+
+    return InteractionResult(bool(inserted), _read(users, target_id, 'followers_count'), target_id,
+                             target_name=target_name)
+
+
+def unfollow(follower_id, target_id):
+    target_name = _user_name(target_id)
+    if target_name is None:
+        return None
+
+    deleted = db.session.execute(
+        follows.delete().where(follows.c.follower_id == follower_id, follows.c.following_id == target_id)
+    ).rowcount
+    if deleted:
+        _bump(users, target_id, followers_count=-1)
+        _bump(users, follower_id, following_count=-1)
+        record_follow_change(follower_id, target_id, False)
+        publish_following_changed(follower_id)
+
+    return InteractionResult(bool(deleted), _read(users, target_id, 'followers_count'), target_id,
+                             target_name=target_name)
+
+
+def repost(user_id, post_id, actor_name):
+    """INSERT IGNORE a repost row, deduplicated by uq_posts_user_original"""
+    owner_id = _post_owner(post_id)
+    if owner_id is None:
+        return None
+
+    created_at = datetime.utcnow()
+    result = db.session.execute(
+        mysql_insert(posts).prefix_with('IGNORE').values(
+            content='', user_id=user_id, original_post_id=post_id, is_repost=True,
+            created_at=created_at, updated_at=created_at
+        )
+    )
+    if result.rowcount:
+        repost_id = result.inserted_primary_key[0]
+        bump_engagement([post_id], reposts_count=1)
+        publish_new_post(repost_id, user_id, created_at, is_repost=True, original_post_id=post_id)
+        if owner_id != user_id:
+            notify(owner_id, 'repost', f'{actor_name} merepost postingan Anda',
+                   {'post_id': repost_id, 'original_post_id': post_id})
+    else:
+        repost_id = db.session.execute(
+            db.select(posts.c.id).where(posts.c.user_id == user_id, posts.c.original_post_id == post_id)
+        ).scalar()
+
+    return InteractionResult(bool(result.rowcount), _post_count(post_id, 'reposts_count'), owner_id, repost_id)
+
+
+def unrepost(user_id, post_id):
+    repost_id = db.session.execute(
+        db.select(posts.c.id).where(
+            posts.c.user_id == user_id,
+            posts.c.original_post_id == post_id,
+            posts.c.is_repost.is_(True)
+        )
+    ).scalar()
+    # Soft delete; dropping original_post_id frees uq_posts_user_original for a new repost
+    deleted = repost_id is not None and db.session.execute(
+        posts.update().where(posts.c.id == repost_id, posts.c.original_post_id == post_id)
+        .values(deleted_at=datetime.utcnow(), original_post_id=None)
+    ).rowcount
+    if deleted:
+        bump_engagement([post_id], reposts_count=-1)
+        remove_repost_notification(post_id, repost_id)
+
+    return InteractionResult(bool(deleted), _post_count(post_id, 'reposts_count'))
+
+
+def remove_repost_notification(original_post_id, repost_id):
+    """Withdraw the "reposted your post" notification of an undone repost"""
+    owner_id = db.session.execute(db.select(posts.c.user_id).where(posts.c.id == original_post_id)).scalar()
+    if owner_id is None:
+        return
+    notifications = Notification.__table__
+    delete_notifications(db.and_(
+        notifications.c.user_id == owner_id,
+        notifications.c.type == 'repost',
+        db.func.json_extract(notifications.c.data, '$.post_id') == repost_id
+    ))
+
+
+def _existing(table, ids):
+    return set(db.session.execute(
+        db.select(table.c.id).where(table.c.id.in_(ids), table.c.deleted_at.is_(None))
+    ).scalars())
+
+
+def _recount_likes(post_ids):
+    # Exact recount, used when a concurrent request touched the same rows
+    count = db.select(db.func.count()).where(post_likes.c.post_id == posts.c.id).scalar_subquery()
+    db.session.execute(
+        posts.update().where(posts.c.id.in_(post_ids))
+        .values(likes_count=count, updated_at=posts.c.updated_at)
+    )
+    # The exact count already includes whatever the buffer was holding for these posts
+    counter_buffer.discard(post_ids, 'likes_count')
+
+
+def _recount_follows(user_ids):
+    followers = db.select(db.func.count()).where(follows.c.following_id == users.c.id).scalar_subquery()
+    following = db.select(db.func.count()).where(follows.c.follower_id == users.c.id).scalar_subquery()
+    db.session.execute(
+        users.update().where(users.c.id.in_(user_ids))
+        .values(followers_count=followers, following_count=following, updated_at=users.c.updated_at)
+    )
+
+
+def like_many(user_id, post_ids, actor_name):
+    """Like several posts with one multi-row INSERT IGNORE.
+
+    Returns ``{post_id: changed}`` for the posts that exist; notifications
+    for the new likes are inserted in bulk.
+    """
+    owners = dict(db.session.execute(
+        db.select(posts.c.id, posts.c.user_id).where(posts.c.id.in_(post_ids), posts.c.deleted_at.is_(None))
+    ).all())
+    if not owners:
+        return {}
+
+    liked = set(db.session.execute(
+        db.select(post_likes.c.post_id).where(post_likes.c.user_id == user_id, post_likes.c.post_id.in_(owners))
+    ).scalars())
+    new_ids = [post_id for post_id in owners if post_id not in liked]
+
+    if new_ids:
+        inserted = db.session.execute(
+            mysql_insert(post_likes).prefix_with('IGNORE')
+            .values([{'user_id': user_id, 'post_id': post_id} for post_id in new_ids])
+        ).rowcount
+        if inserted == len(new_ids):
+            bump_engagement(new_ids, likes_count=1)
+        else:
+            _recount_likes(new_ids)
+
+        notify_many([
+            {'user_id': owners[post_id], 'type': 'like', 'message': f'{actor_name} menyukai postingan Anda',
+             'data': {'post_id': post_id, 'user_id': user_id}}
+            for post_id in new_ids if owners[post_id] != user_id
+        ])
+
+    return {post_id: post_id not in liked for post_id in owners}
+
+
+def unlike_many(user_id, post_ids):
+    """Remove several likes with one DELETE; returns ``{post_id: changed}``"""
+    found = _existing(posts, post_ids)
+    if not found:
+        return {}
+
+    liked = list(db.session.execute(
+        db.select(post_likes.c.post_id).where(post_likes.c.user_id == user_id, post_likes.c.post_id.in_(found))
+    ).scalars())
+
+    if liked:
+        deleted = db.session.execute(
+            post_likes.delete().where(post_likes.c.user_id == user_id, post_likes.c.post_id.in_(liked))
+        ).rowcount
+        if deleted == len(liked):
+            bump_engagement(liked, likes_count=-1)
+        else:
+            _recount_likes(liked)
+
+    return {post_id: post_id in liked for post_id in found}
+
+
+def follow_many(follower_id, target_ids, actor_name):
+    """Follow several users with one multi-row INSERT IGNORE; returns ``{user_id: changed}``"""
+    found = _existing(users, [target_id for target_id in target_ids if target_id != follower_id])
+    if not found:
+        return {}
+
+    already = set(db.session.execute(
+        db.select(follows.c.following_id)
+        .where(follows.c.follower_id == follower_id, follows.c.following_id.in_(found))
+    ).scalars())
+    new_ids = [target_id for target_id in found if target_id not in already]
+
+    if new_ids:
+        inserted = db.session.execute(
+            mysql_insert(follows).prefix_with('IGNORE')
+            .values([{'follower_id': follower_id, 'following_id': target_id} for target_id in new_ids])
+        ).rowcount
+        if inserted == len(new_ids):
+            bump_many(users, new_ids, followers_count=1)
+            _bump(users, follower_id, following_count=inserted)
+        else:
+            _recount_follows(new_ids + [follower_id])
+
+        notify_many([
+            {'user_id': target_id, 'type': 'follow', 'message': f'{actor_name} mengikuti Anda',
+             'data': {'user_id': follower_id}}
+            for target_id in new_ids
+        ])
+        for target_id in new_ids:
+            record_follow_change(follower_id, target_id, True)
+        publish_following_changed(follower_id)
+
+    return {target_id: target_id not in already for target_id in found}
+
+
+def unfollow_many(follower_id, target_ids):
+    """Unfollow several users with one DELETE; returns ``{user_id: changed}``"""
+    found = _existing(users, [target_id for target_id in target_ids if target_id != follower_id])
+    if not found:
+        return {}
+
+    following = list(db.session.execute(
+        db.select(follows.c.following_id)
+        .where(follows.c.follower_id == follower_id, follows.c.following_id.in_(found))
+    ).scalars())
+
+    if following:
+        deleted = db.session.execute(
+            follows.delete().where(follows.c.follower_id == follower_id, follows.c.following_id.in_(following))
+        ).rowcount
+        if deleted == len(following):
+            bump_many(users, following, followers_count=-1)
+            _bump(users, follower_id, following_count=-deleted)
+        else:
+            _recount_follows(following + [follower_id])
+        for target_id in following:
+            record_follow_change(follower_id, target_id, False)
+        publish_following_changed(follower_id)
+
+    return {target_id: target_id in following for target_id in found}
+
+
+def read_counts(table, column, ids):
+    """``{id: counter}`` for a batch of rows, e.g. ``read_counts(posts, 'likes_count', ids)``"""
+    if not ids:
+        return {}
+    counts = dict(db.session.execute(
+        db.select(table.c.id, table.c[column]).where(table.c.id.in_(ids))
+    ).all())
+    if table is posts:
+        for post_id, deltas in counter_buffer.pending(list(counts)).items():
+            counts[post_id] += deltas.get(column, 0)
+    return counts
+
+
+def rebuild_post_counters():
+    """Recompute likes/comments/reposts counters from their source tables"""
+    db.session.execute(text('UPDATE posts SET likes_count = 0, comments_count = 0, reposts_count = 0'))
+    # GROUP BY keeps the derived tables materialized, which MySQL requires
+    # when the UPDATE target is also read
+    db.session.execute(text(
+        'UPDATE posts p JOIN (SELECT post_id, COUNT(*) AS c FROM post_likes GROUP BY post_id) x '
+        'ON x.post_id = p.id SET p.likes_count = x.c'
+    ))
+    db.session.execute(text(
+        'UPDATE posts p JOIN (SELECT post_id, COUNT(*) AS c FROM comments GROUP BY post_id) x '
+        'ON x.post_id = p.id SET p.comments_count = x.c'
+    ))
+    db.session.execute(text(
+        'UPDATE posts p JOIN (SELECT original_post_id, COUNT(*) AS c FROM posts '
+        'WHERE original_post_id IS NOT NULL GROUP BY original_post_id) x '
+        'ON x.original_post_id = p.id SET p.reposts_count = x.c'
+    ))
+    db.session.commit()
+    counter_buffer.discard()
+
+
+def rebuild_follow_counters():
+    """Recompute followers/following counters from the follows table"""
+    db.session.execute(text('UPDATE users SET followers_count = 0, following_count = 0'))
+    db.session.execute(text(
+        'UPDATE users u JOIN (SELECT following_id, COUNT(*) AS c FROM follows GROUP BY following_id) x '
+        'ON x.following_id = u.id SET u.followers_count = x.c'
+    ))
+    db.session.execute(text(
+        'UPDATE users u JOIN (SELECT follower_id, COUNT(*) AS c FROM follows GROUP BY follower_id) x '
+        'ON x.follower_id = u.id SET u.following_count = x.c'
+    ))
+    db.session.commit()
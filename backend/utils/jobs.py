@@ -0,0 +1,102 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from extensions import socketio
+from models import db
+
+logger = logging.getLogger(__name__)
+
+_jobs = []
+_started = False
+_start_lock = threading.Lock()
+
+
+def register_job(name, interval, func, enabled=True, run_now=False):
+    """Run ``func()`` every ``interval`` seconds inside an app context.
+
+    With ``run_now`` the first run happens as soon as the worker starts jobs.
+    """
+    if enabled:
+        _jobs.append((name, interval, func, run_now))
+
+
+def _sleep(seconds):
+    if socketio.server is not None:
+        socketio.sleep(seconds)
+    else:
+        threading.Event().wait(seconds)
+
+
+def _spawn(target, *args):
+    if socketio.server is not None:
+        socketio.start_background_task(target, *args)
+    else:
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+
+def _run_forever(app, name, interval, func, run_now=False):
+    while True:
+        if not run_now:
+            _sleep(interval)
+        run_now = False
+        with app.app_context():
+            try:
+                func()
+            except Exception as e:
+                logger.error(f"Background job {name} failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def start_background(app, func, *args):
+    """Run ``func(*args)`` once in the background inside an app context"""
+    def runner():
+        with app.app_context():
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Background task {func.__name__} failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    _spawn(runner)
+
+
+def init_jobs(app):
+    """Start registered jobs on the first request each worker serves.
+
+    Starting lazily keeps CLI commands and the preloading gunicorn master
+    free of background threads.
+    """
+    def start_jobs():
+        global _started
+        if _started:
+            return
+        with _start_lock:
+            if _started:
+                return
+            _started = True
+            for name, interval, func, run_now in _jobs:
+                _spawn(_run_forever, app, name, interval, func, run_now)
+                logger.info(f"Started background job {name} (every {interval}s)")
+
+    app.before_request(start_jobs)
+
+
+@contextmanager
+def named_lock(name):
+    """MySQL advisory lock so only one worker runs a job at a time.
+
+    Yields False without blocking when another worker holds it.
+    """
+    with db.engine.connect() as conn:
+        acquired = conn.execute(text('SELECT GET_LOCK(:name, 0)'), {'name': name}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': name})
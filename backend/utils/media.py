@@ -0,0 +1,148 @@
+import logging
+import os
+import shutil
+import subprocess
+from datetime import datetime
+
+from flask import current_app
+from models import db, Post, Media
+from utils.jobs import named_lock
+from utils.metrics import registry, Counter
+from utils.offload import run_cpu_bound
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CONVERSIONS = registry.register(Counter(
+    'media_conversions_total', 'Animated GIFs processed by the video conversion job',
+    ('outcome',)
+))
+
+media = Media.__table__
+posts = Post.__table__
+
+UPLOAD_URL_PREFIX = '/api/upload/files/'
+
+# Looping, silent video; dimensions rounded down to even numbers for yuv420p
+MP4_OPTIONS = (
+    '-movflags', '+faststart', '-pix_fmt', 'yuv420p', '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',
+    '-c:v', 'libx264', '-preset', 'medium', '-crf', '23'
+)
+WEBM_OPTIONS = (
+    '-pix_fmt', 'yuv420p', '-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '35',
+    '-deadline', 'good', '-cpu-used', '4'
+)
+
+_missing_ffmpeg_logged = False
+
+
+def upload_path(url):
+    """Local path of an ``/api/upload/files/...`` URL, or None if it points elsewhere"""
+    if not url or not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    folder = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(os.path.join(folder, url[len(UPLOAD_URL_PREFIX):]))
+    if not path.startswith(folder + os.sep):
+        return None
+    return path
+
+
+def _ffmpeg(binary, source, target, options, timeout):
+    # A real OS thread under eventlet, so other greenlets keep running meanwhile
+    run_cpu_bound(
+        subprocess.run,
+        [binary, '-nostdin', '-loglevel', 'error', '-y', '-i', source, '-an', *options, target],
+        check=True, capture_output=True, timeout=timeout
+    )
+
+
+def _write_poster(source, target):
+    from PIL import Image
+    with Image.open(source) as img:
+        img.seek(0)
+        img.convert('RGB').save(target, 'JPEG', quality=80, optimize=True)
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _convert_gif(binary, url):
+    """``(status, {column: url}, written paths)`` for one GIF; nothing is left
+    on disk unless the status is 'done'"""
+    source = upload_path(url)
+    if not source or not os.path.exists(source):
+        return 'failed', {}, []
+
+    stem, url_stem = os.path.splitext(source)[0], os.path.splitext(url)[0]
+    timeout = current_app.config['MEDIA_CONVERT_TIMEOUT']
+    written = []
+    try:
+        for ext, options in (('.mp4', MP4_OPTIONS), ('.webm', WEBM_OPTIONS)):
+            _ffmpeg(binary, source, stem + ext, options, timeout)
+            written.append(stem + ext)
+        run_cpu_bound(_write_poster, source, stem + '.poster.jpg')
+        written.append(stem + '.poster.jpg')
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"Converting {url} failed: {e}")
+        _remove(written)
+        return 'failed', {}, []
+
+    # Short GIFs with flat colors can already be smaller than any video of them
+    if os.path.getsize(stem + '.mp4') >= os.path.getsize(source):
+        _remove(written)
+        return 'skipped', {}, []
+
+    return 'done', {
+        'video_url': url_stem + '.mp4',
+        'webm_url': url_stem + '.webm',
+        'poster_url': url_stem + '.poster.jpg'
+    }, written
+
+
+def convert_pending_media(limit=None):
+    """Re-encode pending animated GIFs to looping MP4 and WebM with a poster frame.
+
+    The GIF is kept as the fallback for clients that can't autoplay video.
+    Returns the number of GIFs processed; the rest wait for the next run.
+    """
+    global _missing_ffmpeg_logged
+    config = current_app.config
+    binary = shutil.which(config['FFMPEG_BINARY'])
+    if binary is None:
+        if not _missing_ffmpeg_logged:
+            logger.warning(f"{config['FFMPEG_BINARY']} not found; animated GIFs are served unconverted")
+            _missing_ffmpeg_logged = True
+        return 0
+
+    with named_lock('aray_media_convert') as acquired:
+        if not acquired:
+            return 0
+
+        pending = db.session.execute(
+            db.select(media.c.id, media.c.url).where(media.c.conversion_status == 'pending')
+            .order_by(media.c.id).limit(limit or config['MEDIA_CONVERT_BATCH_SIZE'])
+        ).all()
+        # No transaction stays open while ffmpeg runs
+        db.session.commit()
+
+        for row in pending:
+            status, urls, written = _convert_gif(binary, row.url)
+            updated = db.session.execute(
+                media.update().where(media.c.id == row.id, media.c.conversion_status == 'pending')
+                .values(conversion_status=status, **urls)
+            ).rowcount
+            # Feed ETags follow posts.updated_at, and the payload now carries the video
+            db.session.execute(
+                posts.update().where(posts.c.media_id == row.id).values(updated_at=datetime.utcnow())
+            )
+            db.session.commit()
+            if not updated:
+                # Purged while converting
+                _remove(written)
+            MEDIA_CONVERSIONS.inc(outcome=status)
+
+    return len(pending)
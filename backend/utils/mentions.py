@@ -0,0 +1,83 @@
+import re
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, User, post_mentions
+from utils.cache import TTLCache
+from utils.notifications import notify_many
+
+users = User.__table__
+
+# Usernames are [a-zA-Z0-9_]; "a@b" (emails) and "@@x" are not mentions
+MENTION_PATTERN = re.compile(r'(?<![\w@])@(\w{1,80})', re.ASCII)
+MAX_MENTIONS = 10   # per post or comment, so one write can't fan out to everyone
+
+# username -> user ID; only existing users are cached, so new accounts are found right away
+_user_ids = TTLCache('usernames', ttl=300, maxsize=50000)
+
+
+def extract_mentions(text):
+    """Lowercased @handles in ``text``, first occurrence order, at most ``MAX_MENTIONS``"""
+    handles = []
+    for match in MENTION_PATTERN.finditer(text or ''):
+        handle = match.group(1).lower()
+        if handle not in handles:
+            handles.append(handle)
+            if len(handles) == MAX_MENTIONS:
+                break
+    return handles
+
+
+def resolve_usernames(usernames):
+    """``{username: user_id}`` for the handles that belong to live accounts.
+
+    Cache misses are resolved together with one ``IN`` query.
+    """
+    found = _user_ids.get_many(usernames)
+    missing = [username for username in usernames if username not in found]
+    if missing:
+        rows = db.session.execute(
+            db.select(users.c.username, users.c.id)
+            .where(users.c.username.in_(missing), users.c.deleted_at.is_(None))
+        )
+        ttl = current_app.config['USERNAME_CACHE_TTL']
+        for username, user_id in rows:
+            _user_ids.set(username, user_id, ttl=ttl)
+            found[username] = user_id
+    return found
+
+
+def forget_username(username):
+    _user_ids.delete(username)
+
+
+def record_mentions(author_id, author_name, text, post_id, comment_id=None, created_at=None):
+    """Index and notify the users @mentioned in a post or comment.
+
+    Post mentions go into ``post_mentions`` for the mentions feed; comment
+    mentions only notify. Returns the mentioned user IDs.
+    """
+    handles = extract_mentions(text)
+    if not handles:
+        return []
+    user_ids = [user_id for user_id in dict.fromkeys(resolve_usernames(handles).values()) if user_id != author_id]
+    if not user_ids:
+        return []
+
+    if comment_id is None:
+        created_at = created_at or datetime.utcnow()
+        db.session.execute(mysql_insert(post_mentions).prefix_with('IGNORE'), [
+            {'user_id': user_id, 'post_id': post_id, 'created_at': created_at} for user_id in user_ids
+        ])
+        message = f'{author_name} menyebut Anda dalam postingan'
+        data = {'post_id': post_id, 'user_id': author_id}
+    else:
+        message = f'{author_name} menyebut Anda dalam komentar'
+        data = {'post_id': post_id, 'comment_id': comment_id, 'user_id': author_id}
+
+    notify_many([
+        {'user_id': user_id, 'type': 'mention', 'message': message, 'data': data}
+        for user_id in user_ids
+    ])
+    return user_ids
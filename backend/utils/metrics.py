@@ -0,0 +1,265 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Default latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Blueprints that get per-route instrumentation
+INSTRUMENTED_BLUEPRINTS = {'auth', 'posts', 'users', 'upload', 'batch', 'hashtags'}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base class for in-process metrics keyed by label values"""
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}'
+        ]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}']
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state):
+        bucket_counts, count, total = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [('le', bound)])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+        lines.append(f'{self.name}_bucket{labels} {count}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_count{labels} {count}')
+        lines.append(f'{self.name}_sum{labels} {total}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    'http_requests_total', 'Total HTTP requests',
+    ('blueprint', 'endpoint', 'method', 'status')
+))
+HTTP_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency in seconds',
+    ('blueprint', 'endpoint', 'method')
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled',
+    ('blueprint',)
+))
+DB_QUERY_LATENCY = registry.register(Histogram(
+    'db_query_duration_seconds', 'Database statement latency in seconds',
+    ('statement',)
+))
+CACHE_LATENCY = registry.register(Histogram(
+    'cache_operation_duration_seconds', 'Cache operation latency in seconds',
+    ('cache', 'operation'),
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+))
+CACHE_REQUESTS = registry.register(Counter(
+    'cache_requests_total', 'Cache lookups by result',
+    ('cache', 'result')
+))
+UPLOAD_BYTES = registry.register(Counter(
+    'upload_bytes_total', 'Bytes stored by upload endpoints',
+    ('kind',)
+))
+UPLOAD_FILES = registry.register(Counter(
+    'upload_files_total', 'Files stored by upload endpoints',
+    ('kind',)
+))
+STARTUP_SECONDS = registry.register(Gauge(
+    'app_startup_seconds', 'Time spent starting the worker, by phase',
+    ('phase',)
+))
+
+
+def observe_cache(cache, hit, duration):
+    """Record a cache lookup result and how long it took"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+    CACHE_LATENCY.observe(duration, cache=cache, operation='get')
+
+
+def record_upload(kind, size):
+    UPLOAD_FILES.inc(kind=kind)
+    UPLOAD_BYTES.inc(size, kind=kind)
+
+
+def _route_labels():
+    blueprint = request.blueprint
+    if blueprint not in INSTRUMENTED_BLUEPRINTS:
+        return None
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    return blueprint, endpoint
+
+
+def _before_request():
+    labels = _route_labels()
+    if labels is None:
+        return
+    g._metrics_labels = labels
+    g._metrics_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(blueprint=labels[0])
+
+
+def _after_request(response):
+    labels = g.pop('_metrics_labels', None)
+    if labels is None:
+        return response
+    blueprint, endpoint = labels
+    duration = time.perf_counter() - g.pop('_metrics_start')
+    HTTP_LATENCY.observe(duration, blueprint=blueprint, endpoint=endpoint, method=request.method)
+    HTTP_REQUESTS.inc(blueprint=blueprint, endpoint=endpoint, method=request.method,
+                      status=response.status_code)
+    HTTP_IN_FLIGHT.dec(blueprint=blueprint)
+    return response
+
+
+def _teardown_request(error):
+    # after_request is skipped on unhandled exceptions; settle the gauge here
+    labels = g.pop('_metrics_labels', None)
+    if labels is None:
+        return
+    blueprint, endpoint = labels
+    duration = time.perf_counter() - g.pop('_metrics_start')
+    HTTP_LATENCY.observe(duration, blueprint=blueprint, endpoint=endpoint, method=request.method)
+    HTTP_REQUESTS.inc(blueprint=blueprint, endpoint=endpoint, method=request.method, status=500)
+    HTTP_IN_FLIGHT.dec(blueprint=blueprint)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_metrics_query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    DB_QUERY_LATENCY.observe(duration, statement=verb)
+
+
+def init_metrics(app):
+    """Attach request/DB instrumentation and expose the /metrics endpoint"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,98 @@
+from collections import Counter
+from sqlalchemy import func, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, Notification, NotificationCounter
+from utils.realtime import publish_after_commit, user_room
+
+counters = NotificationCounter.__table__
+
+
+def notify(user_id, notification_type, message, data=None):
+    """Insert a notification in the current transaction and bump the unread badge"""
+    notify_many([{'user_id': user_id, 'type': notification_type, 'message': message, 'data': data}])
+
+
+def notify_many(items):
+    """Bulk-insert notifications and update each recipient's unread counter.
+
+    ``items`` are dicts with user_id, type, message and data. The counters
+    are pushed to the recipients over SocketIO after the commit.
+    """
+    if not items:
+        return
+    db.session.execute(Notification.__table__.insert(), [
+        {'user_id': item['user_id'], 'type': item['type'], 'message': item['message'],
+         'data': item.get('data'), 'is_read': False}
+        for item in items
+    ])
+
+    deltas = Counter(item['user_id'] for item in items)
+    stmt = mysql_insert(counters).values([
+        {'user_id': user_id, 'unread_count': delta} for user_id, delta in deltas.items()
+    ])
+    stmt = stmt.on_duplicate_key_update(unread_count=counters.c.unread_count + stmt.inserted.unread_count)
+    db.session.execute(stmt)
+
+    rows = db.session.execute(
+        db.select(counters.c.user_id, counters.c.unread_count).where(counters.c.user_id.in_(list(deltas)))
+    )
+    for user_id, unread in rows:
+        publish_after_commit('notifications:unread', {'unread_count': unread}, user_room(user_id))
+
+
+def delete_notifications(condition, limit=None):
+    """Delete matching notifications and take the unread ones off the badge counters"""
+    notifications = Notification.__table__
+    stmt = db.select(notifications.c.id, notifications.c.user_id, notifications.c.is_read).where(condition)
+    rows = db.session.execute(stmt.limit(limit) if limit else stmt).all()
+    if not rows:
+        return 0
+
+    db.session.execute(notifications.delete().where(notifications.c.id.in_([row.id for row in rows])))
+    unread = Counter(row.user_id for row in rows if not row.is_read)
+    for user_id, count in unread.items():
+        db.session.execute(
+            counters.update().where(counters.c.user_id == user_id)
+            .values(unread_count=func.greatest(counters.c.unread_count - count, 0))
+        )
+    return len(rows)
+
+
+def unread_count(user_id):
+    count = db.session.execute(
+        db.select(counters.c.unread_count).where(counters.c.user_id == user_id)
+    ).scalar()
+    return max(count or 0, 0)
+
+
+def mark_read(user_id, notification_ids=None):
+    """Mark notifications read and keep the unread counter in step"""
+    query = Notification.query.filter_by(user_id=user_id, is_read=False)
+    if notification_ids:
+        query = query.filter(Notification.id.in_(notification_ids))
+    marked = query.update({'is_read': True}, synchronize_session=False)
+
+    if notification_ids:
+        db.session.execute(
+            update(counters).where(counters.c.user_id == user_id)
+            .values(unread_count=func.greatest(counters.c.unread_count - marked, 0))
+        )
+    else:
+        db.session.execute(update(counters).where(counters.c.user_id == user_id).values(unread_count=0))
+
+    publish_after_commit('notifications:unread', {'unread_count': unread_count(user_id)}, user_room(user_id))
+    return marked
+
+
+def rebuild_unread_counters():
+    """Recompute every counter from the notifications table"""
+    db.session.execute(counters.delete())
+    db.session.execute(
+        counters.insert().from_select(
+            ['user_id', 'unread_count'],
+            db.select(Notification.user_id, func.count())
+            .where(Notification.is_read.is_(False))
+            .group_by(Notification.user_id)
+        )
+    )
+    db.session.commit()
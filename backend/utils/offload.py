@@ -0,0 +1,60 @@
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+_pool_size = 4
+
+
+def async_mode():
+    """Detect which cooperative runtime (if any) this worker is running under"""
+    # Only look at already-imported modules so the check stays free on plain workers
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            return 'eventlet'
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            return 'gevent'
+    return 'threading'
+
+
+def init_offload(app):
+    global _pool_size
+    _pool_size = app.config['CPU_OFFLOAD_THREADS']
+    mode = async_mode()
+
+    if mode == 'eventlet':
+        from eventlet import tpool
+        tpool.set_num_threads(_pool_size)
+    elif mode == 'gevent':
+        import gevent
+        gevent.get_hub().threadpool.maxsize = _pool_size
+
+    logger.info(f"CPU offload mode: {mode} ({_pool_size} threads)")
+
+
+def run_cpu_bound(func, *args, **kwargs):
+    """Run CPU-bound work (hashing, image processing) without blocking the event loop.
+
+    Under eventlet/gevent the call is moved to a real OS thread so other
+    greenlets on the worker keep running; hashlib and Pillow release the GIL
+    for the heavy parts. Under plain threads each request already has its own
+    OS thread, so the call runs inline.
+    """
+    mode = async_mode()
+    if mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(func, *args, **kwargs)
+    if mode == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
+
+
+def shutdown_offload():
+    """Stop offload threads during graceful worker shutdown"""
+    if async_mode() == 'eventlet':
+        from eventlet import tpool
+        tpool.killall()
@@ -0,0 +1,88 @@
+import threading
+from contextlib import contextmanager
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+from utils.metrics import registry, Counter, Histogram
+from utils.offload import run_cpu_bound
+
+PASSWORD_HASH_LATENCY = registry.register(Histogram(
+    'password_hash_duration_seconds', 'Time spent hashing or verifying passwords, including queueing',
+    ('operation',)
+))
+PASSWORD_HASH_REJECTED = registry.register(Counter(
+    'password_hash_rejected_total', 'Hash/verify calls rejected because the pool was saturated',
+    ('operation',)
+))
+
+
+class HashingBusyError(Exception):
+    """Raised when too many hash operations are already queued"""
+
+
+_slots = None
+_resolved_methods = {}
+
+
+def init_passwords(app):
+    global _slots
+    # Bounds running + waiting KDF calls so a login spike queues briefly and then sheds load
+    _slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+
+
+@contextmanager
+def _pool_slot(operation):
+    timeout = current_app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+    if _slots is not None and not _slots.acquire(timeout=timeout):
+        PASSWORD_HASH_REJECTED.inc(operation=operation)
+        raise HashingBusyError()
+    try:
+        with PASSWORD_HASH_LATENCY.time(operation=operation):
+            yield
+    finally:
+        if _slots is not None:
+            _slots.release()
+
+
+def hash_password(password):
+    config = current_app.config
+    with _pool_slot('hash'):
+        return run_cpu_bound(generate_password_hash, password,
+                             method=config['PASSWORD_HASH_METHOD'],
+                             salt_length=config['PASSWORD_SALT_LENGTH'])
+
+
+def verify_password(password_hash, password):
+    with _pool_slot('verify'):
+        return run_cpu_bound(check_password_hash, password_hash, password)
+
+
+def _configured_method():
+    """Full method string (with werkzeug's defaults filled in) for the configured KDF.
+
+    Spelled out the way werkzeug writes it into the hash; no hashing needed.
+    """
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method not in _resolved_methods:
+        name, *args = method.split(':')
+        if name == 'scrypt':
+            n, r, p = (int(arg) for arg in args[:3]) if args else (2 ** 15, 8, 1)
+            resolved = f'scrypt:{n}:{r}:{p}'
+        elif name == 'pbkdf2':
+            hash_name = args[0] if args else 'sha256'
+            iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+            resolved = f'pbkdf2:{hash_name}:{iterations}'
+        else:
+            resolved = method
+        _resolved_methods[method] = resolved
+    return _resolved_methods[method]
+
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with different KDF parameters or salt
+    length than configured"""
+    method, _, rest = password_hash.partition('$')
+    salt = rest.partition('$')[0]
+    return (method != _configured_method()
+            or len(salt) != current_app.config['PASSWORD_SALT_LENGTH'])
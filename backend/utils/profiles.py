@@ -0,0 +1,32 @@
+from models import db, Post, post_likes
+from utils.serializers import before_cursor
+
+posts = Post.__table__
+
+PROFILE_TABS = ('posts', 'replies', 'media', 'likes')
+
+
+def page_tab_post_ids(user_id, tab, cursor=None, limit=20):
+    """Newest-first ``(post_id, created_at)`` rows of a profile tab after ``cursor``.
+
+    Every tab is one ordered range scan: ``ix_posts_user_reply_created``
+    for posts and replies, ``ix_posts_user_media_created`` for media and
+    ``ix_post_likes_user_created`` for likes, which sort by when the like
+    happened. Likes of posts deleted since are dropped at hydration, so a
+    likes page can come back short while more pages remain.
+    """
+    if tab == 'likes':
+        post_id, created_at = post_likes.c.post_id, post_likes.c.created_at
+        condition = post_likes.c.user_id == user_id
+    else:
+        post_id, created_at = posts.c.id, posts.c.created_at
+        # "=" rather than "IS": MySQL only uses the index for an equality on the flag
+        kind = posts.c.has_media == db.true() if tab == 'media' else posts.c.is_reply == (tab == 'replies')
+        condition = db.and_(posts.c.user_id == user_id, kind, posts.c.deleted_at.is_(None))
+
+    stmt = db.select(post_id, created_at).where(condition)\
+        .order_by(created_at.desc(), post_id.desc())\
+        .limit(limit)
+    if cursor:
+        stmt = stmt.where(before_cursor(created_at, post_id, cursor))
+    return db.session.execute(stmt).all()
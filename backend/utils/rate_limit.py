@@ -0,0 +1,181 @@
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+from utils.metrics import registry, Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = registry.register(Counter(
+    'rate_limited_requests_total', 'Requests rejected by the rate limiter',
+    ('bucket',)
+))
+
+
+class MemoryBackend:
+    """Token buckets kept in this process (per-worker budgets)"""
+
+    # Least recently used buckets are evicted past this many keys; callers
+    # choose the keys (e.g. the identifier typed into the login form), so
+    # the store must not grow with them
+    MAX_KEYS = 100000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = 0.0
+            else:
+                retry_after = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+
+            while len(self._buckets) > self.MAX_KEYS:
+                self._buckets.popitem(last=False)
+
+        return retry_after == 0.0, retry_after
+
+
+class RedisBackend:
+    """Token buckets shared by every worker through a Redis-protocol server"""
+
+    # Refill and consume atomically on the server, using the server clock
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        retry_after = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def consume(self, key, capacity, rate, cost=1):
+        try:
+            retry_after = float(self._script(keys=[self._prefix + key], args=[capacity, rate, cost]))
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down with it
+            logger.error(f"Rate limiter backend error: {e}")
+            return True, 0.0
+        return retry_after == 0.0, retry_after
+
+
+_backend = None
+
+
+def init_rate_limiter(app):
+    global _backend
+    storage_url = app.config['RATELIMIT_STORAGE_URL']
+    if storage_url.startswith(('redis://', 'rediss://', 'unix://')):
+        _backend = RedisBackend(storage_url)
+    else:
+        _backend = MemoryBackend()
+
+
+def _client_ip():
+    # The real client when TRUSTED_PROXY_HOPS installs ProxyFix in create_app
+    return request.remote_addr or 'unknown'
+
+
+def _scope_key(scope):
+    if callable(scope):
+        return scope()
+    if scope == 'user':
+        user_id = get_jwt_identity()
+        if user_id is not None:
+            return f'user:{user_id}'
+    return f'ip:{_client_ip()}'
+
+
+def charge(bucket, key, tokens=1):
+    """Take ``tokens`` from ``bucket`` for ``key``; returns a 429 response
+    when the budget is exhausted, a 400 when ``tokens`` is more than the
+    bucket can ever hold, otherwise None"""
+    config = current_app.config
+    if not config['RATELIMIT_ENABLED'] or _backend is None or not key:
+        return None
+
+    capacity, period = config['RATELIMIT_BUDGETS'][bucket]
+    tokens = max(tokens, 1)
+    if tokens > capacity:
+        # Clamping would let one request do more than a full bucket allows
+        RATE_LIMITED.inc(bucket=bucket)
+        return jsonify({'error': f'Maksimal {capacity} permintaan sekaligus'}), 400
+
+    allowed, retry_after = _backend.consume(f'{bucket}:{key}', capacity, capacity / period, tokens)
+    if allowed:
+        return None
+
+    RATE_LIMITED.inc(bucket=bucket)
+    retry_seconds = max(1, math.ceil(retry_after))
+    response = jsonify({
+        'error': f'Terlalu banyak permintaan, coba lagi dalam {retry_seconds} detik'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_seconds)
+    return response
+
+
+def rate_limit(bucket, scope='ip', cost=1):
+    """Throttle a route with a token bucket from ``RATELIMIT_BUDGETS``.
+
+    ``scope`` is ``'ip'``, ``'user'`` (falls back to IP for anonymous
+    requests; place the decorator below ``@jwt_required``) or a callable that
+    returns a key. ``cost`` is the number of tokens a request takes, or a
+    callable returning it. The check runs before the handler, so rejected
+    requests never reach the database.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['RATELIMIT_ENABLED'] or _backend is None:
+                return fn(*args, **kwargs)
+
+            limited = charge(bucket, _scope_key(scope), cost() if callable(cost) else cost)
+            if limited is not None:
+                return limited
+
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def login_identifier():
+    """Bucket key for login attempts on one account from one client.
+
+    Keyed on the IP as well, so nobody can lock a user out of their account
+    by guessing at it from elsewhere; spraying one account from many
+    addresses is still bounded per address by the 'login' bucket.
+    """
+    data = request.get_json(silent=True) or {}
+    identifier = str(data.get('email_or_username', '')).strip().lower()
+    return f'account:{identifier}:{_client_ip()}' if identifier else None
@@ -0,0 +1,68 @@
+import logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db
+from extensions import socketio
+
+logger = logging.getLogger(__name__)
+
+
+# Sockets showing the explore feed
+EXPLORE_ROOM = 'feed:explore'
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
+def author_room(user_id):
+    """Room of sockets whose timeline includes ``user_id``'s posts"""
+    return f'author:{user_id}'
+
+
+def publish_after_commit(event_name, payload, room):
+    """Emit a SocketIO event once the current transaction commits.
+
+    Events are dropped on rollback so clients never hear about writes that
+    did not happen.
+    """
+    db.session.info.setdefault('pending_events', []).append((event_name, payload, room))
+
+
+def publish_new_post(post_id, user_id, created_at, is_repost=False, original_post_id=None):
+    """Announce a top-level post to the explore feed and to its author's followers.
+
+    The payload is just enough for clients to fetch the delta with
+    ``GET /api/posts?since_id=``.
+    """
+    payload = {
+        'id': post_id,
+        'user_id': user_id,
+        'is_repost': is_repost,
+        'original_post_id': original_post_id,
+        'created_at': created_at.isoformat() if created_at else None
+    }
+    publish_after_commit('feed:new_post', payload, EXPLORE_ROOM)
+    publish_after_commit('feed:new_post', payload, author_room(user_id))
+
+
+def publish_following_changed(user_id):
+    # The user's sockets re-run feed:subscribe so their author rooms match
+    publish_after_commit('feed:resubscribe', {}, user_room(user_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _emit_pending_events(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending or socketio.server is None:
+        return
+    for event_name, payload, room in pending:
+        try:
+            socketio.emit(event_name, payload, to=room)
+        except Exception as e:
+            logger.error(f"Failed to emit {event_name}: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_events(session):
+    session.info.pop('pending_events', None)
@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, Notification, NotificationDigest, NotificationArchive
+from utils.jobs import named_lock
+from utils.metrics import registry, Counter
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_COMPACTED = registry.register(Counter(
+    'notifications_compacted_total', 'Read notifications folded into digests and removed',
+    ('archived',)
+))
+
+notifications = Notification.__table__
+digests = NotificationDigest.__table__
+archive = NotificationArchive.__table__
+
+
+def _compact_batch(cutoff, batch_size, keep_archive):
+    rows = db.session.execute(
+        db.select(notifications)
+        .where(notifications.c.is_read.is_(True), notifications.c.created_at < cutoff)
+        .order_by(notifications.c.created_at)
+        .limit(batch_size)
+    ).mappings().all()
+    if not rows:
+        return 0
+
+    # One digest row per (user, type, day); rows arrive oldest first so the
+    # last one seen is the most recent sample
+    aggregated = {}
+    for row in rows:
+        key = (row['user_id'], row['type'], row['created_at'].date())
+        digest = aggregated.setdefault(key, {'count': 0})
+        digest['count'] += 1
+        digest['last_message'] = row['message']
+        digest['last_data'] = row['data']
+
+    stmt = mysql_insert(digests).values([
+        {'user_id': user_id, 'type': type_, 'period_start': day, 'count': digest['count'],
+         'last_message': digest['last_message'], 'last_data': digest['last_data'],
+         'updated_at': datetime.utcnow()}
+        for (user_id, type_, day), digest in aggregated.items()
+    ])
+    stmt = stmt.on_duplicate_key_update(
+        count=digests.c.count + stmt.inserted.count,
+        last_message=stmt.inserted.last_message,
+        last_data=stmt.inserted.last_data,
+        updated_at=stmt.inserted.updated_at
+    )
+    db.session.execute(stmt)
+
+    if keep_archive:
+        db.session.execute(mysql_insert(archive).prefix_with('IGNORE'), [dict(row) for row in rows])
+
+    ids = [row['id'] for row in rows]
+    db.session.execute(notifications.delete().where(notifications.c.id.in_(ids)))
+    db.session.commit()
+
+    NOTIFICATIONS_COMPACTED.inc(len(rows), archived=str(keep_archive).lower())
+    return len(rows)
+
+
+def compact_notifications(older_than_days=None, batch_size=None, max_batches=None, keep_archive=None):
+    """Fold old read notifications into daily digests and delete them in bounded batches.
+
+    Each batch is its own short transaction so the hot table is never locked
+    for long. Returns the number of notifications removed.
+    """
+    config = current_app.config
+    older_than_days = older_than_days if older_than_days is not None else config['NOTIFICATION_RETENTION_DAYS']
+    batch_size = batch_size or config['NOTIFICATION_COMPACT_BATCH_SIZE']
+    max_batches = max_batches or config['NOTIFICATION_COMPACT_MAX_BATCHES']
+    keep_archive = config['NOTIFICATION_ARCHIVE'] if keep_archive is None else keep_archive
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    with named_lock('aray_notification_compaction') as acquired:
+        if not acquired:
+            logger.info("Notification compaction already running elsewhere, skipping")
+            return 0
+
+        total = 0
+        for _ in range(max_batches):
+            removed = _compact_batch(cutoff, batch_size, keep_archive)
+            total += removed
+            if removed < batch_size:
+                break
+
+    if total:
+        logger.info(f"Compacted {total} notifications older than {older_than_days} days")
+    return total
+
+
+def purge_archive(older_than_days=None, batch_size=None):
+    """Drop archived notifications past the archive retention window"""
+    config = current_app.config
+    older_than_days = older_than_days or config['NOTIFICATION_ARCHIVE_DAYS']
+    batch_size = batch_size or config['NOTIFICATION_COMPACT_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    total = 0
+    while True:
+        result = db.session.execute(
+            archive.delete().where(archive.c.archived_at < cutoff).with_dialect_options(mysql_limit=batch_size)
+        )
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+def run_retention():
+    compact_notifications()
+    if current_app.config['NOTIFICATION_ARCHIVE']:
+        purge_archive()
@@ -0,0 +1,184 @@
+import calendar
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import jsonify
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from models import db, User, RevokedToken
+from utils.metrics import registry, Counter
+
+logger = logging.getLogger(__name__)
+
+TOKENS_REVOKED = registry.register(Counter(
+    'tokens_revoked_total', 'Token revocations by kind',
+    ('kind',)
+))
+
+users = User.__table__
+revoked_tokens = RevokedToken.__table__
+
+# Rows committed slightly out of timestamp order are still picked up
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def _timestamp(value):
+    return calendar.timegm(value.utctimetuple())
+
+
+class RevocationList:
+    """Revoked token IDs and per-user "revoked before" cutoffs.
+
+    The database is the source of truth: ``revoked_tokens`` for single
+    tokens and ``users.tokens_revoked_before`` for cutoffs, so revocations
+    reach every worker and survive restarts. Checks are plain dict lookups
+    in process memory; each worker pulls new rows at most every
+    ``sync_interval`` seconds, and a revocation is applied locally at once.
+    """
+
+    def __init__(self, sync_interval=5, retention=None):
+        self._jtis = {}            # jti -> exp
+        self._user_cutoffs = {}    # user_id -> timestamp
+        self._lock = threading.Lock()
+        self._sync_interval = sync_interval
+        self._retention = retention or 0
+        self._last_sync = 0.0
+        self._jtis_since = None    # revoked_at / cutoff watermarks of the last sync
+        self._users_since = None
+        self._next_purge = time.time() + 60
+
+    def revoke(self, jti, exp, user_id):
+        with self._lock:
+            self._jtis[jti] = exp
+        # Own connection and transaction: durable even if the request rolls back
+        with db.engine.begin() as conn:
+            conn.execute(mysql_insert(revoked_tokens).prefix_with('IGNORE').values(
+                jti=jti, user_id=int(user_id), expires_at=datetime.utcfromtimestamp(exp),
+                revoked_at=datetime.utcnow()
+            ))
+        TOKENS_REVOKED.inc(kind='token')
+
+    def revoke_user(self, user_id, before=None):
+        """Revoke every token of ``user_id`` issued before ``before`` (default: now)"""
+        cutoff = int(before if before is not None else time.time())
+        with self._lock:
+            self._user_cutoffs[str(user_id)] = max(cutoff, self._user_cutoffs.get(str(user_id), 0))
+        cutoff_at = datetime.utcfromtimestamp(cutoff)
+        with db.engine.begin() as conn:
+            conn.execute(
+                users.update().where(users.c.id == int(user_id)).values(
+                    tokens_revoked_before=db.func.greatest(
+                        db.func.coalesce(users.c.tokens_revoked_before, cutoff_at), cutoff_at
+                    ),
+                    updated_at=users.c.updated_at  # not a profile edit
+                )
+            )
+        TOKENS_REVOKED.inc(kind='user')
+
+    def is_revoked(self, jwt_payload):
+        now = time.time()
+        if now - self._last_sync >= self._sync_interval:
+            self._sync(now)
+        if now >= self._next_purge:
+            self._purge(now)
+
+        if jwt_payload.get('jti') in self._jtis:
+            return True
+        cutoff = self._user_cutoffs.get(str(jwt_payload.get('sub')))
+        return cutoff is not None and jwt_payload.get('iat', 0) < cutoff
+
+    def _sync(self, now):
+        """Load revocations written since the last sync; the first sync loads
+        everything that can still matter (within ``retention``)"""
+        self._last_sync = now
+        start = datetime.utcfromtimestamp(now - self._retention)
+        jtis_since = self._jtis_since - SYNC_OVERLAP if self._jtis_since else start
+        users_since = self._users_since - SYNC_OVERLAP if self._users_since else start
+        try:
+            with db.engine.connect() as conn:
+                entries = conn.execute(
+                    db.select(revoked_tokens.c.jti, revoked_tokens.c.expires_at, revoked_tokens.c.revoked_at)
+                    .where(revoked_tokens.c.revoked_at >= jtis_since,
+                           revoked_tokens.c.expires_at > datetime.utcfromtimestamp(now))
+                ).all()
+                cutoffs = conn.execute(
+                    db.select(users.c.id, users.c.tokens_revoked_before)
+                    .where(users.c.tokens_revoked_before >= users_since)
+                ).all()
+        except Exception as e:
+            logger.error(f"Token revocation sync failed: {e}")
+            return
+
+        with self._lock:
+            for jti, expires_at, revoked_at in entries:
+                self._jtis[jti] = _timestamp(expires_at)
+                self._jtis_since = max(self._jtis_since or revoked_at, revoked_at)
+            for user_id, cutoff in cutoffs:
+                key = str(user_id)
+                self._user_cutoffs[key] = max(_timestamp(cutoff), self._user_cutoffs.get(key, 0))
+                self._users_since = max(self._users_since or cutoff, cutoff)
+            self._jtis_since = self._jtis_since or start
+            self._users_since = self._users_since or start
+
+    def _purge(self, now):
+        # Expired tokens are rejected by signature checks anyway
+        self._next_purge = now + 60
+        with self._lock:
+            for jti in [jti for jti, exp in self._jtis.items() if exp < now]:
+                del self._jtis[jti]
+            if self._retention:
+                for user_id in [u for u, cutoff in self._user_cutoffs.items() if cutoff < now - self._retention]:
+                    del self._user_cutoffs[user_id]
+
+
+revocations = RevocationList()
+
+
+def init_revocation(app, jwt):
+    global revocations
+    # Nothing older than the longest-lived token can still be presented
+    retention = max(app.config['JWT_ACCESS_TOKEN_EXPIRES'],
+                    app.config['JWT_REFRESH_TOKEN_EXPIRES']).total_seconds()
+    revocations = RevocationList(
+        sync_interval=app.config['REVOCATION_SYNC_SECONDS'],
+        retention=retention
+    )
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocations.is_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token telah dicabut'}), 401
+
+
+def is_token_revoked(jwt_payload):
+    return revocations.is_revoked(jwt_payload)
+
+
+def revoke_token(jwt_payload):
+    """Revoke a single token (logout)"""
+    revocations.revoke(jwt_payload['jti'], jwt_payload['exp'], jwt_payload['sub'])
+
+
+def revoke_user_tokens(user_id, before=None):
+    """Revoke all tokens a user was issued before ``before`` (password change)"""
+    revocations.revoke_user(user_id, before)
+
+
+def purge_revoked_tokens(batch_size=1000):
+    """Drop rows of tokens that have expired; they can't be presented any more"""
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        result = db.session.execute(
+            revoked_tokens.delete().where(revoked_tokens.c.expires_at < now)
+            .with_dialect_options(mysql_limit=batch_size)
+        )
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
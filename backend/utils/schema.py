@@ -0,0 +1,48 @@
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.schema import AddConstraint, CreateColumn, UniqueConstraint
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+def sync_schema():
+    """Create missing tables, then add columns, indexes and unique constraints
+    that the models define but existing tables lack.
+
+    Returns the list of (table, column) pairs that were added so callers can
+    backfill data for them; column is None for a newly created table.
+    """
+    engine = db.engine
+    existing_tables = set(inspect(engine).get_table_names())
+    db.create_all()
+
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added_columns = [(table.name, None) for table in db.metadata.sorted_tables
+                     if table.name not in existing_tables]
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}')
+                added_columns.append((table.name, column.name))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info(f"Created index {index.name}")
+
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint) and constraint.name \
+                        and constraint.name not in existing_indexes:
+                    conn.execute(AddConstraint(constraint))
+                    logger.info(f"Added unique constraint {constraint.name}")
+
+    return added_columns
@@ -0,0 +1,358 @@
+import json
+import math
+from datetime import date, datetime
+
+from flask import request, Response
+from models import db, Post, User, Comment, Notification, Media, post_likes
+from utils import counter_buffer, follow_graph
+
+try:
+    import orjson
+except ImportError:  # Optional; falls back to the stdlib encoder
+    orjson = None
+
+posts = Post.__table__
+users = User.__table__
+comments = Comment.__table__
+notifications = Notification.__table__
+media = Media.__table__
+
+# Output field -> column, in the same order to_dict() emits them
+USER_FIELDS = {name: users.c[name] for name in (
+    'id', 'username', 'name', 'bio', 'location', 'website', 'avatar_url',
+    'banner_url', 'is_verified', 'is_private', 'created_at'
+)}
+POST_FIELDS = {name: posts.c[name] for name in (
+    'id', 'content', 'media_url', 'media_type', 'is_repost', 'original_post_id',
+    'parent_id', 'created_at', 'updated_at', 'likes_count', 'comments_count', 'reposts_count',
+    'views_count'
+)}
+MEDIA_FIELDS = {name: media.c[name] for name in (
+    'id', 'width', 'height', 'dominant_color', 'blurhash', 'video_url', 'webm_url', 'poster_url'
+)}
+COMMENT_FIELDS = {name: comments.c[name] for name in (
+    'id', 'content', 'post_id', 'parent_id', 'created_at', 'updated_at'
+)}
+NOTIFICATION_FIELDS = {name: notifications.c[name] for name in (
+    'id', 'type', 'message', 'data', 'is_read', 'created_at'
+)}
+
+POST_FLAGS = ('is_liked', 'is_reposted')
+USER_FLAGS = ('is_following', 'is_followed_by')
+
+# Keyset cursors are "<created_at>-<id>"; DATETIME columns have second precision
+CURSOR_FORMAT = '%Y%m%d%H%M%S'
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    if orjson is not None:
+        # orjson writes naive datetimes in the same format as isoformat()
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(payload, status=200):
+    """Encode straight to bytes, bypassing jsonify's dict-to-str round trip"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+class FieldSet:
+    """Fields selected with ``?fields=``, e.g. ``id,content,author.username``.
+
+    Without the parameter every field is returned. ``id`` is always
+    included; naming ``author`` alone keeps the whole embed.
+    """
+
+    def __init__(self, columns, flags=(), nested=None):
+        spec = request.args.get('fields', '')
+        requested = [name.strip() for name in spec.split(',') if name.strip()]
+        nested = nested or {}
+        self.spec = spec
+        self.requested = set(requested)
+
+        if not requested:
+            self.names = list(columns)
+            self.flags = list(flags)
+            self.nested = {key: list(cols) for key, cols in nested.items()}
+        else:
+            self.names = ['id'] + [name for name in columns if name in requested and name != 'id']
+            self.flags = [flag for flag in flags if flag in requested]
+            self.nested = {}
+            for key, cols in nested.items():
+                sub = [name.split('.', 1)[1] for name in requested if name.startswith(f'{key}.')]
+                if key in requested:
+                    self.nested[key] = list(cols)
+                elif sub:
+                    self.nested[key] = ['id'] + [name for name in cols if name in sub and name != 'id']
+
+        self.columns = [columns[name] for name in self.names]
+        for key, cols in self.nested.items():
+            self.columns += [nested[key][name].label(f'{key}__{name}') for name in cols]
+
+    def wants(self, name):
+        return not self.requested or name in self.requested
+
+    def to_dicts(self, rows):
+        width = len(self.names)
+        items = []
+        for row in rows:
+            item = dict(zip(self.names, row[:width]))
+            offset = width
+            for key, cols in self.nested.items():
+                item[key] = dict(zip(cols, row[offset:offset + len(cols)]))
+                offset += len(cols)
+            items.append(item)
+        return items
+
+
+def post_fields():
+    return FieldSet(POST_FIELDS, POST_FLAGS, {'author': USER_FIELDS, 'media': MEDIA_FIELDS})
+
+
+def comment_fields():
+    return FieldSet(COMMENT_FIELDS, nested={'author': USER_FIELDS})
+
+
+def user_fields():
+    return FieldSet(USER_FIELDS, USER_FLAGS)
+
+
+def notification_fields():
+    return FieldSet(NOTIFICATION_FIELDS)
+
+
+def visible_posts():
+    """Posts that are neither soft-deleted nor written by a deleted account"""
+    return (posts.c.deleted_at.is_(None), users.c.deleted_at.is_(None))
+
+
+def select_posts(fields):
+    """Core select of visible post rows joined with their authors and media metadata"""
+    return (
+        db.select(*fields.columns).select_from(posts)
+        .join(users, users.c.id == posts.c.user_id)
+        .outerjoin(media, media.c.id == posts.c.media_id)
+        .where(*visible_posts())
+    )
+
+
+def select_comments(fields):
+    return (
+        db.select(*fields.columns).select_from(comments)
+        .join(users, users.c.id == comments.c.user_id)
+        .where(users.c.deleted_at.is_(None))
+    )
+
+
+def select_users(fields):
+    return db.select(*fields.columns).select_from(users).where(users.c.deleted_at.is_(None))
+
+
+def paginate(stmt, page, per_page):
+    """Paginate a Core select, keeping rows as tuples.
+
+    Returns ``(rows, pagination)`` where pagination has the same keys the
+    ORM-paginated endpoints return.
+    """
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    total = db.session.execute(
+        db.select(db.func.count()).select_from(stmt.order_by(None).subquery())
+    ).scalar()
+    rows = db.session.execute(stmt.limit(per_page).offset((page - 1) * per_page)).all()
+    pages = math.ceil(total / per_page)
+    return rows, {
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'total': total,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+
+def encode_cursor(created_at, row_id):
+    return f'{created_at.strftime(CURSOR_FORMAT)}-{row_id}'
+
+
+def decode_cursor(cursor):
+    """``(created_at, row_id)`` from a cursor, or None when it is malformed"""
+    try:
+        created_at, row_id = cursor.split('-')
+        return datetime.strptime(created_at, CURSOR_FORMAT), int(row_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def before_cursor(created_column, id_column, cursor):
+    """Keyset condition for newest-first pages: rows strictly after ``cursor``.
+
+    Unlike OFFSET, the cost is the same on page 1 and page 1000 as long as
+    an index is ordered by ``(..., created_column, id_column)``.
+    """
+    created_at, row_id = cursor
+    return db.or_(
+        created_column < created_at,
+        db.and_(created_column == created_at, id_column < row_id)
+    )
+
+
+def select_post_versions():
+    """Narrow select of what makes a post's payload change: its own and its
+    author's ``updated_at``, the engagement counters and the embedded original"""
+    return db.select(
+        posts.c.id, posts.c.updated_at, posts.c.likes_count, posts.c.comments_count,
+        posts.c.reposts_count, users.c.updated_at.label('author_updated_at'), posts.c.original_post_id
+    ).select_from(posts).join(users, users.c.id == posts.c.user_id).where(*visible_posts())
+
+
+def original_versions(versions):
+    """Version rows of the originals that a page reposts or quotes, excluding
+    those already on the page; one query, however often each is reposted"""
+    on_page = {row.id for row in versions}
+    ids = sorted({row.original_post_id for row in versions if row.original_post_id} - on_page)
+    if not ids:
+        return []
+    return db.session.execute(select_post_versions().where(posts.c.id.in_(ids))).all()
+
+
+def fetch_posts(fields, ids):
+    """Full rows for ``ids``, in the order given"""
+    if not ids:
+        return []
+    rows = db.session.execute(select_posts(fields).where(posts.c.id.in_(ids))).all()
+    position = {post_id: index for index, post_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: position[row[0]])
+
+
+def post_flags(ids, current_user_id, flags=POST_FLAGS):
+    """``{'is_liked': ids, 'is_reposted': ids}`` for the viewer, one query per flag"""
+    result = {flag: set() for flag in flags}
+    if not current_user_id or not ids:
+        return result
+    if 'is_liked' in flags:
+        result['is_liked'] = set(db.session.execute(
+            db.select(post_likes.c.post_id)
+            .where(post_likes.c.user_id == current_user_id, post_likes.c.post_id.in_(ids))
+        ).scalars())
+    if 'is_reposted' in flags:
+        result['is_reposted'] = set(db.session.execute(
+            db.select(posts.c.original_post_id)
+            .where(posts.c.user_id == current_user_id, posts.c.original_post_id.in_(ids),
+                   posts.c.is_repost.is_(True))
+        ).scalars())
+    return result
+
+
+def _without_empty_media(items):
+    """``media: None`` for posts without an upload, instead of a dict of NULLs
+    from the outer join"""
+    for item in items:
+        if 'media' in item and item['media'].get('id') is None:
+            item['media'] = None
+    return items
+
+
+def _originals(items, fields):
+    """``{id: dict}`` of the posts that ``items`` repost or quote.
+
+    The same viral original is often reposted many times on one page; each
+    is fetched once, with its author, in a single query. Originals that are
+    on the page themselves are reused as they are.
+    """
+    wanted = {item['original_post_id'] for item in items if item.get('original_post_id')}
+    if not wanted:
+        return {}
+    found = {item['id']: item for item in items if item['id'] in wanted}
+    missing = sorted(wanted - set(found))
+    for item in _without_empty_media(counter_buffer.overlay(fields.to_dicts(fetch_posts(fields, missing)))):
+        found[item['id']] = item
+    return found
+
+
+def serialize_posts(rows, fields, current_user_id=None, flags=None):
+    """Post dicts plus the viewer's is_liked/is_reposted flags and embedded
+    originals, three queries per page.
+
+    Reposts and quotes get their original under ``original_post``, None once
+    it is deleted. Counters include deltas still waiting in the write-behind
+    buffer. Pass ``flags`` from ``post_flags`` when they were already
+    computed; they must cover the originals as well.
+    """
+    items = _without_empty_media(counter_buffer.overlay(fields.to_dicts(rows)))
+    originals = _originals(items, fields) if 'original_post_id' in fields.names else {}
+    on_page = {item['id'] for item in items}
+    embedded = [item for post_id, item in originals.items() if post_id not in on_page]
+
+    if fields.flags:
+        if flags is None:
+            flags = post_flags([item['id'] for item in items + embedded], current_user_id, fields.flags)
+        for item in items + embedded:
+            for flag in fields.flags:
+                item[flag] = item['id'] in flags[flag]
+
+    for item in items:
+        if 'original_post_id' in item and (item['original_post_id'] or item.get('is_repost')):
+            original = originals.get(item['original_post_id'])
+            # One level only: the embed of a quote does not carry its own original
+            item['original_post'] = original and {
+                key: value for key, value in original.items() if key != 'original_post'
+            }
+    return items
+
+
+def collapse_reposts(items):
+    """Show each original once per page.
+
+    Timelines often hold several reposts of the same post, or the post and
+    reposts of it. The newest entry is kept and the reposters of the rest
+    are listed in its ``reposted_by``. Quotes are never collapsed.
+    """
+    kept = {}
+    result = []
+    for item in items:
+        is_repost = item.get('is_repost') and item.get('original_post_id')
+        key = item['original_post_id'] if is_repost else item['id']
+        first = kept.get(key)
+        if first is None:
+            kept[key] = item
+            result.append(item)
+            if is_repost and 'author' in item:
+                item['reposted_by'] = [item['author']]
+        elif is_repost and 'author' in item:
+            first.setdefault('reposted_by', []).append(item['author'])
+    return result
+
+
+def user_flags(ids, current_user_id, flags=USER_FLAGS):
+    """``{'is_following': ids, 'is_followed_by': ids}`` for the viewer, from the follow graph"""
+    result = {flag: set() for flag in flags}
+    ids = [user_id for user_id in ids if user_id != current_user_id]
+    if not current_user_id or not ids or not flags:
+        return result
+    for user_id, (is_following, is_followed_by) in follow_graph.relationships(current_user_id, ids).items():
+        if is_following and 'is_following' in result:
+            result['is_following'].add(user_id)
+        if is_followed_by and 'is_followed_by' in result:
+            result['is_followed_by'].add(user_id)
+    return result
+
+
+def serialize_users(rows, fields, current_user_id=None, flags=None):
+    """User dicts plus the viewer's is_following/is_followed_by flags, two queries per page"""
+    items = fields.to_dicts(rows)
+    if not fields.flags:
+        return items
+
+    if flags is None:
+        flags = user_flags([item['id'] for item in items], current_user_id, fields.flags)
+    for item in items:
+        for flag in fields.flags:
+            item[flag] = item['id'] in flags[flag]
+    return items
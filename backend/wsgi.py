@@ -0,0 +1,9 @@
+"""WSGI entry point for production servers.
+
+    flask --app wsgi:app migrate            # once per deploy
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app
+
+# Schema management is done by `flask migrate`, never by serving workers
+app, socketio = create_app(manage_schema=False)
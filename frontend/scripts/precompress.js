@@ -0,0 +1,56 @@
+// Writes .br and .gz siblings next to every compressible file in dist/ so the
+// backend (FRONTEND_DIST) or a reverse proxy can send them without compressing
+// per request. Prints bytes-on-wire and CPU time per encoding.
+import { readdirSync, readFileSync, statSync, writeFileSync } from "node:fs";
+import { join, relative } from "node:path";
+import { brotliCompressSync, constants, gzipSync } from "node:zlib";
+
+const DIST = process.argv[2] || "dist";
+const MIN_SIZE = 1024;
+const COMPRESSIBLE = /\.(html|js|mjs|css|json|svg|txt|xml|map|webmanifest)$/;
+
+const encoders = {
+	br: (data) =>
+		brotliCompressSync(data, {
+			params: {
+				[constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+				[constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+			},
+		}),
+	gz: (data) => gzipSync(data, { level: 9 }),
+};
+
+const walk = (dir) =>
+	readdirSync(dir).flatMap((name) => {
+		const path = join(dir, name);
+		return statSync(path).isDirectory() ? walk(path) : [path];
+	});
+
+const totals = { raw: 0, br: 0, gz: 0, brMs: 0, gzMs: 0 };
+const files = walk(DIST).filter(
+	(path) => COMPRESSIBLE.test(path) && statSync(path).size >= MIN_SIZE
+);
+
+for (const path of files) {
+	const data = readFileSync(path);
+	totals.raw += data.length;
+
+	for (const [suffix, encode] of Object.entries(encoders)) {
+		const started = process.hrtime.bigint();
+		const compressed = encode(data);
+		totals[`${suffix}Ms`] += Number(process.hrtime.bigint() - started) / 1e6;
+
+		// Keep whichever is smaller; a sibling that doesn't help is skipped
+		const body = compressed.length < data.length ? compressed : null;
+		totals[suffix] += body ? body.length : data.length;
+		if (body) writeFileSync(`${path}.${suffix}`, body);
+	}
+
+	console.log(`${relative(DIST, path)}: ${data.length} B`);
+}
+
+const kib = (bytes) => `${(bytes / 1024).toFixed(1)} KiB`;
+const ratio = (bytes) => `${((bytes / totals.raw) * 100 || 0).toFixed(1)}%`;
+console.log(`\n${files.length} files, ${kib(totals.raw)} raw`);
+console.log(`brotli: ${kib(totals.br)} (${ratio(totals.br)}) in ${totals.brMs.toFixed(0)} ms`);
+console.log(`gzip:   ${kib(totals.gz)} (${ratio(totals.gz)}) in ${totals.gzMs.toFixed(0)} ms`);
@@ -10,6 +10,7 @@ import ProfilePage from "./pages/ProfilePage";
 import ExplorePage from "./pages/ExplorePage";
 import NotificationsPage from "./pages/NotificationsPage";
 import SettingsPage from "./pages/SettingsPage";
+import HashtagPage from "./pages/HashtagPage";
 
 // Layout
 import Layout from "./components/layout/Layout";
@@ -100,6 +101,17 @@ function App() {
 						}
 					/>
 
+					<Route
+						path="/hashtag/:tag"
+						element={
+							<ProtectedRoute>
+								<Layout>
+									<HashtagPage />
+								</Layout>
+							</ProtectedRoute>
+						}
+					/>
+
 					{/* Redirect to auth if not authenticated */}
 					<Route
 						path="*"
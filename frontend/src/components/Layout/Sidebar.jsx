@@ -1,4 +1,6 @@
+import { useEffect } from "react";
 import { Link, useLocation } from "react-router-dom";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import { motion } from "framer-motion";
 import {
 	Home,
@@ -12,12 +14,34 @@ import {
 	Mail,
 } from "lucide-react";
 import { useAuthStore } from "../../store/authStore";
+import { usersApi } from "../../services/api";
+import { connectSocket, disconnectSocket } from "../../services/socket";
 import Button from "../ui/Button";
 import Avatar from "../ui/Avatar";
 
 const Sidebar = () => {
 	const location = useLocation();
-	const { user, logout } = useAuthStore();
+	const { user, token, logout } = useAuthStore();
+	const queryClient = useQueryClient();
+
+	// Badge count: one cheap request, then kept current by socket pushes
+	const { data: unreadCount = 0 } = useQuery({
+		queryKey: ["notifications", "unread-count"],
+		queryFn: () => usersApi.getUnreadCount(),
+		select: (response) => response.data.unread_count,
+		enabled: !!token,
+	});
+
+	useEffect(() => {
+		if (!token) return;
+		const socket = connectSocket(token);
+		socket.on("notifications:unread", ({ unread_count }) => {
+			queryClient.setQueryData(["notifications", "unread-count"], {
+				data: { unread_count },
+			});
+		});
+		return () => disconnectSocket();
+	}, [token, queryClient]);
 
 	const navigationItems = [
 		{ name: "Home", href: "/", icon: Home },
@@ -61,7 +85,14 @@ const Sidebar = () => {
 										: "text-gray-700 hover:bg-gray-100 dark:text-gray-300 dark:hover:bg-gray-700"
 								}`}
 							>
-								<item.icon size={24} />
+								<div className="relative">
+									<item.icon size={24} />
+									{item.href === "/notifications" && unreadCount > 0 && (
+										<span className="absolute -top-1 -right-2 min-w-[18px] h-[18px] px-1 rounded-full bg-primary-600 text-white text-xs flex items-center justify-center">
+											{unreadCount > 99 ? "99+" : unreadCount}
+										</span>
+									)}
+								</div>
 								<span className="hidden xl:block font-medium">{item.name}</span>
 							</motion.div>
 						</Link>
@@ -2,6 +2,7 @@ import { useState } from "react";
 import { Link } from "react-router-dom";
 import { useMutation, useQueryClient } from "@tanstack/react-query";
 import {
+	BarChart2,
 	Heart,
 	MessageCircle,
 	Repeat2,
@@ -15,9 +16,11 @@ import { postsApi } from "../../services/api";
 import { useAuthStore } from "../../store/authStore";
 import Avatar from "../ui/Avatar";
 import Button from "../ui/Button";
+import PostContent from "./PostContent";
+import PostMedia from "./PostMedia";
 import toast from "react-hot-toast";
 
-const PostCard = ({ post }) => {
+const PostItem = ({ post }) => {
 	const { user: currentUser } = useAuthStore();
 	const queryClient = useQueryClient();
 	const [showMenu, setShowMenu] = useState(false);
@@ -156,20 +159,35 @@ const PostCard = ({ post }) => {
 					{/* Content */}
 					<div className="mt-2">
 						{post.content && (
-							<p className="text-gray-900 dark:text-white whitespace-pre-wrap">
-								{post.content}
-							</p>
+							<PostContent
+								text={post.content}
+								className="text-gray-900 dark:text-white whitespace-pre-wrap"
+							/>
+						)}
+
+						{/* Quoted post */}
+						{!post.is_repost && post.original_post && (
+							<Link
+								to={`/profile/${post.original_post.author.username}`}
+								className="block mt-3 p-3 rounded-xl border border-gray-200 dark:border-gray-700"
+							>
+								<div className="flex items-center space-x-2 text-sm">
+									<span className="font-medium text-gray-900 dark:text-white">
+										{post.original_post.author.name}
+									</span>
+									<span className="text-gray-500 dark:text-gray-400">
+										@{post.original_post.author.username}
+									</span>
+								</div>
+								<p className="mt-1 text-gray-900 dark:text-white whitespace-pre-wrap">
+									{post.original_post.content}
+								</p>
+							</Link>
 						)}
 
 						{/* Media */}
 						{post.media_url && post.media_type === "image" && (
-							<div className="mt-3">
-								<img
-									src={post.media_url}
-									alt="Post media"
-									className="rounded-xl max-h-96 w-full object-cover"
-								/>
-							</div>
+							<PostMedia url={post.media_url} media={post.media} />
 						)}
 					</div>
 
@@ -217,6 +235,12 @@ const PostCard = ({ post }) => {
 							<span className="text-sm">{post.likes_count}</span>
 						</Button>
 
+						{/* Views */}
+						<span className="flex items-center space-x-2 px-3 text-gray-500">
+							<BarChart2 size={18} />
+							<span className="text-sm">{post.views_count ?? 0}</span>
+						</span>
+
 						{/* Share */}
 						<Button
 							variant="ghost"
@@ -233,4 +257,26 @@ const PostCard = ({ post }) => {
 	);
 };
 
+// Reposts show the embedded original under a "reposted by" line; actions
+// like and repost the original, not the repost row
+const PostCard = ({ post }) => {
+	if (!post.is_repost || !post.original_post) return <PostItem post={post} />;
+
+	const reposters = post.reposted_by ?? [post.author];
+	const label =
+		reposters.length > 1
+			? `${reposters[0].name} dan ${reposters.length - 1} lainnya`
+			: reposters[0].name;
+
+	return (
+		<div>
+			<div className="flex items-center space-x-2 px-6 pt-3 -mb-3 text-sm text-gray-500 dark:text-gray-400">
+				<Repeat2 size={14} />
+				<span>{label} merepost</span>
+			</div>
+			<PostItem post={post.original_post} />
+		</div>
+	);
+};
+
 export default PostCard;
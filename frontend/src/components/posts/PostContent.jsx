@@ -0,0 +1,38 @@
+import { Link } from "react-router-dom";
+
+// Same rules as the backend's MENTION_PATTERN and HASHTAG_PATTERN: a token is
+// not preceded by a word char, "@", "#" or "&" (HTML entities like &#39;)
+const TOKEN_PATTERN = /(^|[^\w@#&])(?:@(\w{1,80})|#([\p{L}\p{N}_]{1,100}))/gu;
+
+const PostContent = ({ text, className = "" }) => {
+	const parts = [];
+	let last = 0;
+
+	for (const match of text.matchAll(TOKEN_PATTERN)) {
+		const start = match.index + match[1].length;
+		const [prefix, name, to] = match[2]
+			? ["@", match[2], `/profile/${match[2].toLowerCase()}`]
+			: ["#", match[3], `/hashtag/${encodeURIComponent(match[3].toLowerCase())}`];
+		// "#1" is a list marker, not a tag
+		if (prefix === "#" && /^\d+$/.test(name)) continue;
+
+		if (start > last) parts.push(text.slice(last, start));
+		parts.push(
+			<Link
+				key={start}
+				to={to}
+				onClick={(e) => e.stopPropagation()}
+				className="text-blue-600 hover:underline"
+			>
+				{prefix}
+				{name}
+			</Link>
+		);
+		last = start + name.length + 1;
+	}
+	if (last < text.length) parts.push(text.slice(last));
+
+	return <p className={className}>{parts}</p>;
+};
+
+export default PostContent;
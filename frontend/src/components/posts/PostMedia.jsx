@@ -0,0 +1,58 @@
+import { useState } from "react";
+import { blurhashToDataUrl } from "../../utils/blurhash";
+
+// Post image that reserves its box from the stored dimensions and shows the
+// blurhash (or dominant color) until the file has loaded, so feeds don't shift.
+// Animated GIFs play as video once the background conversion has run.
+const PostMedia = ({ url, media }) => {
+	const [loaded, setLoaded] = useState(false);
+	const placeholder = media ? blurhashToDataUrl(media.blurhash) : null;
+
+	return (
+		<div
+			className="mt-3 rounded-xl overflow-hidden"
+			style={{
+				aspectRatio: media?.width && media?.height ? `${media.width} / ${media.height}` : undefined,
+				maxHeight: "24rem",
+				backgroundColor: media?.dominant_color ?? undefined,
+				backgroundImage: !loaded && placeholder ? `url(${placeholder})` : undefined,
+				backgroundSize: "cover",
+			}}
+		>
+			{media?.video_url ? (
+				// Converted animated GIF: the browser picks WebM or MP4, and the
+				// original GIF is the fallback where video can't play
+				<video
+					autoPlay
+					loop
+					muted
+					playsInline
+					poster={media.poster_url ?? undefined}
+					width={media.width ?? undefined}
+					height={media.height ?? undefined}
+					onLoadedData={() => setLoaded(true)}
+					className="max-h-96 w-full h-full object-cover"
+				>
+					{media.webm_url && <source src={media.webm_url} type="video/webm" />}
+					<source src={media.video_url} type="video/mp4" />
+					<img src={url} alt="Post media" />
+				</video>
+			) : (
+				<img
+					src={url}
+					alt="Post media"
+					width={media?.width ?? undefined}
+					height={media?.height ?? undefined}
+					loading="lazy"
+					decoding="async"
+					onLoad={() => setLoaded(true)}
+					className={`max-h-96 w-full h-full object-cover transition-opacity duration-300 ${
+						loaded ? "opacity-100" : "opacity-0"
+					}`}
+				/>
+			)}
+		</div>
+	);
+};
+
+export default PostMedia;
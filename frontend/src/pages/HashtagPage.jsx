@@ -0,0 +1,97 @@
+import { useParams } from "react-router-dom";
+import { Hash } from "lucide-react";
+import { useInfiniteQuery } from "@tanstack/react-query";
+import { hashtagsApi } from "../services/api";
+import PostCard from "../components/posts/PostCard";
+import LoadingSpinner from "../components/ui/LoadingSpinner";
+import Button from "../components/ui/Button";
+
+const HashtagPage = () => {
+	const { tag } = useParams();
+
+	const {
+		data,
+		fetchNextPage,
+		hasNextPage,
+		isFetchingNextPage,
+		isLoading,
+		error,
+	} = useInfiniteQuery({
+		queryKey: ["hashtag", tag],
+		// Keyset pagination: each page hands back the cursor for the next one
+		queryFn: ({ pageParam }) =>
+			hashtagsApi.getHashtagPosts(tag, {
+				cursor: pageParam,
+				per_page: 10,
+			}),
+		getNextPageParam: (lastPage) => lastPage.data.next_cursor ?? undefined,
+		select: (data) => ({
+			pages: data.pages,
+			pageParams: data.pageParams,
+			hashtag: data.pages[0]?.data.hashtag,
+			posts: data.pages.flatMap((page) => page.data.posts),
+		}),
+	});
+
+	return (
+		<div className="min-h-screen bg-white dark:bg-gray-800">
+			{/* Header */}
+			<div className="sticky top-0 z-10 bg-white/80 dark:bg-gray-800/80 backdrop-blur-md border-b border-gray-200 dark:border-gray-700">
+				<div className="px-6 py-4">
+					<h1 className="text-xl font-bold text-gray-900 dark:text-white flex items-center">
+						<Hash size={24} className="mr-2 text-primary-600" />
+						{tag}
+					</h1>
+					{data?.hashtag && (
+						<p className="text-sm text-gray-500 dark:text-gray-400 mt-1">
+							{data.hashtag.posts_count} postingan
+						</p>
+					)}
+				</div>
+			</div>
+
+			{/* Posts */}
+			<div className="divide-y divide-gray-200 dark:divide-gray-700">
+				{isLoading ? (
+					<div className="flex justify-center py-8">
+						<LoadingSpinner size="lg" />
+					</div>
+				) : error ? (
+					<div className="text-center py-12">
+						<p className="text-gray-500 dark:text-gray-400">
+							{error.response?.status === 404
+								? "Belum ada postingan dengan hashtag ini"
+								: "Gagal memuat postingan"}
+						</p>
+					</div>
+				) : data?.posts?.length === 0 ? (
+					<div className="text-center py-12">
+						<p className="text-gray-500 dark:text-gray-400">
+							Belum ada postingan dengan hashtag ini
+						</p>
+					</div>
+				) : (
+					<>
+						{data?.posts?.map((post) => (
+							<PostCard key={post.id} post={post} />
+						))}
+
+						{hasNextPage && (
+							<div className="flex justify-center py-6">
+								<Button
+									onClick={() => fetchNextPage()}
+									loading={isFetchingNextPage}
+									variant="secondary"
+								>
+									{isFetchingNextPage ? "Memuat..." : "Muat Lebih Banyak"}
+								</Button>
+							</div>
+						)}
+					</>
+				)}
+			</div>
+		</div>
+	);
+};
+
+export default HashtagPage;
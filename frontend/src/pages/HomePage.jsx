@@ -1,15 +1,32 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { motion } from "framer-motion";
 import { Sparkles } from "lucide-react";
-import { useInfiniteQuery } from "@tanstack/react-query";
+import { useInfiniteQuery, useQueryClient } from "@tanstack/react-query";
 import { postsApi } from "../services/api";
+import { subscribeFeed } from "../services/socket";
+import { useAuthStore } from "../store/authStore";
 import CreatePost from "../components/posts/CreatePost";
 import PostCard from "../components/posts/PostCard";
 import LoadingSpinner from "../components/ui/LoadingSpinner";
 import Button from "../components/ui/Button";
 
+// The server collapses reposts of the same original within a page; this keeps
+// an original from showing up again when a later page reposts it
+const collapseAcrossPages = (posts) => {
+	const seen = new Set();
+	return posts.filter((post) => {
+		const key = post.is_repost && post.original_post_id ? post.original_post_id : post.id;
+		if (seen.has(key)) return false;
+		seen.add(key);
+		return true;
+	});
+};
+
 const HomePage = () => {
 	const [feedType, setFeedType] = useState("timeline"); // 'timeline' or 'explore'
+	const [newPostIds, setNewPostIds] = useState([]);
+	const { user } = useAuthStore();
+	const queryClient = useQueryClient();
 
 	const {
 		data,
@@ -33,10 +50,53 @@ const HomePage = () => {
 		select: (data) => ({
 			pages: data.pages,
 			pageParams: data.pageParams,
-			posts: data.pages.flatMap((page) => page.data.posts),
+			posts: collapseAcrossPages(data.pages.flatMap((page) => page.data.posts)),
 		}),
 	});
 
+	// New posts arrive as IDs over the socket; nothing is refetched until the
+	// user asks, and then only the delta since the newest post on screen
+	useEffect(() => {
+		setNewPostIds([]);
+		return subscribeFeed(feedType, (post) => {
+			if (post.user_id === user?.id) return;
+			setNewPostIds((ids) => (ids.includes(post.id) ? ids : [...ids, post.id]));
+		});
+	}, [feedType, user?.id]);
+
+	const showNewPosts = async () => {
+		const newestId = data?.posts?.[0]?.id;
+		setNewPostIds([]);
+		if (!newestId) {
+			queryClient.invalidateQueries({ queryKey: ["posts", feedType] });
+			return;
+		}
+
+		const response = await postsApi.getPosts({
+			type: feedType,
+			since_id: newestId,
+			per_page: 50,
+		});
+		const { posts, pagination } = response.data;
+		if (pagination.has_next) {
+			// Too far behind for a delta; start over from the top
+			queryClient.invalidateQueries({ queryKey: ["posts", feedType] });
+			return;
+		}
+
+		queryClient.setQueryData(["posts", feedType], (old) => {
+			if (!old) return old;
+			const [first, ...rest] = old.pages;
+			return {
+				...old,
+				pages: [
+					{ ...first, data: { ...first.data, posts: [...posts, ...first.data.posts] } },
+					...rest,
+				],
+			};
+		});
+	};
+
 	if (error) {
 		return (
 			<div className="flex items-center justify-center min-h-64">
@@ -93,6 +153,15 @@ const HomePage = () => {
 				<CreatePost />
 			</div>
 
+			{/* New posts announced over the socket */}
+			{newPostIds.length > 0 && (
+				<div className="flex justify-center py-3 border-b border-gray-200 dark:border-gray-700">
+					<Button variant="secondary" onClick={showNewPosts}>
+						Tampilkan {newPostIds.length} postingan baru
+					</Button>
+				</div>
+			)}
+
 			{/* Posts Feed */}
 			<div className="divide-y divide-gray-200 dark:divide-gray-700">
 				{isLoading ? (
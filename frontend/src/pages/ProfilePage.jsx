@@ -1,6 +1,11 @@
 import { useState } from "react";
 import { useParams } from "react-router-dom";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import {
+	useQuery,
+	useInfiniteQuery,
+	useMutation,
+	useQueryClient,
+} from "@tanstack/react-query";
 import {
 	Calendar,
 	MapPin,
@@ -10,7 +15,7 @@ import {
 } from "lucide-react";
 import { formatDistanceToNow } from "date-fns";
 import { id } from "date-fns/locale";
-import { usersApi, postsApi } from "../services/api";
+import { usersApi } from "../services/api";
 import { useAuthStore } from "../store/authStore";
 import Avatar from "../components/ui/Avatar";
 import Button from "../components/ui/Button";
@@ -37,16 +42,22 @@ const ProfilePage = () => {
 		enabled: !!targetUsername,
 	});
 
-	// Fetch user posts
-	const { data: postsData, isLoading: postsLoading } = useQuery({
-		queryKey: ["user-posts", profileData?.id],
-		queryFn: () =>
-			postsApi.getPosts({
-				type: "user",
-				user_id: profileData?.id,
+	// Fetch the active tab, one cursor page at a time
+	const {
+		data: postsData,
+		isLoading: postsLoading,
+		fetchNextPage,
+		hasNextPage,
+		isFetchingNextPage,
+	} = useInfiniteQuery({
+		queryKey: ["user-posts", profileData?.id, activeTab],
+		queryFn: ({ pageParam }) =>
+			usersApi.getProfileTab(profileData?.id, activeTab, {
+				cursor: pageParam,
 				per_page: 20,
 			}),
-		select: (response) => response.data.posts,
+		getNextPageParam: (lastPage) => lastPage.data.next_cursor ?? undefined,
+		select: (data) => data.pages.flatMap((page) => page.data.posts),
 		enabled: !!profileData?.id,
 	});
 
@@ -93,6 +104,15 @@ const ProfilePage = () => {
 		}
 	};
 
+	const emptyMessages = {
+		posts: isOwnProfile
+			? "Anda belum membuat postingan"
+			: `${profileData.name} belum membuat postingan`,
+		replies: "Belum ada balasan",
+		media: "Belum ada postingan dengan media",
+		likes: "Belum ada postingan yang disukai",
+	};
+
 	const tabs = [
 		{ id: "posts", label: "Posts", count: profileData.posts_count },
 		{ id: "replies", label: "Replies", count: null },
@@ -276,13 +296,25 @@ const ProfilePage = () => {
 					) : postsData?.length === 0 ? (
 						<div className="text-center py-12">
 							<p className="text-gray-500 dark:text-gray-400">
-								{isOwnProfile
-									? "Anda belum membuat postingan"
-									: `${profileData.name} belum membuat postingan`}
+								{emptyMessages[activeTab]}
 							</p>
 						</div>
 					) : (
-						postsData?.map((post) => <PostCard key={post.id} post={post} />)
+						<>
+							{postsData?.map((post) => <PostCard key={post.id} post={post} />)}
+
+							{hasNextPage && (
+								<div className="flex justify-center py-6">
+									<Button
+										onClick={() => fetchNextPage()}
+										loading={isFetchingNextPage}
+										variant="secondary"
+									>
+										{isFetchingNextPage ? "Memuat..." : "Muat Lebih Banyak"}
+									</Button>
+								</div>
+							)}
+						</>
 					)}
 				</div>
 			</div>
@@ -56,7 +56,8 @@ export const authApi = {
 
 	login: (credentials) => api.post("/auth/login", credentials),
 
-	logout: () => api.post("/auth/logout"),
+	logout: (refreshToken) =>
+		api.post("/auth/logout", { refresh_token: refreshToken }),
 
 	refresh: (refreshToken) =>
 		api.post("/auth/refresh", { refresh_token: refreshToken }),
@@ -65,6 +66,9 @@ export const authApi = {
 
 	changePassword: (passwordData) =>
 		api.post("/auth/change-password", passwordData),
+
+	deleteAccount: (password) =>
+		api.delete("/auth/account", { data: { password } }),
 };
 
 // Posts API
@@ -109,6 +113,13 @@ export const usersApi = {
 
 	unfollowUser: (userId) => api.post(`/users/${userId}/unfollow`),
 
+	// tab: "posts", "replies", "media" or "likes"; paginated by `cursor`
+	getProfileTab: (userId, tab, params = {}) =>
+		api.get(`/users/${userId}/${tab}`, { params }),
+
+	getMutualFollowers: (userId, params = {}) =>
+		api.get(`/users/${userId}/mutuals`, { params }),
+
 	getFollowers: (userId, params = {}) =>
 		api.get(`/users/${userId}/followers`, { params }),
 
@@ -122,15 +133,35 @@ export const usersApi = {
 
 	getUserSuggestions: () => api.get("/users/suggestions"),
 
+	getAnalytics: (params = {}) => api.get("/users/me/analytics", { params }),
+
 	getNotifications: (params = {}) =>
 		api.get("/users/notifications", { params }),
 
+	getUnreadCount: () => api.get("/users/notifications/unread-count"),
+
 	markNotificationsRead: (notificationIds = []) =>
 		api.post("/users/notifications/mark-read", {
 			notification_ids: notificationIds,
 		}),
 };
 
+// Hashtags API
+export const hashtagsApi = {
+	getHashtags: (params = {}) => api.get("/hashtags", { params }),
+
+	getHashtag: (tag) => api.get(`/hashtags/${encodeURIComponent(tag)}`),
+
+	getHashtagPosts: (tag, params = {}) =>
+		api.get(`/hashtags/${encodeURIComponent(tag)}/posts`, { params }),
+};
+
+// Batch API
+export const batchApi = {
+	// mutations: [{ op: "like", post_id }, { op: "follow", user_id }, ...]
+	run: (mutations) => api.post("/batch", { mutations }),
+};
+
 // Upload API
 export const uploadApi = {
 	uploadImage: (file) => {
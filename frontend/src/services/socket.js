@@ -0,0 +1,51 @@
+import { io } from "socket.io-client";
+
+let socket = null;
+let feedSubscription = null;
+
+// (Re)joins the rooms for the feed on screen; the server answers
+// feed:resubscribe after follow changes so the author rooms stay in sync
+const applyFeedSubscription = () => {
+	if (socket && feedSubscription) {
+		socket.emit("feed:subscribe", { channel: feedSubscription.channel });
+	}
+};
+
+// Single shared connection; the access token puts it in the user's room
+export const connectSocket = (token) => {
+	if (socket) {
+		socket.disconnect();
+	}
+	socket = io({
+		path: "/socket.io",
+		auth: token ? { token } : {},
+		transports: ["websocket"],
+	});
+	socket.on("connect", applyFeedSubscription);
+	socket.on("feed:resubscribe", applyFeedSubscription);
+	socket.on("feed:new_post", (post) => feedSubscription?.onNewPost(post));
+	return socket;
+};
+
+// Live "new post" events for a feed ("timeline" or "explore")
+export const subscribeFeed = (channel, onNewPost) => {
+	const subscription = { channel, onNewPost };
+	feedSubscription = subscription;
+	applyFeedSubscription();
+
+	return () => {
+		if (feedSubscription === subscription) {
+			feedSubscription = null;
+			socket?.emit("feed:subscribe", { channel: null });
+		}
+	};
+};
+
+export const getSocket = () => socket;
+
+export const disconnectSocket = () => {
+	if (socket) {
+		socket.disconnect();
+		socket = null;
+	}
+};
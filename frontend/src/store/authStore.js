@@ -69,7 +69,7 @@ const useAuthStore = create(
 
 			logout: async () => {
 				try {
-					await authApi.logout();
+					await authApi.logout(get().refreshToken);
 				} catch (error) {
 					console.error("Logout error:", error);
 				}
@@ -151,7 +151,15 @@ const useAuthStore = create(
 
 			changePassword: async (passwordData) => {
 				try {
-					await authApi.changePassword(passwordData);
+					const response = await authApi.changePassword(passwordData);
+					const { access_token, refresh_token } = response.data;
+
+					// Old tokens are revoked server-side; keep this session with the new pair
+					if (access_token) {
+						set({ token: access_token, refreshToken: refresh_token });
+						authApi.setAuthToken(access_token);
+					}
+
 					toast.success("Password berhasil diubah");
 					return { success: true };
 				} catch (error) {
@@ -0,0 +1,90 @@
+// Decoder for the blurhash strings the upload route stores
+// (https://github.com/woltapp/blurhash), rendered to a tiny data URL
+const ALPHABET =
+	"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~";
+
+const decode83 = (str) =>
+	[...str].reduce((value, char) => value * 83 + ALPHABET.indexOf(char), 0);
+
+const toLinear = (value) => {
+	const v = value / 255;
+	return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+};
+
+const toSrgb = (value) => {
+	const v = Math.max(0, Math.min(1, value));
+	return v <= 0.0031308
+		? Math.round(v * 12.92 * 255)
+		: Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+};
+
+const signPow = (value, exp) => Math.sign(value) * Math.pow(Math.abs(value), exp);
+
+const decode = (hash, width, height) => {
+	const size = decode83(hash[0]);
+	const numX = (size % 9) + 1;
+	const numY = Math.floor(size / 9) + 1;
+	const maximum = (decode83(hash[1]) + 1) / 166;
+
+	const colors = [];
+	for (let i = 0; i < numX * numY; i++) {
+		if (i === 0) {
+			const value = decode83(hash.substring(2, 6));
+			colors.push([toLinear(value >> 16), toLinear((value >> 8) & 255), toLinear(value & 255)]);
+		} else {
+			const value = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+			colors.push([
+				signPow((Math.floor(value / (19 * 19)) - 9) / 9, 2) * maximum,
+				signPow(((Math.floor(value / 19) % 19) - 9) / 9, 2) * maximum,
+				signPow(((value % 19) - 9) / 9, 2) * maximum,
+			]);
+		}
+	}
+
+	const pixels = new Uint8ClampedArray(width * height * 4);
+	for (let y = 0; y < height; y++) {
+		for (let x = 0; x < width; x++) {
+			let r = 0;
+			let g = 0;
+			let b = 0;
+			for (let j = 0; j < numY; j++) {
+				for (let i = 0; i < numX; i++) {
+					const basis =
+						Math.cos((Math.PI * x * i) / width) * Math.cos((Math.PI * y * j) / height);
+					const color = colors[i + j * numX];
+					r += color[0] * basis;
+					g += color[1] * basis;
+					b += color[2] * basis;
+				}
+			}
+			const offset = 4 * (x + y * width);
+			pixels[offset] = toSrgb(r);
+			pixels[offset + 1] = toSrgb(g);
+			pixels[offset + 2] = toSrgb(b);
+			pixels[offset + 3] = 255;
+		}
+	}
+	return pixels;
+};
+
+// The same original shows up many times across feeds; decode each hash once
+const cache = new Map();
+
+export const blurhashToDataUrl = (hash, width = 32, height = 32) => {
+	if (!hash || hash.length < 6) return null;
+	if (cache.has(hash)) return cache.get(hash);
+
+	let url = null;
+	try {
+		const canvas = document.createElement("canvas");
+		canvas.width = width;
+		canvas.height = height;
+		const context = canvas.getContext("2d");
+		context.putImageData(new ImageData(decode(hash, width, height), width, height), 0, 0);
+		url = canvas.toDataURL();
+	} catch {
+		// Malformed hash: fall back to the dominant color alone
+	}
+	cache.set(hash, url);
+	return url;
+};
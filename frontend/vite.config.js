@@ -12,6 +12,10 @@ export default defineConfig({
 				changeOrigin: true,
 				secure: false,
 			},
+			"/socket.io": {
+				target: "http://localhost:5000",
+				ws: true,
+			},
 		},
 	},
 	resolve: {